@@ -41,6 +41,18 @@ __all__ = [
         "counter",
         # Extra IVI base classes
         "extra",
+        # Waveform data handling
+        "recorder",
+        "ringbuffer",
+        "measurement",
+        "histogram",
+        "spectrum",
+        "busdecode",
+        "display",
+        # Multi-instrument measurements
+        "sweep",
+        # Instrument events
+        "event",
         # Generic IVI drivers
         "scpi",
         # IVI drivers
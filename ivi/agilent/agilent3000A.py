@@ -27,7 +27,6 @@ THE SOFTWARE.
 from .agilent2000A import *
 
 import numpy as np
-import struct
 
 from .. import ivi
 from .. import fgen
@@ -51,7 +50,7 @@ StandardWaveformMapping = {
         }
 
 class agilent3000A(agilent2000A, fgen.ArbWfm, fgen.ArbFrequency,
-                fgen.ArbChannelWfm):
+                fgen.ArbChannelWfm, fgen.ArbWfmBinary):
     "Agilent InfiniiVision 3000A series IVI oscilloscope driver"
     
     def __init__(self, *args, **kwargs):
@@ -78,6 +77,8 @@ class agilent3000A(agilent2000A, fgen.ArbWfm, fgen.ArbFrequency,
         self._arbitrary_waveform_size_max = 8192
         self._arbitrary_waveform_size_min = 2
         self._arbitrary_waveform_quantum = 1
+        self._arbitrary_binary_alignment = 'right'
+        self._arbitrary_sample_bit_resolution = 10
         
         self._identity_description = "Agilent InfiniiVision 3000A X-series IVI oscilloscope driver"
         self._identity_supported_instrument_models = ['DSOX3012A','DSOX3014A','DSOX3024A',
@@ -174,18 +175,46 @@ class agilent3000A(agilent2000A, fgen.ArbWfm, fgen.ArbFrequency,
         if len(y) % self._arbitrary_waveform_quantum != 0:
             raise ivi.ValueNotSupportedException()
 
-        raw_data = b''
+        # single precision float, LSB first
+        raw_data = ivi.quantize_waveform(y, encoding='float', byteorder='<')
 
-        for f in y:
-            # clip at -1 and 1
-            if f > 1.0: f = 1.0
-            if f < -1.0: f = -1.0
+        # the byte order setting is kept by the instrument and the int16 path
+        # may have left it at MSB first, so select LSB first for this data
+        self._write(':%s:arbitrary:bytorder lsbfirst' % self._output_name[index])
+        self._write_ieee_block(raw_data, ':%s:arbitrary:data ' % self._output_name[index])
 
-            raw_data = raw_data + struct.pack('<f', f)
+        return self._output_name[index]
 
-        self._write_ieee_block(raw_data, ':%s:arbitrary:data ' % self._output_name[index])
+    def _arbitrary_waveform_create_channel_waveform_int16(self, index, data):
+        index = ivi.get_index(self._output_name, index)
+        y = fgen.get_binary_waveform(data)
+
+        if len(y) % self._arbitrary_waveform_quantum != 0:
+            raise ivi.ValueNotSupportedException()
+
+        half = 1 << (self._arbitrary_sample_bit_resolution - 1)
+
+        if y.dtype.kind == 'u':
+            if len(y) and y.max() >= 2 * half:
+                raise ivi.ValueNotSupportedException()
+            # DAC codes are signed, unsigned data is offset binary
+            y = y.astype(np.int16)
+            y -= half
+        elif len(y) and (y.min() < -half or y.max() >= half):
+            raise ivi.ValueNotSupportedException()
+
+        # send the data in its own byte order
+        if fgen.binary_byte_order(y) == '>':
+            self._write(':%s:arbitrary:bytorder msbfirst' % self._output_name[index])
+        else:
+            self._write(':%s:arbitrary:bytorder lsbfirst' % self._output_name[index])
+
+        self._write_ieee_block(np.ascontiguousarray(y), ':%s:arbitrary:data:dac ' % self._output_name[index])
 
         return self._output_name[index]
 
+    def _arbitrary_waveform_create_channel_waveform_int32(self, index, data):
+        raise ivi.OperationNotSupportedException()
+
 
     
@@ -27,8 +27,6 @@ THE SOFTWARE.
 from .. import ivi
 from .. import pwrmeter
 
-import time
-
 class agilent436A(ivi.Driver, pwrmeter.Base, pwrmeter.ZeroCorrection, pwrmeter.ManualRange):
     "Agilent 436A RF power meter"
     
@@ -274,25 +272,11 @@ class agilent436A(ivi.Driver, pwrmeter.Base, pwrmeter.ZeroCorrection, pwrmeter.M
         if self._driver_operation_simulate:
             return
         
-        it = 0
-        while True:
-            val = self._ask("Z1T")
-            if (int(val[4:8]) < 2):
-                break
-            time.sleep(0.5)
-            it += 1
-            if it > 20:
-                return
+        if not self._driver_operation_wait_for(lambda: int(self._ask("Z1T")[4:8]) < 2, 10):
+            return
         
-        it = 0
-        while True:
-            val = self._ask("9+AI")
-            if val[0] < 'T':
-                break
-            time.sleep(0.5)
-            it += 1
-            if it > 10:
-                return
+        if not self._driver_operation_wait_for(lambda: self._ask("9+AI")[0] < 'T', 5):
+            return
         
         self._channel_zero_state[index] = 'complete'
     
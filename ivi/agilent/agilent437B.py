@@ -27,8 +27,6 @@ THE SOFTWARE.
 from .. import ivi
 from .. import pwrmeter
 
-import time
-
 Units = set(['dBm', 'Watts'])
 
 class agilent437B(ivi.Driver, pwrmeter.Base, pwrmeter.ManualRange,
@@ -321,14 +319,10 @@ class agilent437B(ivi.Driver, pwrmeter.Base, pwrmeter.ManualRange,
 
         self._write("CS")
         self._write("ZE")
-        it = 0
-        while True:
-            val = self._read_stb()
-            if val & 2:
-                break
-            if val & 8 or it > 20:
-                return
-            time.sleep(0.5)
+        # status byte bit 1 signals completion, bit 3 an error
+        val = self._driver_operation_wait_for(completion='stb', mask=2 | 8, maximum_time=10)
+        if not val or val & 8:
+            return
         
         self._channel_zero_state[index] = 'complete'
     
@@ -343,14 +337,9 @@ class agilent437B(ivi.Driver, pwrmeter.Base, pwrmeter.ManualRange,
 
         self._write("CS")
         self._write("CLEN")
-        it = 0
-        while True:
-            val = self._read_stb()
-            if val & 2:
-                break
-            if val & 8 or it > 20:
-                return
-            time.sleep(0.5)
+        val = self._driver_operation_wait_for(completion='stb', mask=2 | 8, maximum_time=10)
+        if not val or val & 8:
+            return
 
         self._channel_calibration_state[index] = 'complete'
 
@@ -24,6 +24,8 @@ THE SOFTWARE.
 
 """
 
+import numpy as np
+
 from .. import ivi
 from .. import extra
 from .. import scpi
@@ -35,6 +37,13 @@ DetectorType = set(['auto_peak', 'average', 'maximum_peak', 'minimum_peak', 'sam
 TraceType = set(['clear_write', 'maximum_hold', 'minimum_hold', 'video_average', 'view', 'store'])
 VerticalScale = set(['linear', 'logarithmic'])
 AcquisitionStatus = set(['complete', 'in_progress', 'unknown'])
+TraceDataFormatMapping = {
+        'ascii': 'ascii',
+        'real32': 'real,32',
+        'real64': 'real,64'}
+TraceDataTypeMapping = {
+        'real32': '>f4',
+        'real64': '>f8'}
 ScreenshotImageFormatMapping = {
         'pcl': 'pcl',
         'cgm': 'cgm',
@@ -59,6 +68,11 @@ class agilent86140B(ivi.Driver, extra.common.Screenshot, scpi.common.Memory):
         self._wavelength_stop = 1700.0e-9
         self._wavelength_offset = 0.0
         self._acquisition_number_of_sweeps = 1
+        self._acquisition_number_of_points = 1001
+        self._acquisition_number_of_points_min = 3
+        self._acquisition_number_of_points_max = 20001
+        self._acquisition_data_format = 'real32'
+        self._trace_data_format = None
         self._level_reference = 0.0
         self._level_reference_offset = 0.0
         self._sweep_coupling_resolution_bandwidth = 11e-9
@@ -155,6 +169,25 @@ class agilent86140B(ivi.Driver, extra.common.Screenshot, scpi.common.Memory):
                         This attribute defines the number of sweeps. This attribute value has no
                         effect if the Trace Type attribute is set to the value Clear Write.
                         """)
+        self._add_property('acquisition.number_of_points',
+                        self._get_acquisition_number_of_points,
+                        self._set_acquisition_number_of_points,
+                        None,
+                        ivi.Doc("""
+                        Specifies the number of trace points measured in each sweep, from 3 to
+                        20001.
+                        """))
+        self._add_property('acquisition.data_format',
+                        self._get_acquisition_data_format,
+                        self._set_acquisition_data_format,
+                        None,
+                        ivi.Doc("""
+                        Specifies the format used to transfer trace data from the instrument.
+                        The binary formats 'real32' (the default) and 'real64' transfer trace
+                        data as IEEE 488.2 blocks of big-endian floating point values; 'ascii'
+                        transfers comma separated values and is about three times larger.
+                        'real32' is sufficient for amplitudes in logarithmic units.
+                        """))
         self._add_property('level.reference',
                         self._get_level_reference,
                         self._set_level_reference,
@@ -331,6 +364,21 @@ class agilent86140B(ivi.Driver, extra.common.Screenshot, scpi.common.Memory):
                        Error Query function at the conclusion of the sequence to check the
                        instrument status.
                        """)
+        self._add_method('traces[].fetch_x',
+                       self._trace_fetch_x,
+                       ivi.Doc("""
+                       Returns the wavelength axis of the trace in meters, computed from the
+                       Wavelength Start, Wavelength Stop and Number Of Points settings without
+                       transferring it from the instrument.
+                       """))
+        self._add_method('traces[].fetch_xy',
+                       self._trace_fetch_xy,
+                       ivi.Doc("""
+                       Returns the wavelength axis and the amplitude array of the trace as a
+                       tuple of arrays.  Only the amplitude array is transferred; the wavelength
+                       axis is computed from the Wavelength Start and Wavelength Stop settings
+                       and the trace length.
+                       """))
         self._add_method('acquisition.initiate',
                        self._acquisition_initiate,
                        """
@@ -554,6 +602,29 @@ class agilent86140B(ivi.Driver, extra.common.Screenshot, scpi.common.Memory):
     def _get_acquisition_number_of_sweeps(self):
         return self._acquisition_number_of_sweeps
     
+    def _get_acquisition_number_of_points(self):
+        if not self._driver_operation_simulate and not self._get_cache_valid():
+            self._acquisition_number_of_points = int(float(self._ask("sense:sweep:points?")))
+            self._set_cache_valid()
+        return self._acquisition_number_of_points
+    
+    def _set_acquisition_number_of_points(self, value):
+        value = int(value)
+        if value < self._acquisition_number_of_points_min or value > self._acquisition_number_of_points_max:
+            raise ivi.OutOfRangeException()
+        if not self._driver_operation_simulate:
+            self._write("sense:sweep:points %d" % value)
+        self._acquisition_number_of_points = value
+        self._set_cache_valid()
+    
+    def _get_acquisition_data_format(self):
+        return self._acquisition_data_format
+    
+    def _set_acquisition_data_format(self, value):
+        if value not in TraceDataFormatMapping:
+            raise ivi.ValueNotSupportedException()
+        self._acquisition_data_format = value
+    
     def _set_acquisition_number_of_sweeps(self, value):
         value = int(value)
         self._acquisition_number_of_sweeps = value
@@ -735,17 +806,30 @@ class agilent86140B(ivi.Driver, extra.common.Screenshot, scpi.common.Memory):
         name = self._trace_name[index]
         
         if self._driver_operation_simulate:
-            return list()
+            return np.zeros(0)
         
-        self._write('format:data ascii')
-        l = self._ask('trace:data:y? %s' % name)
+        fmt = self._acquisition_data_format
+        if self._trace_data_format != fmt or not self._get_cache_valid('trace_data_format'):
+            self._write('format:data %s' % TraceDataFormatMapping[fmt])
+            self._trace_data_format = fmt
+            self._set_cache_valid(True, 'trace_data_format')
         
-        data = list()
+        if fmt == 'ascii':
+            return np.array(self._ask('trace:data:y? %s' % name).split(','), dtype=float)
         
-        for p in l.split(','):
-            data.append(float(p))
-        
-        return data
+        self._write('trace:data:y? %s' % name)
+        raw_data = self._read_ieee_block()
+        return np.frombuffer(raw_data, TraceDataTypeMapping[fmt]).astype(float)
+    
+    def _trace_fetch_x(self, index):
+        index = ivi.get_index(self._trace_name, index)
+        return np.linspace(self._get_wavelength_start(), self._get_wavelength_stop(),
+                           self._get_acquisition_number_of_points())
+    
+    def _trace_fetch_xy(self, index):
+        y = self._trace_fetch_y(index)
+        x = np.linspace(self._get_wavelength_start(), self._get_wavelength_stop(), len(y))
+        return x, y
     
     def _acquisition_initiate(self):
         if not self._driver_operation_simulate:
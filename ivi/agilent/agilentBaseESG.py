@@ -24,6 +24,8 @@ THE SOFTWARE.
 
 """
 
+import numpy as np
+
 from .. import ivi
 from .. import rfsiggen
 from .. import extra
@@ -42,13 +44,19 @@ LFGeneratorWaveformMapping = {
     'dc': 'dc'
     }
 
+TriggerSourceMapping = {
+    'immediate': 'imm',
+    'external': 'ext',
+    'software': 'bus'
+    }
+
 class agilentBaseESG(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.common.Reset,
                      scpi.common.SelfTest,
                      rfsiggen.Base, rfsiggen.ModulateAM,
                      rfsiggen.ModulateFM, rfsiggen.ModulatePM, rfsiggen.AnalogModulationSource,
                      rfsiggen.ModulatePulse, rfsiggen.LFGenerator, rfsiggen.LFGeneratorOutput,
                      rfsiggen.Sweep, rfsiggen.FrequencyStep, rfsiggen.PowerStep, rfsiggen.List,
-                     extra.common.Memory, ivi.Driver):
+                     rfsiggen.SoftwareTrigger, extra.common.Memory, ivi.Driver):
     "Agilent ESG series IVI RF signal generator driver"
 
     def __init__(self, *args, **kwargs):
@@ -68,6 +76,11 @@ class agilentBaseESG(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.common
         self._rf_level_reference_enabled = False
         self._sweep_frequency_step_points = 2
         self._sweep_power_step_points = 2
+        self._sweep_list_points_max = 1601
+        # all lists are kept in the driver, the instrument only holds the
+        # last applied one and the others are sent again when selected
+        self._sweep_list_lists = dict()
+        self._sweep_list_loaded = None
 
         self._frequency_low = 250e3
         self._frequency_high = 4e9
@@ -315,12 +328,6 @@ class agilentBaseESG(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.common
             return int(self._ask("status:questionable:power:condition?")) & (1 << 1) == 0
         return True
 
-    def _rf_wait_until_settled(self, maximum_time):
-        t = 0
-        while not self._rf_is_settled() and t < maximum_time:
-            time.sleep(0.01)
-            t = t + 0.01
-
     def _get_analog_modulation_am_enabled(self):
         if not self._driver_operation_simulate and not self._get_cache_valid():
             self._analog_modulation_am_enabled = bool(int(self._ask("am:state?")))
@@ -568,14 +575,31 @@ class agilentBaseESG(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.common
         return self._sweep_mode
 
     def _set_sweep_mode(self, value):
-        value = int(value)
+        if value not in rfsiggen.SweepMode:
+            raise ivi.ValueNotSupportedException()
+        if value in ('frequency_sweep', 'power_sweep'):
+            # stepped sweeps only, there is no analog ramp
+            raise ivi.OperationNotSupportedException()
+        if value == 'list':
+            if self._sweep_list_selected_list:
+                self._sweep_list_apply()
+        elif not self._driver_operation_simulate:
+            if value == 'frequency_step':
+                self._write("list:type step;:frequency:mode list;:power:mode fixed")
+            elif value == 'power_step':
+                self._write("list:type step;:frequency:mode cw;:power:mode list")
+            else:
+                self._write("frequency:mode cw;:power:mode fixed")
         self._sweep_mode = value
 
     def _get_sweep_trigger_source(self):
         return self._sweep_trigger_source
 
     def _set_sweep_trigger_source(self, value):
-        value = str(value)
+        if value not in TriggerSourceMapping:
+            raise ivi.ValueNotSupportedException()
+        if not self._driver_operation_simulate:
+            self._write("trigger:source %s" % TriggerSourceMapping[value])
         self._sweep_trigger_source = value
 
     def _get_sweep_frequency_step_start(self):
@@ -749,7 +773,11 @@ class agilentBaseESG(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.common
 
     def _set_sweep_list_selected_list(self, value):
         value = str(value)
+        if value not in self._sweep_list_lists:
+            raise ivi.ValueNotSupportedException()
         self._sweep_list_selected_list = value
+        if self._sweep_mode == 'list':
+            self._sweep_list_apply()
 
     def _get_sweep_list_single_step_enabled(self):
         return self._sweep_list_single_step_enabled
@@ -757,26 +785,96 @@ class agilentBaseESG(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.common
     def _set_sweep_list_single_step_enabled(self, value):
         value = bool(value)
         self._sweep_list_single_step_enabled = value
+        self._sweep_list_configure_point_trigger()
 
     def _get_sweep_list_dwell(self):
         return self._sweep_list_dwell
 
     def _set_sweep_list_dwell(self, value):
         value = float(value)
+        if not self._driver_operation_simulate:
+            # same dwell time for all points
+            self._write("list:dwell:type step;:sweep:dwell %e" % value)
         self._sweep_list_dwell = value
+        self._sweep_frequency_step_dwell = value
+        self._sweep_power_step_dwell = value
+        self._set_cache_valid(True, 'sweep_frequency_step_dwell')
+        self._set_cache_valid(True, 'sweep_power_step_dwell')
+
+    def _sweep_list_configure_point_trigger(self):
+        # in single step mode every point waits for a software trigger
+        source = 'bus' if self._sweep_list_single_step_enabled else 'imm'
+        if not self._driver_operation_simulate:
+            self._write("list:trigger:source %s" % source)
+
+    def _sweep_list_store(self, name, frequency, power):
+        name = str(name)
+        n = len(frequency) if frequency is not None else len(power)
+        if frequency is not None and power is not None and len(frequency) != len(power):
+            raise ivi.ValueNotSupportedException()
+        if n < 1 or n > self._sweep_list_points_max:
+            raise ivi.OutOfRangeException()
+        self._sweep_list_lists[name] = (frequency, power)
+        # a list with this name may be on the instrument with old values
+        if self._sweep_list_loaded == name:
+            self._sweep_list_loaded = None
 
     def _sweep_list_create_frequency(self, name, frequency):
-        pass
+        frequency = np.array(frequency, dtype=float).ravel()
+        if np.any(frequency < self._frequency_low) or np.any(frequency > self._frequency_high):
+            raise ivi.OutOfRangeException()
+        self._sweep_list_store(name, frequency, None)
 
     def _sweep_list_create_power(self, name, power):
-        pass
+        power = np.array(power, dtype=float).ravel()
+        self._sweep_list_store(name, None, power)
 
     def _sweep_list_create_frequency_power(self, name, frequency, power):
-        pass
+        frequency = np.array(frequency, dtype=float).ravel()
+        power = np.array(power, dtype=float).ravel()
+        if np.any(frequency < self._frequency_low) or np.any(frequency > self._frequency_high):
+            raise ivi.OutOfRangeException()
+        self._sweep_list_store(name, frequency, power)
+
+    def _sweep_list_apply(self):
+        "Load the selected list if it is not on the instrument yet and start list mode"
+        name = self._sweep_list_selected_list
+        if name not in self._sweep_list_lists:
+            raise ivi.ValueNotSupportedException()
+        frequency, power = self._sweep_list_lists[name]
+        if self._driver_operation_simulate:
+            self._sweep_list_loaded = name
+            return
+        if self._sweep_list_loaded != name:
+            # the instrument holds a single list, send all of it in one message;
+            # list points are only accepted as ASCII values
+            cmd = []
+            if frequency is not None:
+                cmd.append("list:frequency " + ",".join("%.12g" % f for f in frequency))
+            if power is not None:
+                cmd.append("list:power " + ",".join("%.4f" % p for p in power))
+            self._write(";:".join(cmd))
+            self._sweep_list_loaded = name
+        self._write("list:type list;:frequency:mode %s;:power:mode %s" % (
+                'list' if frequency is not None else 'cw',
+                'list' if power is not None else 'fixed'))
+
+    def _driver_operation_invalidate_all_attributes(self):
+        super(agilentBaseESG, self)._driver_operation_invalidate_all_attributes()
+        # the instrument list may have been cleared
+        self._sweep_list_loaded = None
 
     def _sweep_list_clear_all(self):
-        pass
+        self._sweep_list_lists = dict()
+        self._sweep_list_loaded = None
+        self._sweep_list_selected_list = ''
 
     def _sweep_list_reset(self):
-        pass
+        # restart the list at the first point and arm it
+        if not self._driver_operation_simulate:
+            self._write("abort;:initiate")
+
+    def _send_software_trigger(self):
+        if not self._driver_operation_simulate:
+            self._write("*TRG")
 
@@ -25,7 +25,6 @@ THE SOFTWARE.
 """
 
 import math
-import struct
 import numpy as np
 
 from .. import ivi
@@ -51,6 +50,22 @@ class agilentBaseESGD(agilentBaseESG, rfsiggen.ModulateIQ, rfsiggen.IQImpairment
         self._digital_modulation_arb_waveform_quantum = 2
         self._digital_modulation_arb_waveform_size_min = 16
         self._digital_modulation_arb_waveform_size_max = 10240
+        self._digital_modulation_arb_pending = dict()
+        self._digital_modulation_arb_stream_chunk_size = 65536
+
+        self._add_method('digital_modulation.arb.stream_waveform',
+                        self._digital_modulation_arb_stream_waveform,
+                        ivi.Doc("""
+                        Writes an IQ waveform in chunks so that waveforms larger than the
+                        available host memory can be loaded. idata and qdata are arrays, for
+                        example numpy memmaps of a waveform file, and are transferred
+                        chunk_size samples at a time. Alternatively, idata is an iterable of
+                        (i, q) chunk pairs, such as a generator, and qdata is None.
+
+                        Each chunk is quantized as it is sent and appended to the ARBI and ARBQ
+                        files with Write Waveform and More Data Pending set, so memory use does
+                        not depend on the length of the waveform.
+                        """))
 
         self._identity_description = "Agilent ESG-D series IVI RF signal generator driver"
         self._identity_supported_instrument_models = list(['E4430B', 'E4431B', 'E4432B', 'E4433B',
@@ -254,13 +269,13 @@ class agilentBaseESGD(agilentBaseESG, rfsiggen.ModulateIQ, rfsiggen.IQImpairment
         if type(idata) == list and type(idata[0]) == float:
             # list
             yi = np.array(idata)
-        elif type(idata) == np.ndarray and len(idata.shape) == 1:
+        elif isinstance(idata, np.ndarray) and len(idata.shape) == 1:
             # 1D array
             yi = idata
-        elif type(idata) == np.ndarray and len(idata.shape) == 2 and idata.shape[0] == 1:
+        elif isinstance(idata, np.ndarray) and len(idata.shape) == 2 and idata.shape[0] == 1:
             # 2D array, hieght 1
             yi = idata[0]
-        elif type(idata) == np.ndarray and len(idata.shape) == 2 and idata.shape[1] == 1:
+        elif isinstance(idata, np.ndarray) and len(idata.shape) == 2 and idata.shape[1] == 1:
             # 2D array, width 1
             yi = idata[:,0]
         else:
@@ -269,58 +284,70 @@ class agilentBaseESGD(agilentBaseESG, rfsiggen.ModulateIQ, rfsiggen.IQImpairment
         if type(qdata) == list and type(qdata[0]) == float:
             # list
             yq = np.array(qdata)
-        elif type(qdata) == np.ndarray and len(qdata.shape) == 1:
+        elif isinstance(qdata, np.ndarray) and len(qdata.shape) == 1:
             # 1D array
             yq = qdata
-        elif type(qdata) == np.ndarray and len(qdata.shape) == 2 and qdata.shape[0] == 1:
+        elif isinstance(qdata, np.ndarray) and len(qdata.shape) == 2 and qdata.shape[0] == 1:
             # 2D array, hieght 1
             yq = qdata[0]
-        elif type(qdata) == np.ndarray and len(qdata.shape) == 2 and qdata.shape[1] == 1:
+        elif isinstance(qdata, np.ndarray) and len(qdata.shape) == 2 and qdata.shape[1] == 1:
             # 2D array, width 1
             yq = qdata[:,0]
         else:
             xq, yq = ivi.get_sig(qdata)
 
-        if more_data_pending:
-            # TODO: implement this flag
-            raise ivi.ValueNotSupportedException()
-
         if len(yi) != len(yq):
             raise ivi.ValueNotSupportedException()
-        if len(yi) % self._digital_modulation_arb_waveform_quantum != 0:
-            raise ivi.ValueNotSupportedException()
-
-        raw_i_data = b''
-        raw_q_data = b''
-
-        for f in yi:
-            # clip at -1 and 1
-            if f > 1.0: f = 1.0
-            if f < -1.0: f = -1.0
-
-            f = (f + 1) / 2
 
-            # scale to 14 bits
-            i = int(f * ((1 << 14) - 1) + 0.5) & 0x00003fff
-
-            # add to raw data, MSB first
-            raw_i_data = raw_i_data + struct.pack('>H', i)
+        # samples already written by previous calls with more_data_pending set,
+        # a failed call ends the pending write
+        offset = self._digital_modulation_arb_pending.pop(name, None)
+        total = len(yi) + (offset or 0)
+        if not more_data_pending and total % self._digital_modulation_arb_waveform_quantum != 0:
+            raise ivi.ValueNotSupportedException()
 
-        for f in yq:
-            # clip at -1 and 1
-            if f > 1.0: f = 1.0
-            if f < -1.0: f = -1.0
+        # 14 bit offset binary, MSB first
+        raw_i_data = ivi.quantize_waveform(yi, 14, 'offset_binary', '>')
+        raw_q_data = ivi.quantize_waveform(yq, 14, 'offset_binary', '>')
 
-            f = (f + 1) / 2
+        if offset is None:
+            # first part, create the files
+            self._write_ieee_block(raw_i_data, 'mmemory:data "ARBI:%s", ' % name)
+            self._write_ieee_block(raw_q_data, 'mmemory:data "ARBQ:%s", ' % name)
+        else:
+            self._write_ieee_block(raw_i_data, 'mmemory:data:append "ARBI:%s", ' % name)
+            self._write_ieee_block(raw_q_data, 'mmemory:data:append "ARBQ:%s", ' % name)
 
-            # scale to 14 bits
-            i = int(f * ((1 << 14) - 1) + 0.5) & 0x000fffff
+        if more_data_pending:
+            self._digital_modulation_arb_pending[name] = total
 
-            # add to raw data, MSB first
-            raw_q_data = raw_q_data + struct.pack('>H', i)
+    def _digital_modulation_arb_stream_waveform(self, name, idata, qdata=None, chunk_size=None):
+        if chunk_size is None:
+            chunk_size = self._digital_modulation_arb_stream_chunk_size
+        chunk_size = int(chunk_size)
 
-        self._write_ieee_block(raw_i_data, 'mmemory:data "ARBI:%s", ' % name)
-        self._write_ieee_block(raw_q_data, 'mmemory:data "ARBQ:%s", ' % name)
+        if qdata is None:
+            chunks = iter(idata)
+        else:
+            if len(idata) != len(qdata):
+                raise ivi.ValueNotSupportedException()
+            chunks = ((idata[k:k+chunk_size], qdata[k:k+chunk_size])
+                    for k in range(0, len(idata), chunk_size))
+
+        # look one chunk ahead to flag the last one
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            raise ivi.ValueNotSupportedException()
+        self._digital_modulation_arb_pending.pop(name, None)
+        try:
+            for next_chunk in chunks:
+                self._digital_modulation_arb_write_waveform(name, np.asarray(chunk[0]), np.asarray(chunk[1]), True)
+                chunk = next_chunk
+            self._digital_modulation_arb_write_waveform(name, np.asarray(chunk[0]), np.asarray(chunk[1]), False)
+        finally:
+            # an interrupted stream must not leave the next write appending
+            self._digital_modulation_arb_pending.pop(name, None)
 
     def _digital_modulation_arb_clear_all_waveforms(self):
         pass
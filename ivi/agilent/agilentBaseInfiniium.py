@@ -37,6 +37,11 @@ AcquisitionModeMapping = {
 }
 AcquisitionType = set(['normal', 'peak_detect', 'high_resolution'])
 VerticalCoupling = set(['dc'])
+WaveformFormatMapping = {
+        'ascii': 0,
+        'byte': 1,
+        'word': 2,
+        'long': 4}
 ScreenshotImageFormatMapping = {
         'tif': 'tif',
         'tiff': 'tif',
@@ -80,6 +85,8 @@ class agilentBaseInfiniium(agilentBaseScope):
         self._vertical_divisions = 8
 
         self._display_screenshot_image_format_mapping = ScreenshotImageFormatMapping
+        self._waveform_format_mapping = WaveformFormatMapping
+        self._waveform_decimation = False
         self._display_color_grade = False
         
         self._identity_description = "Agilent Infiniium series IVI oscilloscope driver"
@@ -207,19 +214,14 @@ class agilentBaseInfiniium(agilentBaseScope):
         self._channel_input_impedance[index] = value
         self._set_cache_valid(index=index)
     
-    def _measurement_fetch_waveform(self, index):
-        index = ivi.get_index(self._channel_name, index)
-        
-        if self._driver_operation_simulate:
-            return list()
-        
-        self._write(":waveform:byteorder msbfirst")
-        self._write(":waveform:format word")
-        self._write(":waveform:source %s" % self._channel_name[index])
-        
-        # Read preamble
-        
-        pre = self._ask(":waveform:preamble?").split(',')
+    def _measurement_waveform_setup(self):
+        if not self._get_cache_valid('waveform_setup'):
+            self._write(":waveform:byteorder msbfirst")
+            self._write(":waveform:format word")
+            self._set_cache_valid(True, 'waveform_setup')
+    
+    def _measurement_parse_waveform_preamble(self, pre, data_format='word', peak_detect=False):
+        pre = pre.split(',')
         
         format = int(pre[0])
         type = int(pre[1])
@@ -232,43 +234,28 @@ class agilentBaseInfiniium(agilentBaseScope):
         yorigin = float(pre[8])
         yreference = int(float(pre[9]))
         
-        #if type == 1:
-        #    raise scope.InvalidAcquisitionTypeException()
+        # Infiniium reports raw records as type 1 and peak detect as type 10
+        if (type == 10) != peak_detect:
+            raise scope.InvalidAcquisitionTypeException()
         
-        if format != 2:
-            raise UnexpectedResponseException()
+        if format != self._waveform_format_mapping[data_format]:
+            raise ivi.UnexpectedResponseException()
         
-        self._write(":waveform:data?")
-        
-        # Read waveform data
-        raw_data = self._read_ieee_block()
-        
-        # Split out points and convert to time and voltage pairs
-        
-        data = list()
-        for i in range(points):
-            x = ((i - xreference) * xincrement) + xorigin
-            
-            yval = struct.unpack(">h", raw_data[i*2:i*2+2])[0]
-            
-            if yval == 31232:
-                # hole value
-                y = float('nan')
-            else:
-                y = ((yval - yreference) * yincrement) + yorigin
-            
-            data.append((x, y))
-        
-        return data
+        return (format, type, points, count, xincrement, xorigin, xreference,
+                yincrement, yorigin, yreference)
     
-    def _measurement_read_waveform(self, index, maximum_time):
-        return self._measurement_fetch_waveform(index)
+    def _measurement_decode_waveform_data(self, pre, raw_data, out=None):
+        format, type, points, count, xincrement, xorigin, xreference, yincrement, yorigin, yreference = pre
+        
+        # signed word data, 31232 is the hole value
+        return scope.decode_waveform_data(raw_data, '>i2', yincrement, yorigin, yreference, 31232, out)
     
     def _measurement_initiate(self):
         if not self._driver_operation_simulate:
             self._write(":acquire:complete 100")
             self._write(":digitize")
             self._set_cache_valid(False, 'trigger_continuous')
+        self._bump_acquisition_generation()
 
     def _get_acquisition_mode(self):
         if not self._driver_operation_simulate and not self._get_cache_valid():
@@ -303,6 +290,7 @@ class agilentBaseInfiniium(agilentBaseScope):
         self._set_cache_valid()
         self._set_cache_valid(True, 'acquisition_sample_mode')
         self._set_cache_valid(True, 'acquisition_type')
+        self._invalidate_waveform_preamble()
 
     def _get_acquisition_type(self):
         self._get_acquisition_mode()
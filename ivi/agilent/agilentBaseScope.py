@@ -27,6 +27,8 @@ THE SOFTWARE.
 import time
 import struct
 
+import numpy as np
+
 from .. import ivi
 from .. import scope
 from .. import scpi
@@ -102,6 +104,10 @@ PolarityMapping = {'positive': 'pos',
 GlitchConditionMapping = {'less_than': 'less',
         'greater_than': 'gre'}
 WidthConditionMapping = {'within': 'rang'}
+WaveformFormatMapping = {
+        'byte': 0,
+        'word': 1,
+        'ascii': 4}
 SampleModeMapping = {'real_time': 'rtim',
         'equivalent_time': 'etim',
         'segmented': 'segm'}
@@ -208,6 +214,10 @@ class agilentBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.comm
         self._timebase_window_range = 5e-6
         self._timebase_window_scale = 500e-9
         self._display_screenshot_image_format_mapping = ScreenshotImageFormatMapping
+        self._waveform_format_mapping = WaveformFormatMapping
+        self._measurement_query_cache = dict()
+        self._waveform_decimation = True
+        self._measurement_statistics_list = list()
         self._display_vectors = True
         self._display_labels = True
         
@@ -295,6 +305,30 @@ class agilentBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.comm
                         Returns the time tag of the currently selected segmented memory index. The
                         index is selected using the acquisition.segmented.index property.
                         """))
+        self._add_method('measurement.fetch_digital_waveform',
+                        self._measurement_fetch_digital_waveform,
+                        ivi.Doc("""
+                        Returns the digital channel data of a mixed signal oscilloscope from a
+                        previously initiated acquisition. The data is transferred one pod of
+                        eight channels at a time.
+                        
+                        The return value is a DigitalWaveform object. The raw attribute holds the
+                        pod bytes as a (points, pods) uint8 array and the bits attribute holds a
+                        (points, channels) boolean array where column n is digital channel n.
+                        The time axis is computed in the same way as for the analog channels.
+                        """))
+        self._add_method('measurement.fetch_segments',
+                        self._measurement_fetch_segments,
+                        ivi.Doc("""
+                        Returns the waveform data of a range of acquired memory segments for the
+                        specified channel. The start and stop parameters select the segments as a
+                        zero-based half-open range, stop defaults to the number of acquired
+                        segments.
+                        
+                        The return value is a tuple of a two-dimensional numpy array of voltages
+                        with one row per segment and an array of the segment time tags. All
+                        segments share the same record preamble, so it is only read once.
+                        """))
         self._add_property('channels[].bw_limit',
                         self._get_channel_bw_limit,
                         self._set_channel_bw_limit,
@@ -585,6 +619,7 @@ class agilentBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.comm
             self._write(":acquire:segmented:count %d" % value)
         self._acquisition_segmented_count = value
         self._set_cache_valid()
+        self._invalidate_waveform_preamble()
 
     def _get_acquisition_segmented_index(self):
         if not self._driver_operation_simulate and not self._get_cache_valid():
@@ -593,11 +628,12 @@ class agilentBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.comm
         return self._acquisition_segmented_index
 
     def _set_acquisition_segmented_index(self, value):
-        vaue = int(value)
+        value = int(value)
         if not self._driver_operation_simulate:
             self._write(":acquire:segmented:index %d" % value)
         self._acquisition_segmented_index = value
         self._set_cache_valid()
+        self._bump_acquisition_generation()
 
     def _get_acquisition_segmented_acquired_count(self):
         if not self._driver_operation_simulate:
@@ -623,6 +659,7 @@ class agilentBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.comm
             self._write(":timebase:mode %s" % TimebaseModeMapping[value])
         self._timebase_mode = value
         self._set_cache_valid()
+        self._invalidate_waveform_preamble()
     
     def _get_timebase_reference(self):
         if not self._driver_operation_simulate and not self._get_cache_valid():
@@ -638,6 +675,7 @@ class agilentBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.comm
             self._write(":timebase:reference %s" % TimebaseReferenceMapping[value])
         self._timebase_reference = value
         self._set_cache_valid()
+        self._invalidate_waveform_preamble()
         
     def _get_timebase_position(self):
         if not self._driver_operation_simulate and not self._get_cache_valid():
@@ -651,6 +689,7 @@ class agilentBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.comm
             self._write(":timebase:position %e" % value)
         self._timebase_position = value
         self._set_cache_valid()
+        self._invalidate_waveform_preamble()
         
     def _get_timebase_range(self):
         if not self._driver_operation_simulate and not self._get_cache_valid():
@@ -668,6 +707,7 @@ class agilentBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.comm
         self._timebase_scale = value / self._horizontal_divisions
         self._set_cache_valid()
         self._set_cache_valid(True, 'timebase_scale')
+        self._invalidate_waveform_preamble()
         
     def _get_timebase_scale(self):
         if not self._driver_operation_simulate and not self._get_cache_valid():
@@ -685,6 +725,7 @@ class agilentBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.comm
         self._timebase_range = value * self._horizontal_divisions
         self._set_cache_valid()
         self._set_cache_valid(True, 'timebase_range')
+        self._invalidate_waveform_preamble()
         
     def _get_timebase_window_position(self):
         if not self._driver_operation_simulate and not self._get_cache_valid():
@@ -698,6 +739,7 @@ class agilentBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.comm
             self._write(":timebase:window:position %e" % value)
         self._timebase_window_position = value
         self._set_cache_valid()
+        self._invalidate_waveform_preamble()
         
     def _get_timebase_window_range(self):
         if not self._driver_operation_simulate and not self._get_cache_valid():
@@ -715,6 +757,7 @@ class agilentBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.comm
         self._timebase_window_scale = value / self._horizontal_divisions
         self._set_cache_valid()
         self._set_cache_valid(True, 'timebase_window_scale')
+        self._invalidate_waveform_preamble()
         
     def _get_timebase_window_scale(self):
         if not self._driver_operation_simulate and not self._get_cache_valid():
@@ -732,6 +775,7 @@ class agilentBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.comm
         self._timebase_window_range = value * self._horizontal_divisions
         self._set_cache_valid()
         self._set_cache_valid(True, 'timebase_window_range')
+        self._invalidate_waveform_preamble()
     
     def _get_display_vectors(self):
         if not self._driver_operation_simulate and not self._get_cache_valid():
@@ -776,6 +820,7 @@ class agilentBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.comm
             self._write(":timebase:position %e" % value)
         self._acquisition_start_time = value
         self._set_cache_valid()
+        self._invalidate_waveform_preamble()
     
     def _get_acquisition_type(self):
         if not self._driver_operation_simulate and not self._get_cache_valid():
@@ -791,6 +836,7 @@ class agilentBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.comm
             self._write(":acquire:type %s" % AcquisitionTypeMapping[value])
         self._acquisition_type = value
         self._set_cache_valid()
+        self._invalidate_waveform_preamble()
     
     def _get_acquisition_number_of_points_minimum(self):
         return self._acquisition_number_of_points_minimum
@@ -818,6 +864,7 @@ class agilentBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.comm
         self._acquisition_time_per_record = value
         self._set_cache_valid()
         self._set_cache_valid(False, 'acquisition_start_time')
+        self._invalidate_waveform_preamble()
     
     def _get_channel_label(self, index):
         index = ivi.get_index(self._channel_name, index)
@@ -848,6 +895,7 @@ class agilentBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.comm
             self._write(":%s:display %d" % (self._channel_name[index], int(value)))
         self._channel_enabled[index] = value
         self._set_cache_valid(index=index)
+        self._invalidate_waveform_preamble(index)
     
     def _get_channel_input_impedance(self, index):
         index = ivi.get_index(self._analog_channel_name, index)
@@ -899,6 +947,7 @@ class agilentBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.comm
             self._write(":%s:probe %e" % (self._channel_name[index], value))
         self._channel_probe_attenuation[index] = value
         self._set_cache_valid(index=index)
+        self._invalidate_waveform_preamble(index)
     
     def _get_channel_probe_skew(self, index):
         index = ivi.get_index(self._analog_channel_name, index)
@@ -929,6 +978,7 @@ class agilentBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.comm
             self._write(":%s:invert %e" % (self._channel_name[index], int(value)))
         self._channel_invert[index] = value
         self._set_cache_valid(index=index)
+        self._invalidate_waveform_preamble(index)
     
     def _get_channel_probe_id(self, index):
         index = ivi.get_index(self._analog_channel_name, index)
@@ -951,6 +1001,7 @@ class agilentBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.comm
             self._write(":%s:bwlimit %d" % (self._channel_name[index], int(value)))
         self._channel_bw_limit[index] = value
         self._set_cache_valid(index=index)
+        self._invalidate_waveform_preamble(index)
     
     def _get_channel_coupling(self, index):
         index = ivi.get_index(self._analog_channel_name, index)
@@ -967,6 +1018,7 @@ class agilentBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.comm
             self._write(":%s:coupling %s" % (self._channel_name[index], value))
         self._channel_coupling[index] = value
         self._set_cache_valid(index=index)
+        self._invalidate_waveform_preamble(index)
     
     def _get_channel_offset(self, index):
         index = ivi.get_index(self._channel_name, index)
@@ -982,6 +1034,7 @@ class agilentBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.comm
             self._write(":%s:offset %e" % (self._channel_name[index], value))
         self._channel_offset[index] = value
         self._set_cache_valid(index=index)
+        self._invalidate_waveform_preamble(index)
     
     def _get_channel_range(self, index):
         index = ivi.get_index(self._channel_name, index)
@@ -1001,6 +1054,7 @@ class agilentBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.comm
         self._channel_scale[index] = value / self._vertical_divisions
         self._set_cache_valid(index=index)
         self._set_cache_valid(True, "channel_scale", index)
+        self._invalidate_waveform_preamble(index)
     
     def _get_channel_scale(self, index):
         index = ivi.get_index(self._channel_name, index)
@@ -1020,6 +1074,7 @@ class agilentBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.comm
         self._channel_range[index] = value * self._vertical_divisions
         self._set_cache_valid(index=index)
         self._set_cache_valid(True, "channel_range", index)
+        self._invalidate_waveform_preamble(index)
     
     def _get_measurement_status(self):
         return self._measurement_status
@@ -1302,21 +1357,16 @@ class agilentBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.comm
     def _set_trigger_ac_line_slope(self, value):
         self._set_trigger_edge_slope(value)
     
-    def _measurement_fetch_waveform(self, index):
-        index = ivi.get_index(self._channel_name, index)
-        
-        if self._driver_operation_simulate:
-            return list()
-        
-        self._write(":waveform:byteorder msbfirst")
-        self._write(":waveform:unsigned 1")
-        self._write(":waveform:format word")
-        self._write(":waveform:points normal")
-        self._write(":waveform:source %s" % self._channel_name[index])
-        
-        # Read preamble
-        
-        pre = self._ask(":waveform:preamble?").split(',')
+    def _measurement_waveform_setup(self):
+        if not self._get_cache_valid('waveform_setup'):
+            self._write(":waveform:byteorder msbfirst")
+            self._write(":waveform:unsigned 1")
+            self._write(":waveform:format word")
+            self._write(":waveform:points normal")
+            self._set_cache_valid(True, 'waveform_setup')
+    
+    def _measurement_parse_waveform_preamble(self, pre, data_format='word', peak_detect=False):
+        pre = pre.split(',')
         
         format = int(pre[0])
         type = int(pre[1])
@@ -1329,36 +1379,320 @@ class agilentBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.comm
         yorigin = float(pre[8])
         yreference = int(float(pre[9]))
         
-        if type == 1:
+        # type 1 is peak detect, which returns min/max pairs
+        if (type == 1) != peak_detect:
             raise scope.InvalidAcquisitionTypeException()
         
-        if format != 1:
-            raise UnexpectedResponseException()
+        if format != self._waveform_format_mapping[data_format]:
+            raise ivi.UnexpectedResponseException()
         
-        self._write(":waveform:data?")
+        return (format, type, points, count, xincrement, xorigin, xreference,
+                yincrement, yorigin, yreference)
+    
+    def _measurement_decode_waveform_data(self, pre, raw_data, out=None):
+        format, type, points, count, xincrement, xorigin, xreference, yincrement, yorigin, yreference = pre
         
-        # Read waveform data
-        raw_data = raw_data = self._read_ieee_block()
+        # word data, 0 is the hole value
+        return scope.decode_waveform_data(raw_data, '>u2', yincrement, yorigin, yreference, 0, out)
+    
+    def _measurement_decode_waveform(self, index, pre, raw_data, out=None):
+        format, type, points, count, xincrement, xorigin, xreference, yincrement, yorigin, yreference = pre
+        
+        y = self._measurement_decode_waveform_data(pre, raw_data, out)
+        
+        return scope.Waveform(y, xincrement, xorigin, xreference,
+                              yincrement, yorigin, yreference, self._channel_name[index])
+    
+    def _measurement_fetch_waveform_raw(self, index):
+        if self._driver_operation_simulate:
+            return None, scope.Waveform(channel=self._channel_name[index])
         
-        # Split out points and convert to time and voltage pairs
+        if index >= self._analog_channel_count:
+            return super(agilentBaseScope, self)._measurement_fetch_waveform_raw(index)
         
-        data = list()
-        for i in range(points):
-            x = ((i - xreference) * xincrement) + xorigin
+        self._measurement_waveform_setup()
+        
+        source = self._channel_name[index]
+        
+        if self._get_cache_valid('waveform_preamble', index):
+            # preamble unchanged, select source and request data in one message
+            pre = self._waveform_preamble[index]
+            self._write(":waveform:source %s;data?" % source)
+            raw_data = self._read_ieee_block()
             
-            yval = struct.unpack(">H", raw_data[i*2:i*2+2])[0]
+            if len(raw_data) == pre[2] * 2:
+                return pre, raw_data
             
-            if yval == 0:
-                # hole value
-                y = float('nan')
+            # record length changed behind our back, so the preamble is stale
+            self._invalidate_waveform_preamble(index)
+        
+        pre = self._ask(":waveform:source %s;preamble?" % source)
+        pre = self._measurement_parse_waveform_preamble(pre)
+        self._waveform_preamble[index] = pre
+        self._set_cache_valid(True, 'waveform_preamble', index)
+        
+        self._write(":waveform:data?")
+        raw_data = self._read_ieee_block()
+        
+        return pre, raw_data
+    
+    def _measurement_fetch_waveform_raw_list(self, indices):
+        # request preamble and data for every channel in one compound message,
+        # the responses come back as a single message in the same order
+        self._measurement_waveform_setup()
+        
+        cached = [self._get_cache_valid('waveform_preamble', index) for index in indices]
+        
+        self._write(":" + ";:".join("waveform:source %s;%sdata?" % (self._channel_name[index], '' if valid else 'preamble?;')
+                              for index, valid in zip(indices, cached)))
+        resp = self._read_raw()
+        
+        records = list()
+        ind = 0
+        
+        for index, valid in zip(indices, cached):
+            if valid:
+                pre = self._waveform_preamble[index]
             else:
-                y = ((yval - yreference) * yincrement) + yorigin
+                end = resp.index(b';', ind)
+                pre = self._measurement_parse_waveform_preamble(resp[ind:end].decode('utf-8'))
+                self._waveform_preamble[index] = pre
+                self._set_cache_valid(True, 'waveform_preamble', index)
+                ind = end + 1
+            
+            # binary block #lnnnnnnnn, followed by ; or the terminator
+            ind = resp.index(b'#', ind)
+            l = int(resp[ind+1:ind+2])
+            num = int(resp[ind+2:ind+2+l].decode('utf-8'))
+            ind += 2 + l
+            raw_data = resp[ind:ind+num]
+            ind += num + 1
+            
+            if len(raw_data) != num:
+                raise ivi.UnexpectedResponseException()
+            
+            if len(raw_data) != pre[2] * 2:
+                # record length changed behind our back, so the preamble is stale
+                self._invalidate_waveform_preamble(index)
+                pre, raw_data = self._measurement_fetch_waveform_raw(index)
             
-            data.append((x, y))
+            records.append((pre, raw_data))
+        
+        return records
+    
+    def _measurement_fetch_waveform_data(self, index):
+        waveform = self._get_cached_waveform(index)
+        if waveform is None:
+            pre, raw_data = self._measurement_fetch_waveform_raw(index)
+            waveform = self._measurement_decode_waveform(index, pre, raw_data)
+            self._set_cached_waveform(index, waveform)
+        return waveform
+    
+    def _measurement_fetch_waveform(self, index):
+        index = ivi.get_index(self._channel_name, index)
+        
+        if self._driver_operation_simulate:
+            return scope.Waveform(channel=self._channel_name[index])
+        
+        if index >= self._analog_channel_count:
+            return self._measurement_digital_channel_waveform(index, self._measurement_fetch_digital_waveform())
+        
+        self._measurement_waveform_setup()
+        
+        return self._measurement_fetch_waveform_data(index)
+    
+    def _measurement_fetch_waveform_window(self, index, start, stop, step, max_points):
+        index = ivi.get_index(self._channel_name, index)
+        
+        if (self._driver_operation_simulate or not self._waveform_decimation
+                or index >= self._analog_channel_count or max_points is None
+                or start is not None or stop is not None or step is not None):
+            # no record windowing on the instrument, select on the host
+            return super(agilentBaseScope, self)._measurement_fetch_waveform_window(index, start, stop, step, max_points)
+        
+        # let the scope decimate the record to the requested number of points
+        self._measurement_waveform_setup()
+        self._write(":waveform:points %d" % max_points)
+        self._set_cache_valid(False, 'waveform_preamble', index)
+        
+        try:
+            pre, raw_data = self._measurement_fetch_waveform_raw(index)
+        finally:
+            # restore the full record for the regular fetch
+            self._set_cache_valid(False, 'waveform_setup')
+            self._set_cache_valid(False, 'waveform_preamble', index)
+        
+        waveform = self._measurement_decode_waveform(index, pre, raw_data)
+        
+        # the scope only supports certain point counts
+        return scope.window_waveform(waveform, max_points=max_points)
+    
+    def _measurement_fetch_waveforms(self, channels):
+        indices = [ivi.get_index(self._channel_name, ch) for ch in channels]
+        
+        data = dict()
+        
+        if self._driver_operation_simulate:
+            for ch, index in zip(channels, indices):
+                data[ch] = scope.Waveform(channel=self._channel_name[index])
+            return data
+        
+        self._measurement_waveform_setup()
+        
+        digital = None
+        analog = dict()
+        
+        for index in indices:
+            if index < self._analog_channel_count and index not in analog:
+                analog[index] = self._get_cached_waveform(index)
+        
+        fetch = [index for index in analog if analog[index] is None]
+        
+        if fetch:
+            for index, (pre, raw_data) in zip(fetch, self._measurement_fetch_waveform_raw_list(fetch)):
+                analog[index] = self._measurement_decode_waveform(index, pre, raw_data)
+                self._set_cached_waveform(index, analog[index])
+        
+        for ch, index in zip(channels, indices):
+            if index < self._analog_channel_count:
+                data[ch] = analog[index]
+        
+        for ch, index in zip(channels, indices):
+            if index >= self._analog_channel_count:
+                # all digital channels come from a single pod transfer
+                if digital is None:
+                    digital = self._measurement_fetch_digital_waveform()
+                data[ch] = self._measurement_digital_channel_waveform(index, digital)
         
         return data
     
+    def _measurement_fetch_time_tag(self):
+        if self._driver_operation_simulate or self._get_acquisition_sample_mode() != 'segmented':
+            return None
+        return self._get_acquisition_segmented_time_tag()
+    
+    def _measurement_fetch_waveforms_raw(self, indices):
+        records = list()
+        digital = None
+        analog = list()
+        
+        if not self._driver_operation_simulate:
+            analog = [index for index in indices if index < self._analog_channel_count]
+            analog = dict(zip(analog, self._measurement_fetch_waveform_raw_list(analog) if analog else []))
+        
+        for index in indices:
+            if index in analog:
+                records.append(analog[index])
+            elif self._driver_operation_simulate or index < self._analog_channel_count:
+                records.append(self._measurement_fetch_waveform_raw(index))
+            else:
+                # all digital channels come from a single pod transfer
+                if digital is None:
+                    digital = self._measurement_fetch_digital_waveform()
+                records.append((None, self._measurement_digital_channel_waveform(index, digital)))
+        
+        return records
+    
+    def _measurement_digital_channel_waveform(self, index, digital):
+        y = digital.bits[:, index - self._analog_channel_count].astype(float)
+        return scope.Waveform(y, digital.x_increment, digital.x_origin, digital.x_reference,
+                              channel=self._channel_name[index])
+    
+    def _measurement_fetch_digital_waveform(self):
+        if self._digital_channel_count == 0:
+            raise ivi.OperationNotSupportedException()
+        
+        pod_count = (self._digital_channel_count + 7) // 8
+        
+        if self._driver_operation_simulate:
+            return scope.DigitalWaveform(np.zeros((0, pod_count), dtype=np.uint8))
+        
+        waveform = self._get_cached_waveform('pod')
+        if waveform is not None:
+            return waveform
+        
+        self._measurement_waveform_setup()
+        self._write(":waveform:format byte")
+        # analog transfers need the word format setup again
+        self._set_cache_valid(False, 'waveform_setup')
+        
+        raw = None
+        
+        for k in range(pod_count):
+            pre = self._ask(":waveform:source pod%d;preamble?" % (k+1))
+            pre = self._measurement_parse_waveform_preamble(pre, 'byte')
+            
+            self._write(":waveform:data?")
+            raw_data = self._read_ieee_block()
+            
+            if raw is None:
+                raw = np.empty((len(raw_data), pod_count), dtype=np.uint8)
+            elif len(raw_data) != len(raw):
+                raise ivi.UnexpectedResponseException()
+            
+            raw[:, k] = np.frombuffer(raw_data, dtype=np.uint8)
+        
+        waveform = scope.DigitalWaveform(raw, pre[4], pre[5], pre[6])
+        self._set_cached_waveform('pod', waveform)
+        
+        return waveform
+    
+    def _measurement_fetch_segments(self, index, start=0, stop=None):
+        index = ivi.get_index(self._channel_name, index)
+        
+        if self._driver_operation_simulate:
+            return np.zeros((0, 0)), np.zeros(0)
+        
+        if stop is None:
+            stop = self._get_acquisition_segmented_acquired_count()
+        start = int(start)
+        stop = int(stop)
+        
+        if start < 0 or stop < start:
+            raise ivi.OutOfRangeException()
+        
+        self._measurement_waveform_setup()
+        
+        pre = self._ask(":waveform:source %s;preamble?" % self._channel_name[index])
+        pre = self._measurement_parse_waveform_preamble(pre)
+        points = pre[2]
+        
+        data = np.empty((stop - start, points))
+        time_tag = np.empty(stop - start)
+        
+        for k in range(stop - start):
+            # select the segment and query its time tag and data in one message;
+            # the response is "<time tag>;<data block>"
+            # segment indices are one-based
+            self._write(":acquire:segmented:index %d;:waveform:segmented:ttag?;:waveform:data?"
+                        % (start + k + 1))
+            tag, sep, block = self._read_raw().partition(b';')
+            raw_data = ivi.decode_ieee_block(block)
+            
+            if not sep or len(raw_data) != points * 2:
+                raise ivi.UnexpectedResponseException()
+            
+            time_tag[k] = float(tag)
+            self._measurement_decode_waveform_data(pre, raw_data, data[k])
+        
+        if stop > start:
+            # the instrument is left on the last segment
+            self._acquisition_segmented_index = stop
+            self._set_cache_valid(True, 'acquisition_segmented_index')
+            self._bump_acquisition_generation()
+        
+        return data, time_tag
+    
     def _measurement_read_waveform(self, index, maximum_time):
+        # :digitize holds off the parser until the acquisition is done, so
+        # start a single acquisition and poll the run bit instead
+        if not self._driver_operation_simulate:
+            self._write(":single")
+            self._set_cache_valid(False, 'trigger_continuous')
+        self._bump_acquisition_generation()
+        stopped = lambda: not int(self._ask(":oper:cond?")) & 1 << 3
+        if not self._driver_operation_wait_for(stopped, maximum_time=maximum_time):
+            raise ivi.MaxTimeoutExceededException()
         return self._measurement_fetch_waveform(index)
     
     def _measurement_initiate(self):
@@ -1366,6 +1700,7 @@ class agilentBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.comm
             self._write(":acquire:complete 100")
             self._write(":digitize")
             self._set_cache_valid(False, 'trigger_continuous')
+        self._bump_acquisition_generation()
     
     def _get_reference_level_high(self):
         return self._reference_level_high
@@ -1409,8 +1744,10 @@ class agilentBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.comm
                         self._reference_level_middle,
                         self._reference_level_low))
     
-    def _measurement_fetch_waveform_measurement(self, index, measurement_function, ref_channel = None):
-        index = ivi.get_index(self._channel_name, index)
+    def _measurement_query(self, index, measurement_function, ref_channel=None, query=True):
+        key = (index, measurement_function, ref_channel, query)
+        if key in self._measurement_query_cache:
+            return self._measurement_query_cache[key]
         if index < self._analog_channel_count:
             if measurement_function not in MeasurementFunctionMapping:
                 raise ivi.ValueNotSupportedException()
@@ -1419,19 +1756,104 @@ class agilentBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.comm
             if measurement_function not in MeasurementFunctionMappingDigital:
                 raise ivi.ValueNotSupportedException()
             func = MeasurementFunctionMappingDigital[measurement_function]
-        if not self._driver_operation_simulate:
-            l = func.split(' ')
+        l = func.split(' ')
+        if query:
             l[0] = l[0] + '?'
-            if len(l) > 1:
-                l[-1] = l[-1] + ','
-            func = ' '.join(l)
-            query = ":measure:%s %s" % (func, self._channel_name[index])
-            if measurement_function in ['ratio', 'phase', 'delay']:
-                ref_index = ivi.get_index(self._channel_name, ref_channel)
-                query += ", %s" % self._channel_name[ref_index]
+        if len(l) > 1:
+            l[-1] = l[-1] + ','
+        func = ' '.join(l)
+        cmd = ":measure:%s %s" % (func, self._channel_name[index])
+        if measurement_function in ['ratio', 'phase', 'delay']:
+            ref_index = ivi.get_index(self._channel_name, ref_channel)
+            cmd += ", %s" % self._channel_name[ref_index]
+        self._measurement_query_cache[key] = cmd
+        return cmd
+    
+    def _measurement_list_queries(self, measurement_list, query=True):
+        l = list()
+        for m in measurement_list:
+            index = ivi.get_index(self._channel_name, m[0])
+            ref_channel = m[2] if len(m) > 2 else None
+            l.append(self._measurement_query(index, m[1], ref_channel, query))
+        return l
+    
+    def _measurement_fetch_waveform_measurement(self, index, measurement_function, ref_channel = None):
+        index = ivi.get_index(self._channel_name, index)
+        query = self._measurement_query(index, measurement_function, ref_channel)
+        if not self._driver_operation_simulate:
             return float(self._ask(query))
         return 0
     
+    def _measurement_fetch_waveform_measurements(self, measurement_list, statistics=False, count=None):
+        if statistics or count is not None:
+            return self._measurement_fetch_statistics(measurement_list, count)
+        
+        queries = self._measurement_list_queries(measurement_list)
+        
+        if self._driver_operation_simulate:
+            return np.zeros(len(queries))
+        
+        # one compound query, the responses are separated by semicolons
+        res = self._ask(';'.join(queries)).split(';')
+        
+        if len(res) != len(queries):
+            raise ivi.UnexpectedResponseException()
+        
+        return np.array([float(v) for v in res])
+    
+    def _measurement_configure_statistics(self, measurement_list):
+        cmds = self._measurement_list_queries(measurement_list, False)
+        
+        if not self._driver_operation_simulate:
+            self._write(":measure:clear")
+            self._write(';'.join(cmds))
+            self._write(":measure:statistics on")
+            self._write(":measure:statistics:reset")
+        
+        self._measurement_statistics_list = cmds
+        self._set_cache_valid(True, 'measurement_statistics')
+    
+    def _measurement_fetch_statistics(self, measurement_list, count=None):
+        cmds = self._measurement_list_queries(measurement_list, False)
+        
+        if not self._get_cache_valid('measurement_statistics') or cmds != self._measurement_statistics_list:
+            self._measurement_configure_statistics(measurement_list)
+        
+        if count is not None:
+            count = int(count)
+            if count < 1:
+                raise ivi.OutOfRangeException()
+        
+        if self._driver_operation_simulate:
+            return np.zeros(len(cmds), dtype=scope.MeasurementStatisticsType)
+        
+        if count is not None:
+            # queue the acquisitions; :digitize holds off the results query until
+            # the last one is complete
+            self._write(":measure:statistics:reset")
+            self._write(":acquire:complete 100")
+            for k in range(count):
+                self._write(":digitize")
+            self._set_cache_valid(False, 'trigger_continuous')
+            self._bump_acquisition_generation()
+        
+        return self._measurement_parse_statistics(self._ask(":measure:results?"), len(cmds))
+    
+    def _measurement_parse_statistics(self, res, count):
+        # label, current, min, max, mean, std dev, count for each measurement
+        res = res.split(',')
+        
+        if len(res) < count * 7:
+            raise ivi.UnexpectedResponseException()
+        
+        data = np.zeros(count, dtype=scope.MeasurementStatisticsType)
+        
+        for k in range(count):
+            r = res[k*7+1:k*7+7]
+            data[k] = tuple([float(v) for v in r[:5]] + [int(float(r[5]))])
+        
+        return data
+    
     def _measurement_read_waveform_measurement(self, index, measurement_function, maximum_time):
         return self._measurement_fetch_waveform_measurement(index, measurement_function)
     
@@ -1441,10 +1863,30 @@ class agilentBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.comm
     def _set_acquisition_number_of_envelopes(self, value):
         self._acquisition_number_of_envelopes = value
     
+    def _measurement_trigger_event(self):
+        return bool(int(self._ask(":ter?")))
+    
     def _measurement_fetch_waveform_min_max(self, index):
-        index = ivi.get_index(self._channel_name, index)
-        data = list()
-        return data
+        index = ivi.get_index(self._analog_channel_name, index)
+        
+        if self._driver_operation_simulate:
+            return scope.EnvelopeWaveform(channel=self._channel_name[index])
+        
+        self._measurement_waveform_setup()
+        
+        pre = self._ask(":waveform:source %s;preamble?" % self._channel_name[index])
+        pre = self._measurement_parse_waveform_preamble(pre, peak_detect=True)
+        
+        format, type, points, count, xincrement, xorigin, xreference, yincrement, yorigin, yreference = pre
+        
+        self._write(":waveform:data?")
+        raw_data = self._read_ieee_block()
+        
+        # peak detect data is a sequence of interleaved min, max pairs
+        y_min, y_max = scope.split_min_max(self._measurement_decode_waveform_data(pre, raw_data))
+        
+        return scope.EnvelopeWaveform(y_min, y_max, xincrement, xorigin, xreference,
+                                      yincrement, yorigin, yreference, self._channel_name[index])
     
     def _measurement_read_waveform_min_max(self, index, maximum_time):
         return self._measurement_fetch_waveform_min_max(index)
@@ -1463,6 +1905,7 @@ class agilentBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.comm
             self._write(":%s" % t)
         self._trigger_continuous = value
         self._set_cache_valid()
+        self._bump_acquisition_generation()
     
     def _get_acquisition_number_of_averages(self):
         if not self._driver_operation_simulate and not self._get_cache_valid():
@@ -1492,10 +1935,12 @@ class agilentBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.comm
             self._write(":acquire:mode %s" % SampleModeMapping[value])
         self._acquisition_sample_mode = value
         self._set_cache_valid()
+        self._invalidate_waveform_preamble()
     
     def _measurement_auto_setup(self):
         if not self._driver_operation_simulate:
             self._write(":autoscale")
+        self._invalidate_waveform_preamble()
     
     
     
@@ -0,0 +1,126 @@
+"""
+
+Python Interchangeable Virtual Instrument Library
+
+Copyright (c) 2014 Alex Forencich
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+
+import unittest
+
+import numpy as np
+
+from ... import ivi
+from .. import agilent86140B
+
+class Virtual86140B(object):
+    "Agilent 86140B returning a stored trace in the selected data format"
+
+    def __init__(self):
+        self.read_buffer = b''
+        self.cmd_log = list()
+        self.trace = np.array([-60.0, -12.5, -3.25, -40.0])
+        self.vals = {
+            'format:data': 'ascii',
+            'sense:wavelength:start': '1.5E-06',
+            'sense:wavelength:stop': '1.6E-06',
+            'sense:sweep:points': '+4.00000000E+000',
+        }
+
+    def trace_data(self):
+        fmt = self.vals['format:data'].lower().replace(' ', '')
+        if fmt == 'real,32':
+            return ivi.build_ieee_block(self.trace.astype('>f4').tobytes())
+        if fmt == 'real,64':
+            return ivi.build_ieee_block(self.trace.astype('>f8').tobytes())
+        return ','.join('%+.8E' % v for v in self.trace).encode()
+
+    def write_raw(self, data):
+        header, sep, arg = data.decode().strip().partition(' ')
+        header = header.lower()
+        self.cmd_log.append(header)
+        if header == 'trace:data:y?':
+            self.read_buffer = self.trace_data() + b'\n'
+        elif header.endswith('?'):
+            self.read_buffer = (self.vals[header[:-1]] + '\n').encode()
+        else:
+            self.vals[header] = arg
+
+    def read_raw(self, num=-1):
+        data, self.read_buffer = self.read_buffer, b''
+        return data
+
+    def clear(self):
+        pass
+
+class TestAgilent86140B(unittest.TestCase):
+
+    def setUp(self):
+        self.osa = Virtual86140B()
+        self.driver = agilent86140B(self.osa)
+
+    def test_fetch_y(self):
+        y = self.driver.traces[0].fetch_y()
+        self.assertIsInstance(y, np.ndarray)
+        self.assertEqual(list(y), list(self.osa.trace))
+        self.assertEqual(self.osa.vals['format:data'], 'real,32')
+
+        # the data format is only sent when it changes
+        self.driver.traces[0].fetch_y()
+        self.assertEqual(self.osa.cmd_log.count('format:data'), 1)
+
+        for fmt in ('real64', 'ascii'):
+            self.driver.acquisition.data_format = fmt
+            self.assertEqual(list(self.driver.traces[0].fetch_y()), list(self.osa.trace))
+        self.assertEqual(self.osa.cmd_log.count('format:data'), 3)
+        self.assertRaises(ivi.ValueNotSupportedException, setattr,
+                          self.driver.acquisition, 'data_format', 'real16')
+
+    def test_fetch_xy(self):
+        x = self.driver.traces[0].fetch_x()
+        np.testing.assert_allclose(x, np.linspace(1.5e-6, 1.6e-6, 4))
+
+        n = len(self.osa.cmd_log)
+        x, y = self.driver.traces[0].fetch_xy()
+        np.testing.assert_allclose(x, np.linspace(1.5e-6, 1.6e-6, 4))
+        self.assertEqual(list(y), list(self.osa.trace))
+        # the axis comes from the cached settings
+        self.assertEqual(self.osa.cmd_log[n:], ['format:data', 'trace:data:y?'])
+
+    def test_number_of_points(self):
+        self.assertEqual(self.driver.acquisition.number_of_points, 4)
+        self.driver.acquisition.number_of_points = 2001
+        self.assertEqual(self.osa.vals['sense:sweep:points'], '2001')
+        self.assertEqual(self.driver.acquisition.number_of_points, 2001)
+        self.assertRaises(ivi.OutOfRangeException, setattr,
+                          self.driver.acquisition, 'number_of_points', 2)
+        self.assertRaises(ivi.OutOfRangeException, setattr,
+                          self.driver.acquisition, 'number_of_points', 20002)
+
+    def test_simulate(self):
+        driver = agilent86140B(simulate=True)
+        y = driver.traces[0].fetch_y()
+        self.assertIsInstance(y, np.ndarray)
+        self.assertEqual(len(y), 0)
+
+if __name__ == '__main__':
+    unittest.main()
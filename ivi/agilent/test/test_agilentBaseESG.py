@@ -0,0 +1,201 @@
+"""
+
+Python Interchangeable Virtual Instrument Library
+
+Copyright (c) 2014 Alex Forencich
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+
+import unittest
+
+import numpy as np
+
+from ... import ivi
+from .. import agilentE4433B
+
+class VirtualESG(object):
+    "Agilent ESG keeping the files written to its memory"
+
+    def __init__(self):
+        self.read_buffer = b''
+        self.cmd_log = list()
+        self.files = dict()
+        self.vals = dict()
+        self.fail_after = None
+
+    def write_raw(self, data):
+        if self.fail_after is not None:
+            if self.fail_after == 0:
+                raise IOError()
+            self.fail_after -= 1
+        header, sep, arg = data.partition(b' ')
+        if header.lower().lstrip(b':') in (b'mmemory:data', b'mmemory:data:append'):
+            header = header.decode().lower().lstrip(':')
+            self.cmd_log.append(header)
+            name, sep, block = arg.partition(b',')
+            name = name.decode().strip('"')
+            if header == 'mmemory:data':
+                self.files[name] = b''
+            self.files[name] += ivi.decode_ieee_block(block.lstrip())
+            return
+        for part in data.decode().strip().split(';'):
+            header, sep, arg = part.strip().partition(' ')
+            header = header.lower().lstrip(':')
+            self.cmd_log.append(header)
+            if header.endswith('?'):
+                self.read_buffer = (self.vals[header[:-1]] + '\n').encode()
+            else:
+                self.vals[header] = arg.strip()
+
+    def read_raw(self, num=-1):
+        data, self.read_buffer = self.read_buffer, b''
+        return data
+
+    def clear(self):
+        pass
+
+class TestAgilentBaseESGD(unittest.TestCase):
+
+    def setUp(self):
+        self.esg = VirtualESG()
+        self.siggen = agilentE4433B(self.esg)
+
+    def test_stream_chunks(self):
+        i = np.linspace(-1, 1, 10)
+        q = -i
+        arb = self.siggen.digital_modulation.arb
+        for chunk_size, writes in ((4, 3), (5, 2), (10, 1)):
+            self.esg.cmd_log = list()
+            arb.stream_waveform('wfm', i, q, chunk_size)
+            self.assertEqual(self.esg.files['ARBI:wfm'], ivi.quantize_waveform(i, 14))
+            self.assertEqual(self.esg.files['ARBQ:wfm'], ivi.quantize_waveform(q, 14))
+            # one create and appends for the remaining chunks, no empty chunk
+            self.assertEqual(self.esg.cmd_log.count('mmemory:data'), 2)
+            self.assertEqual(self.esg.cmd_log.count('mmemory:data:append'), 2 * (writes - 1))
+
+        # chunk pairs from a generator
+        arb.stream_waveform('gen', ((i[k:k+2], q[k:k+2]) for k in range(0, 10, 2)))
+        self.assertEqual(self.esg.files['ARBQ:gen'], ivi.quantize_waveform(q, 14))
+
+    def test_stream_error(self):
+        arb = self.siggen.digital_modulation.arb
+        # odd length is rejected on the last chunk
+        self.assertRaises(ivi.ValueNotSupportedException, arb.stream_waveform,
+                          'wfm', np.zeros(9), np.zeros(9), 4)
+        self.assertEqual(self.siggen._digital_modulation_arb_pending, dict())
+
+        # an I/O error ends the pending write, the next write creates the files
+        self.esg.fail_after = 3
+        self.assertRaises(IOError, arb.stream_waveform, 'wfm', np.zeros(8), np.zeros(8), 2)
+        self.assertEqual(self.siggen._digital_modulation_arb_pending, dict())
+        self.esg.fail_after = None
+        self.esg.cmd_log = list()
+        arb.write_waveform('wfm', np.ones(4), np.ones(4))
+        self.assertEqual(self.esg.cmd_log, ['mmemory:data', 'mmemory:data'])
+        self.assertEqual(len(self.esg.files['ARBI:wfm']), 8)
+
+class TestAgilentBaseESG(unittest.TestCase):
+
+    def setUp(self):
+        self.esg = VirtualESG()
+        self.siggen = agilentE4433B(self.esg)
+
+    def test_list_upload(self):
+        sweep = self.siggen.sweep
+        frequency = np.linspace(1e9, 2e9, 11)
+        power = np.linspace(-10, 0, 11)
+        sweep.list.create_frequency_power('a', frequency, power)
+        sweep.list.create_frequency('b', [1e9, 1.5e9])
+        sweep.list.selected_list = 'a'
+        self.assertNotIn('list:frequency', self.esg.vals)
+
+        sweep.mode = 'list'
+        # the whole list in one message
+        self.assertEqual(self.esg.cmd_log[:2], ['list:frequency', 'list:power'])
+        self.assertEqual(self.esg.vals['list:type'], 'list')
+        self.assertEqual([float(f) for f in self.esg.vals['list:frequency'].split(',')], list(frequency))
+        self.assertEqual([float(p) for p in self.esg.vals['list:power'].split(',')], list(power))
+        self.assertEqual(self.esg.vals['frequency:mode'], 'list')
+        self.assertEqual(self.esg.vals['power:mode'], 'list')
+
+        # a list that is already loaded is not sent again
+        self.esg.cmd_log = list()
+        sweep.list.selected_list = 'a'
+        self.assertNotIn('list:frequency', self.esg.cmd_log)
+
+        sweep.list.selected_list = 'b'
+        self.assertEqual(self.esg.vals['list:frequency'], '1000000000,1500000000')
+        self.assertEqual(self.esg.vals['power:mode'], 'fixed')
+
+        sweep.mode = 'none'
+        self.assertEqual(self.esg.vals['frequency:mode'], 'cw')
+        self.assertEqual(self.esg.vals['power:mode'], 'fixed')
+
+    def test_list_limits(self):
+        create = self.siggen.sweep.list.create_frequency
+        self.assertRaises(ivi.OutOfRangeException, create, 'a', np.full(1602, 1e9))
+        self.assertRaises(ivi.OutOfRangeException, create, 'a', [1e3])
+        self.assertRaises(ivi.ValueNotSupportedException,
+                          self.siggen.sweep.list.create_frequency_power, 'a', [1e9], [0, 1])
+        self.assertRaises(ivi.ValueNotSupportedException, setattr,
+                          self.siggen.sweep.list, 'selected_list', 'none')
+
+    def test_sweep_mode(self):
+        sweep = self.siggen.sweep
+        self.assertRaises(ivi.ValueNotSupportedException, setattr, sweep, 'mode', 'bogus')
+        self.assertRaises(ivi.OperationNotSupportedException, setattr, sweep, 'mode', 'frequency_sweep')
+        self.assertRaises(ivi.OperationNotSupportedException, setattr, sweep, 'mode', 'power_sweep')
+
+        sweep.mode = 'frequency_step'
+        self.assertEqual(self.esg.vals['list:type'], 'step')
+        self.assertEqual(self.esg.vals['frequency:mode'], 'list')
+        self.assertEqual(self.esg.vals['power:mode'], 'fixed')
+        sweep.mode = 'power_step'
+        self.assertEqual(self.esg.vals['list:type'], 'step')
+        self.assertEqual(self.esg.vals['frequency:mode'], 'cw')
+        self.assertEqual(self.esg.vals['power:mode'], 'list')
+
+        # a list applied after a step sweep selects the list type again
+        sweep.list.create_frequency('a', [1e9, 1.5e9])
+        sweep.list.selected_list = 'a'
+        sweep.mode = 'list'
+        self.assertEqual(self.esg.vals['list:type'], 'list')
+        sweep.mode = 'frequency_step'
+        sweep.mode = 'list'
+        self.assertEqual(self.esg.vals['list:type'], 'list')
+        self.assertEqual(self.esg.cmd_log.count('list:frequency'), 1)
+        self.assertRaises(ivi.ValueNotSupportedException, setattr, sweep, 'trigger_source', 'bogus')
+
+        sweep.trigger_source = 'external'
+        self.assertEqual(self.esg.vals['trigger:source'], 'ext')
+        # single step points wait for a software trigger
+        sweep.list.single_step_enabled = True
+        self.assertEqual(self.esg.vals['list:trigger:source'], 'bus')
+        sweep.list.single_step_enabled = False
+        self.assertEqual(self.esg.vals['list:trigger:source'], 'imm')
+
+        sweep.list.dwell = 0.01
+        self.assertEqual(self.esg.vals['list:dwell:type'], 'step')
+        self.assertEqual(float(self.esg.vals['sweep:dwell']), 0.01)
+
+if __name__ == '__main__':
+    unittest.main()
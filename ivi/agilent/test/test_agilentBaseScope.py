@@ -0,0 +1,345 @@
+"""
+
+Python Interchangeable Virtual Instrument Library
+
+Copyright (c) 2014 Alex Forencich
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+
+import struct
+import unittest
+
+import numpy as np
+
+from ... import ivi
+from ... import scope
+from .. import agilentMSO7104A
+from .. import agilentDSA90254A
+from .. import agilentDSOX3014A
+
+def ieee_block(data):
+    return ivi.build_ieee_block(data)
+
+class VirtualScope(object):
+    "Agilent scope answering compound SCPI messages from a table of values"
+
+    def __init__(self, points=4):
+        self.read_buffer = b''
+        self.cmd_log = list()
+        self.points = points
+        self.segments = [np.arange(points) + 10 * k for k in range(3)]
+        self.vals = {
+            'waveform:source': 'chan1',
+            'acquire:segmented:index': '1',
+            'waveform:segmented:count': lambda: str(len(self.segments)).encode(),
+            'waveform:segmented:ttag': lambda: ('%e' % (self.segment * 1e-3)).encode(),
+            'waveform:preamble': self.preamble,
+            'waveform:data': self.data,
+            'oper:cond': '0',
+            'acquire:mode': 'rtim',
+        }
+
+    @property
+    def step(self):
+        # :waveform:points n decimates the record to n points
+        points = self.vals.get('waveform:points', 'normal')
+        return self.points // int(points) if points.isdigit() else 1
+
+    def preamble(self):
+        if self.vals['waveform:source'].startswith('pod'):
+            return ('0,0,%d,1,1e-9,-1e-6,0,1,0,0' % self.points).encode()
+        return ('1,0,%d,1,%e,-1e-6,0,0.5,0,0' % (self.points // self.step, 1e-9 * self.step)).encode()
+
+    def data(self):
+        source = self.vals['waveform:source']
+        if source.startswith('pod'):
+            # pod n reads back as n in every sample
+            return ieee_block(struct.pack('%dB' % self.points, *([int(source[3:])] * self.points)))
+        data = self.segments[self.segment][::self.step]
+        return ieee_block(struct.pack('>%dH' % len(data), *data))
+
+    @property
+    def segment(self):
+        return int(self.vals['acquire:segmented:index']) - 1
+
+    def write_raw(self, data):
+        path = ''
+        response = list()
+        # binary data follows the header of the last command
+        data, mark, block = data.partition(b'#')
+        for part in data.decode().strip().split(';'):
+            header, sep, arg = part.strip().partition(' ')
+            header = header.lower()
+            if header.startswith('*'):
+                name = header
+            elif header.startswith(':'):
+                name = header[1:]
+            else:
+                name = path + header
+            if not header.startswith('*'):
+                path = name.rpartition(':')[0] + ':' if ':' in name else ''
+            self.cmd_log.append(name)
+            if name.endswith('?'):
+                val = self.vals[name[:-1]]
+                response.append(val() if callable(val) else val.encode())
+            else:
+                self.vals[name] = ivi.decode_ieee_block(mark + block) if mark else arg
+        if response:
+            self.read_buffer = b';'.join(response) + b'\n'
+
+    def read_raw(self, num=-1):
+        data, self.read_buffer = self.read_buffer, b''
+        return data
+
+    def clear(self):
+        pass
+
+class TestAgilentBaseScope(unittest.TestCase):
+
+    def setUp(self):
+        self.vscope = VirtualScope()
+        self.scope = agilentMSO7104A(self.vscope)
+
+    def test_fetch_segments(self):
+        self.scope._acquisition_segmented_index = 1
+        self.scope._set_cache_valid(True, 'acquisition_segmented_index')
+        data, time_tag = self.scope.measurement.fetch_segments(0, 1)
+
+        self.assertEqual(data.shape, (2, 4))
+        self.assertEqual(list(data[1]), list(0.5 * (np.arange(4) + 20)))
+        self.assertEqual(list(time_tag), [1e-3, 2e-3])
+        # one message per segment
+        self.assertEqual(self.vscope.cmd_log.count('acquire:segmented:index'), 2)
+        self.assertEqual(self.vscope.cmd_log.count('waveform:segmented:ttag?'), 2)
+
+        # the cached segment index follows the instrument
+        n = len(self.vscope.cmd_log)
+        self.assertEqual(self.scope.acquisition.segmented.index, 3)
+        self.assertEqual(len(self.vscope.cmd_log), n)
+
+    def test_stream_digital_channels(self):
+        with self.scope.measurement.stream_waveforms(['digital0', 'digital9', 'channel1'], count=2) as stream:
+            records = list(stream)
+
+        self.assertEqual(len(records), 2)
+        # pod 1 reads 1 (digital0 high), pod 2 reads 2 (digital9 high)
+        self.assertEqual(list(records[0]['digital0'].y), [1.0] * 4)
+        self.assertEqual(list(records[0]['digital9'].y), [1.0] * 4)
+        self.assertEqual(list(records[1]['channel1'].y[1:]), [0.5, 1.0, 1.5])
+        # the pods are transferred once per acquisition, not once per channel
+        self.assertEqual(self.vscope.cmd_log.count('digitize'), 2)
+        self.assertEqual(self.vscope.cmd_log.count('waveform:preamble?'), 2 * 2 + 1)
+
+    def test_waveform_cache(self):
+        log = self.vscope.cmd_log
+        self.scope.channels['channel1'].measurement.fetch_waveform()
+        self.scope.channels['channel2'].measurement.fetch_waveform()
+        self.assertEqual(log.count('waveform:data?'), 2)
+
+        # setting up channel 2 only drops the waveform of channel 2
+        self.scope.channels['channel2'].offset = 1.0
+        w = self.scope.channels['channel1'].measurement.fetch_waveform()
+        self.assertEqual(log.count('waveform:data?'), 2)
+        self.scope.channels['channel2'].measurement.fetch_waveform()
+        self.assertEqual(log.count('waveform:data?'), 3)
+
+        # the cached samples cannot be modified by the caller
+        self.assertRaises(ValueError, w.y.__setitem__, 1, 0.0)
+
+        # a new acquisition fetches both channels again
+        self.scope.measurement.initiate()
+        self.scope.channels['channel1'].measurement.fetch_waveform()
+        self.assertEqual(log.count('waveform:data?'), 4)
+
+    def test_setting_requeries_preamble(self):
+        log = self.vscope.cmd_log
+        settings = [
+            (1, lambda: setattr(self.scope.channels['channel2'], 'invert', True)),
+            (1, lambda: setattr(self.scope.channels['channel2'], 'bw_limit', True)),
+            (1, lambda: setattr(self.scope.channels['channel2'], 'coupling', 'ac')),
+            (2, lambda: setattr(self.scope.acquisition, 'sample_mode', 'equivalent_time')),
+        ]
+        for count, change in settings:
+            self.scope.measurement.fetch_waveforms(['channel1', 'channel2'])
+            self.scope.measurement.initiate()
+            change()
+            del log[:]
+            self.scope.measurement.fetch_waveforms(['channel1', 'channel2'])
+            # only the channels the setting applies to ask for the preamble again
+            self.assertEqual(log.count('waveform:preamble?'), count)
+
+    def test_fetch_waveform_window(self):
+        self.vscope = VirtualScope(100)
+        self.scope = agilentMSO7104A(self.vscope)
+        log = self.vscope.cmd_log
+        messages = list()
+        write_raw = self.vscope.write_raw
+        def log_message(data):
+            messages.append(data)
+            write_raw(data)
+        self.vscope.write_raw = log_message
+
+        w = self.scope.channels['channel1'].measurement.fetch_waveform(max_points=10)
+        self.assertIn(b':waveform:points 10', messages)
+        self.assertEqual(len(w.y), 10)
+        self.assertEqual(list(w.y[1:4]), [5.0, 10.0, 15.0])
+        self.assertAlmostEqual(w.x_increment, 1e-8)
+        self.assertEqual(w.x_origin, -1e-6)
+
+        # the regular fetch goes back to the full record
+        del messages[:]
+        del log[:]
+        w = self.scope.channels['channel1'].measurement.fetch_waveform()
+        self.assertIn(b':waveform:points normal', messages)
+        self.assertEqual(log.count('waveform:preamble?'), 1)
+        self.assertEqual(len(w.y), 100)
+        self.assertAlmostEqual(w.x_increment, 1e-9)
+
+    def test_fetch_waveforms(self):
+        log = self.vscope.cmd_log
+        messages = list()
+        write_raw = self.vscope.write_raw
+        def log_message(data):
+            messages.append(data)
+            write_raw(data)
+        self.vscope.write_raw = log_message
+
+        self.scope.channels['channel2'].measurement.fetch_waveform()
+        self.scope.measurement.initiate()
+        del messages[:]
+        del log[:]
+        data = self.scope.measurement.fetch_waveforms(['channel1', 'channel2', 'channel3'])
+
+        # all analog channels in one message, the preamble only where it is not cached
+        messages = [m for m in messages if b'waveform' in m]
+        self.assertEqual(len(messages), 1)
+        log = [name for name in log if name.startswith('waveform')]
+        self.assertEqual(log, ['waveform:source', 'waveform:preamble?', 'waveform:data?',
+                               'waveform:source', 'waveform:data?',
+                               'waveform:source', 'waveform:preamble?', 'waveform:data?'])
+        for ch in ('channel1', 'channel2', 'channel3'):
+            self.assertEqual(data[ch].channel, ch)
+            self.assertEqual(list(data[ch].y[1:]), [0.5, 1.0, 1.5])
+            self.assertEqual(data[ch].x_increment, 1e-9)
+
+        # served from the cache until the next acquisition
+        del messages[:]
+        self.scope.measurement.fetch_waveforms(['channel1', 'channel3'])
+        self.assertFalse([m for m in messages if b'waveform' in m])
+
+    def test_read_waveform(self):
+        # running for two polls, then stopped
+        polls = [b'8', b'8', b'0']
+        self.vscope.vals['oper:cond'] = lambda: polls.pop(0) if len(polls) > 1 else polls[0]
+        w = self.scope.channels['channel1'].measurement.read_waveform(1.0)
+        self.assertEqual(list(w.y[1:]), [0.5, 1.0, 1.5])
+        log = self.vscope.cmd_log
+        # the parser is never blocked by :digitize
+        self.assertNotIn('digitize', log)
+        self.assertEqual(log.count('oper:cond?'), 3)
+        self.assertTrue(log.index('single') < log.index('waveform:data?'))
+
+        polls[:] = [b'8']
+        self.assertRaises(ivi.MaxTimeoutExceededException,
+                          self.scope.channels['channel1'].measurement.read_waveform, 0.01)
+
+    def test_measurement_query(self):
+        query = self.scope._measurement_query
+        self.assertEqual(query(0, 'rise_time'), ":measure:risetime? channel1")
+        self.assertEqual(query(1, 'voltage_rms'), ":measure:vrms? display, channel2")
+        self.assertEqual(query(0, 'phase', 'channel2'), ":measure:phase? channel1, channel2")
+        self.assertEqual(query(0, 'rise_time', query=False), ":measure:risetime channel1")
+        self.assertRaises(ivi.ValueNotSupportedException, query, 0, 'bogus')
+
+    def test_parse_statistics(self):
+        res = ("Rise time(1),1.0E-09,9.0E-10,1.2E-09,1.05E-09,5.0E-11,+10,"
+               "Frequency(2),1.0E+06,9.9E+05,1.01E+06,1.0E+06,1.0E+03,+10")
+        data = self.scope._measurement_parse_statistics(res, 2)
+        self.assertEqual(data['max'][0], 1.2e-9)
+        self.assertEqual(data['mean'][1], 1e6)
+        self.assertEqual(list(data['count']), [10, 10])
+        self.assertRaises(ivi.UnexpectedResponseException,
+                          self.scope._measurement_parse_statistics, res, 3)
+
+    def test_fetch_measurements(self):
+        self.vscope.vals['measure:risetime'] = '1.0E-09'
+        self.vscope.vals['measure:phase'] = '9.0E+01'
+        values = self.scope.measurement.fetch_waveform_measurements(
+                [('channel1', 'rise_time'), ('channel1', 'phase', 'channel2')])
+        self.assertEqual(list(values), [1e-9, 90.0])
+
+    def test_statistics_count(self):
+        self.vscope.vals['measure:results'] = "Rise time(1),1,0,2,1,0.5,+3"
+        data = self.scope.measurement.fetch_waveform_measurements(
+                [('channel1', 'rise_time')], count=3)
+        self.assertEqual(data['count'][0], 3)
+        log = self.vscope.cmd_log
+        results = log.index('measure:results?')
+        self.assertEqual(log[:results].count('digitize'), 3)
+        self.assertTrue(log.index('measure:statistics:reset') < log.index('digitize'))
+
+class TestAgilent3000A(unittest.TestCase):
+
+    def setUp(self):
+        self.vscope = VirtualScope()
+        self.scope = agilentDSOX3014A(self.vscope)
+
+    def test_arbitrary_byte_order(self):
+        create = self.scope.arbitrary.waveform.create_channel_waveform_int16
+        y = np.array([-511, 0, 511], dtype='>i2')
+        create(0, y)
+        self.assertEqual(self.vscope.vals['wgen:arbitrary:bytorder'], 'msbfirst')
+        self.assertEqual(self.vscope.vals['wgen:arbitrary:data:dac'], y.tobytes())
+
+        # unsigned data is offset binary and shifted to signed codes
+        create(0, np.array([1, 512, 1023], dtype='<u2'))
+        self.assertEqual(self.vscope.vals['wgen:arbitrary:bytorder'], 'lsbfirst')
+        self.assertEqual(self.vscope.vals['wgen:arbitrary:data:dac'],
+                         np.array([-511, 0, 511], dtype='<i2').tobytes())
+
+        # codes outside the 10 bit DAC range
+        self.assertRaises(ivi.ValueNotSupportedException, create, 0, np.array([0, 1024], dtype='<u2'))
+        self.assertRaises(ivi.ValueNotSupportedException, create, 0, np.array([-513, 0], dtype='>i2'))
+        self.assertRaises(ivi.ValueNotSupportedException, create, 0, np.array([512, 0], dtype='<i2'))
+
+        # the float data is LSB first whatever the int16 path left selected
+        create(0, y)
+        self.scope.arbitrary.waveform.create_channel_waveform(0, np.array([-1.0, 0.5]))
+        self.assertEqual(self.vscope.vals['wgen:arbitrary:bytorder'], 'lsbfirst')
+        self.assertEqual(self.vscope.vals['wgen:arbitrary:data'], struct.pack('<2f', -1.0, 0.5))
+
+class TestAgilentBaseInfiniium(unittest.TestCase):
+
+    def setUp(self):
+        self.scope = agilentDSA90254A(VirtualScope())
+
+    def test_preamble_acquisition_type(self):
+        raw = '2,1,4,1,1e-9,-1e-6,0,0.5,0,0'
+        pdet = '2,10,4,1,1e-9,-1e-6,0,0.5,0,0'
+        parse = self.scope._measurement_parse_waveform_preamble
+        self.assertEqual(parse(raw)[2], 4)
+        self.assertEqual(parse(pdet, peak_detect=True)[1], 10)
+        self.assertRaises(scope.InvalidAcquisitionTypeException, parse, raw, peak_detect=True)
+        self.assertRaises(scope.InvalidAcquisitionTypeException, parse, pdet)
+
+if __name__ == '__main__':
+    unittest.main()
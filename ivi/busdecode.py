@@ -0,0 +1,201 @@
+"""
+
+Python Interchangeable Virtual Instrument Library
+
+Copyright (c) 2014 Alex Forencich
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import numpy as np
+
+from . import ivi
+from . import scope
+
+Parity = set(['none', 'odd', 'even'])
+BitOrder = set(['msb_first', 'lsb_first'])
+
+UARTFrameType = np.dtype([('time', float), ('data', np.uint16),
+                          ('parity_error', bool), ('framing_error', bool)])
+SPIFrameType = np.dtype([('time', float), ('mosi', np.uint32), ('miso', np.uint32)])
+I2CFrameType = np.dtype([('time', float), ('data', np.uint8), ('ack', bool), ('start', bool)])
+
+def _logic(data, threshold):
+    "Logic states of a Waveform, boolean array or analog array"
+    if isinstance(data, scope.Waveform):
+        data = data.y
+    x = np.asarray(data)
+    if x.dtype != bool:
+        x = x > threshold
+    return x
+
+def _timebase(data, dt):
+    "Sample interval and time of the first sample"
+    if isinstance(data, scope.Waveform):
+        return (data.x_increment if dt is None else dt,
+                data.x_origin - data.x_reference * data.x_increment)
+    return (1.0 if dt is None else dt, 0.0)
+
+def _rising(x):
+    return np.flatnonzero(~x[:-1] & x[1:]) + 1
+
+def _falling(x):
+    return np.flatnonzero(x[:-1] & ~x[1:]) + 1
+
+def _pack(bits, bit_order):
+    "Pack a (words, bits) boolean matrix into integers"
+    n = bits.shape[1]
+    if bit_order == 'msb_first':
+        weight = 1 << np.arange(n - 1, -1, -1, dtype=np.uint64)
+    else:
+        weight = 1 << np.arange(n, dtype=np.uint64)
+    return bits.astype(np.uint64).dot(weight)
+
+
+def decode_uart(data, baud_rate, data_bits=8, parity='none', stop_bits=1,
+                bit_order='lsb_first', idle_high=True, dt=None, threshold=0.5):
+    """Decode asynchronous serial frames from one logic channel
+    
+    data is a scope Waveform, a boolean array or an analog array compared
+    against threshold.  dt defaults to the waveform x_increment.  Returns a
+    UARTFrameType structured array with the time of each start bit."""
+    if parity not in Parity or bit_order not in BitOrder:
+        raise ivi.ValueNotSupportedException()
+    x = _logic(data, threshold)
+    if not idle_high:
+        x = ~x
+    dt, t0 = _timebase(data, dt)
+    spb = 1.0 / (baud_rate * dt)
+    nbits = 1 + data_bits + (parity != 'none') + stop_bits
+    
+    # start bit candidates, dropping those too close to the end of the record
+    edges = _falling(x)
+    edges = edges[edges + (nbits - 0.5) * spb < len(x)]
+    if not len(edges):
+        return np.zeros(0, dtype=UARTFrameType)
+    
+    # the next frame can only start after the middle of the stop bit; walking
+    # the chain of frames is one step per frame, not per sample
+    following = np.searchsorted(edges, edges + (nbits - 0.5) * spb, 'left')
+    following = following.tolist()
+    chain = []
+    i = 0
+    while i < len(edges):
+        chain.append(i)
+        i = following[i]
+    start = edges[chain]
+    
+    # sample all bits of all frames at once
+    pos = start[:, np.newaxis] + ((np.arange(1, nbits) + 0.5) * spb).astype(np.intp)
+    bits = x[pos]
+    frames = np.zeros(len(start), dtype=UARTFrameType)
+    frames['time'] = t0 + start * dt
+    frames['data'] = _pack(bits[:, :data_bits], bit_order)
+    if parity != 'none':
+        ones = bits[:, :data_bits + 1].sum(axis=1)
+        frames['parity_error'] = (ones % 2 == 1) != (parity == 'odd')
+    frames['framing_error'] = ~bits[:, nbits - 1 - stop_bits:].all(axis=1)
+    return frames
+
+
+def decode_spi(clock, mosi=None, miso=None, select=None, mode=0, word_bits=8,
+               bit_order='msb_first', select_active_low=True, dt=None, threshold=0.5):
+    """Decode SPI words from clock, data and optional chip select channels
+    
+    mode is the SPI mode 0-3 selecting the clock polarity and phase.  Words
+    restart at each chip select assertion and incomplete words are dropped.
+    Returns an SPIFrameType structured array with the time of the first clock
+    edge of each word."""
+    if mode not in (0, 1, 2, 3) or bit_order not in BitOrder:
+        raise ivi.ValueNotSupportedException()
+    clk = _logic(clock, threshold)
+    dt, t0 = _timebase(clock, dt)
+    
+    # modes 0 and 3 sample on the rising edge, 1 and 2 on the falling edge
+    edges = _rising(clk) if mode in (0, 3) else _falling(clk)
+    
+    if select is not None:
+        cs = _logic(select, threshold)
+        if select_active_low:
+            cs = ~cs
+        edges = edges[cs[edges]]
+        group = np.searchsorted(_rising(cs), edges, 'right')
+    else:
+        group = np.zeros(len(edges), dtype=np.intp)
+    
+    # position of every edge within its chip select window
+    first = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+    rank = np.arange(len(edges)) - np.repeat(first, np.diff(np.r_[first, len(edges)]))
+    word_start = np.flatnonzero(rank % word_bits == 0)
+    # keep complete words only
+    word_start = word_start[word_start + word_bits - 1 < len(edges)]
+    word_start = word_start[group[word_start] == group[word_start + word_bits - 1]]
+    pos = edges[word_start[:, np.newaxis] + np.arange(word_bits)]
+    
+    frames = np.zeros(len(word_start), dtype=SPIFrameType)
+    frames['time'] = t0 + edges[word_start] * dt
+    if mosi is not None:
+        frames['mosi'] = _pack(_logic(mosi, threshold)[pos], bit_order)
+    if miso is not None:
+        frames['miso'] = _pack(_logic(miso, threshold)[pos], bit_order)
+    return frames
+
+
+def decode_i2c(clock, data, dt=None, threshold=0.5):
+    """Decode I2C bytes from the SCL and SDA channels
+    
+    Every byte is returned with its acknowledge bit.  The first byte after a
+    start or repeated start condition is the address byte and has start set.
+    Returns an I2CFrameType structured array with the time of the first clock
+    edge of each byte."""
+    scl = _logic(clock, threshold)
+    sda = _logic(data, threshold)
+    dt, t0 = _timebase(clock, dt)
+    
+    # start and stop conditions are SDA edges while SCL is high
+    starts = _falling(sda)
+    starts = starts[scl[starts] & scl[starts - 1]]
+    stops = _rising(sda)
+    stops = stops[scl[stops] & scl[stops - 1]]
+    edges = _rising(scl)
+    
+    # the latest condition before each clock edge must be a start
+    last_start = np.searchsorted(starts, edges, 'right') - 1
+    last_stop = np.searchsorted(stops, edges, 'right') - 1
+    start_pos = np.where(last_start >= 0, starts[np.maximum(last_start, 0)], -1)
+    stop_pos = np.where(last_stop >= 0, stops[np.maximum(last_stop, 0)], -1)
+    active = (last_start >= 0) & (start_pos > stop_pos)
+    edges = edges[active]
+    group = last_start[active]
+    
+    first = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+    rank = np.arange(len(edges)) - np.repeat(first, np.diff(np.r_[first, len(edges)]))
+    byte_start = np.flatnonzero(rank % 9 == 0)
+    # keep complete bytes only
+    byte_start = byte_start[byte_start + 8 < len(edges)]
+    byte_start = byte_start[group[byte_start] == group[byte_start + 8]]
+    bits = sda[edges[byte_start[:, np.newaxis] + np.arange(9)]]
+    
+    frames = np.zeros(len(byte_start), dtype=I2CFrameType)
+    frames['time'] = t0 + edges[byte_start] * dt
+    frames['data'] = _pack(bits[:, :8], 'msb_first')
+    frames['ack'] = ~bits[:, 8]
+    frames['start'] = rank[byte_start] == 0
+    return frames
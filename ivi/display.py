@@ -0,0 +1,190 @@
+"""
+
+Python Interchangeable Virtual Instrument Library
+
+Copyright (c) 2014 Alex Forencich
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import numpy as np
+
+from . import ivi
+from . import scope
+
+DecimationMethod = set(['min_max', 'lttb'])
+
+# candidate points per output point kept by the min/max preselection for LTTB
+LTTBPreselectRatio = 4
+
+def _xy(data, x):
+    "Sample values and time axis of a Waveform, scope record or specan trace"
+    if isinstance(data, scope.Waveform):
+        y = np.asarray(data.y)
+        if x is None:
+            x = data.x
+    else:
+        y = np.asarray(data)
+    if x is None:
+        x = np.arange(len(y), dtype=float)
+    return np.asarray(x), y
+
+def _extrema(y, buckets):
+    """Indices of the minimum and maximum of each bucket, in time order
+    
+    Returns a (buckets, 2) index array."""
+    n = len(y)
+    size = -(-n // buckets)
+    m = n // size * size
+    b = y[:m].reshape(-1, size)
+    base = np.arange(len(b)) * size
+    idx = np.column_stack((np.argmin(b, axis=1) + base, np.argmax(b, axis=1) + base))
+    if m < n:
+        tail = y[m:]
+        idx = np.vstack((idx, [np.argmin(tail) + m, np.argmax(tail) + m]))
+    idx.sort(axis=1)
+    return idx
+
+def _min_max(x, y, points):
+    if len(y) <= points:
+        return x, y
+    idx = _extrema(y, max(points // 2, 1)).ravel()
+    return x[idx], y[idx]
+
+def _lttb(x, y, points):
+    "Largest triangle three buckets selection, points >= 3"
+    n = len(y)
+    if n <= points:
+        return x, y
+    x = x.astype(float)
+    y = y.astype(float)
+    edges = np.linspace(1, n - 1, points - 1).astype(np.intp)
+    
+    # the third corner of every triangle is the mean of the following bucket
+    counts = np.diff(edges)
+    cx = np.add.reduceat(x[:n - 1], edges[:-1]) / counts
+    cy = np.add.reduceat(y[:n - 1], edges[:-1]) / counts
+    cx = np.r_[cx[1:], x[-1]]
+    cy = np.r_[cy[1:], y[-1]]
+    
+    selected = np.empty(points, dtype=np.intp)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for k in range(points - 2):
+        lo = edges[k]
+        hi = edges[k + 1]
+        bx = x[lo:hi]
+        by = y[lo:hi]
+        area = np.abs((x[a] - cx[k]) * (by - y[a]) - (x[a] - bx) * (cy[k] - y[a]))
+        a = lo + np.argmax(area)
+        selected[k + 1] = a
+    return x[selected], y[selected]
+
+
+def decimate(data, points, method='min_max', x=None):
+    """Reduce a record to about points display points, preserving peaks
+    
+    data is a scope Waveform, a fetched ndarray or a specan trace, with x
+    giving the horizontal axis when it is not a Waveform (sample index by
+    default, e.g. a frequency axis for traces).  min_max keeps the minimum
+    and maximum of each bucket at their original positions.  lttb uses
+    Largest-Triangle-Three-Buckets on min/max preselected candidates.
+    Returns x and y arrays."""
+    if method not in DecimationMethod:
+        raise ivi.ValueNotSupportedException()
+    x, y = _xy(data, x)
+    if method == 'lttb' and points >= 3:
+        if len(y) > points * LTTBPreselectRatio:
+            x, y = _min_max(x, y, points * LTTBPreselectRatio)
+        return _lttb(x, y, points)
+    return _min_max(x, y, points)
+
+
+class StreamDecimator(object):
+    """Incremental display decimation of a record that grows in chunks
+    
+    Samples are reduced to per-bucket minimum and maximum as they arrive.
+    When more than points / 2 buckets are held, adjacent buckets are merged
+    and the bucket size doubles, so memory stays O(points) however long the
+    stream runs."""
+    
+    def __init__(self, points=2000, method='min_max', x_increment=1.0, x_origin=0.0):
+        if method not in DecimationMethod:
+            raise ivi.ValueNotSupportedException()
+        self.points = int(points)
+        self.method = method
+        self.x_increment = x_increment
+        self.x_origin = x_origin
+        self.reset()
+    
+    def reset(self):
+        "Discard all samples"
+        self.bucket_size = 1
+        self.samples = 0
+        self._index = np.zeros((0, 2), dtype=np.int64)
+        self._value = np.zeros((0, 2))
+        self._tail = np.zeros(0)
+    
+    def _merge(self):
+        m = len(self._index) // 2 * 2
+        i = self._index[:m].reshape(-1, 4)
+        v = self._value[:m].reshape(-1, 4)
+        r = np.arange(len(v))
+        lo = np.argmin(v, axis=1)
+        hi = np.argmax(v, axis=1)
+        index = np.column_stack((i[r, lo], i[r, hi]))
+        value = np.column_stack((v[r, lo], v[r, hi]))
+        order = np.argsort(index, axis=1)
+        index = index[r[:, None], order]
+        value = value[r[:, None], order]
+        self._index = np.vstack((index, self._index[m:]))
+        self._value = np.vstack((value, self._value[m:]))
+        self.bucket_size *= 2
+    
+    def append(self, y):
+        "Add the next chunk of samples"
+        if isinstance(y, scope.Waveform):
+            y = y.y
+        start = self.samples - len(self._tail)
+        y = np.concatenate((self._tail, np.asarray(y, dtype=float)))
+        self.samples += len(y) - len(self._tail)
+        full = len(y) // self.bucket_size * self.bucket_size
+        if full:
+            b = y[:full]
+            idx = _extrema(b, full // self.bucket_size)
+            self._index = np.vstack((self._index, idx + start))
+            self._value = np.vstack((self._value, b[idx]))
+        self._tail = y[full:]
+        while len(self._index) > max(self.points // 2, 1):
+            self._merge()
+    
+    def result(self):
+        "Return the decimated x and y arrays of all samples so far"
+        index = self._index.ravel()
+        value = self._value.ravel()
+        if len(self._tail):
+            idx = np.sort([np.argmin(self._tail), np.argmax(self._tail)])
+            index = np.r_[index, idx + self.samples - len(self._tail)]
+            value = np.r_[value, self._tail[idx]]
+        x = self.x_origin + index * self.x_increment
+        if self.method == 'lttb' and self.points >= 3:
+            return _lttb(x, value, self.points)
+        return x, value
@@ -0,0 +1,327 @@
+"""
+
+Python Interchangeable Virtual Instrument Library
+
+Copyright (c) 2014 Alex Forencich
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+
+import sys
+import threading
+
+from . import ivi
+
+# status byte bits, enabled with *SRE
+StatusByteEvents = {
+        'error_available': 0x04,
+        'questionable': 0x08,
+        'message_available': 0x10,
+        'event_status': 0x20,
+        'operation': 0x80}
+
+# standard event status register bits, enabled with *ESE
+EventStatusEvents = {
+        'operation_complete': 0x01,
+        'request_control': 0x02,
+        'query_error': 0x04,
+        'device_error': 0x08,
+        'execution_error': 0x10,
+        'command_error': 0x20,
+        'user_request': 0x40,
+        'power_on': 0x80}
+
+# names for common uses of the standard events; operations such as an
+# acquisition or a sweep signal completion through *OPC
+EventAliases = {
+        'error': ('query_error', 'device_error', 'execution_error', 'command_error'),
+        'acquisition_complete': ('operation_complete',),
+        'sweep_complete': ('operation_complete',)}
+
+RequestServiceBit = 0x40
+EventStatusBit = 0x20
+
+
+def expand_sources(sources):
+    "Expand an event source name or list of names into a set of register bit names"
+    if isinstance(sources, str):
+        sources = [sources]
+    names = set()
+    for s in sources:
+        if s in EventAliases:
+            names.update(EventAliases[s])
+        elif s in StatusByteEvents or s in EventStatusEvents:
+            names.add(s)
+        else:
+            raise ivi.ValueNotSupportedException()
+    return names
+
+
+def event_masks(sources):
+    "Service request enable and event status enable masks for event sources"
+    sre = 0
+    ese = 0
+    for s in expand_sources(sources):
+        if s in StatusByteEvents:
+            sre |= StatusByteEvents[s]
+        else:
+            ese |= EventStatusEvents[s]
+    if ese:
+        sre |= EventStatusBit
+    return sre, ese
+
+
+def decode_events(status_byte, event_status=0):
+    "Set of event source names signalled by a status byte and event status register"
+    names = set()
+    for s, bit in StatusByteEvents.items():
+        if status_byte & bit:
+            names.add(s)
+    for s, bit in EventStatusEvents.items():
+        if event_status & bit:
+            names.add(s)
+    for alias, members in EventAliases.items():
+        if names.intersection(members):
+            names.add(alias)
+    return names
+
+
+class Event(object):
+    "Service request from an instrument"
+
+    def __init__(self, driver, status_byte, event_status=0):
+        self.driver = driver
+        self.status_byte = status_byte
+        self.event_status = event_status
+        self.sources = decode_events(status_byte, event_status)
+
+    def __repr__(self):
+        return "Event(status_byte=0x%02x, event_status=0x%02x, sources=%s)" % (
+                self.status_byte, self.event_status, sorted(self.sources))
+
+
+class EventWaiter(object):
+    """Pending event, completed by the dispatcher
+
+    wait blocks until one of the sources is signalled and returns the Event,
+    raising MaxTimeoutExceededException if timeout seconds pass first."""
+
+    def __init__(self, driver, sources):
+        self.driver = driver
+        self.sources = expand_sources(sources)
+        self.event = None
+        self._done = threading.Event()
+
+    def _notify(self, event):
+        if event.sources & self.sources:
+            self.event = event
+            self._done.set()
+            return True
+        return False
+
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        if not self._done.wait(timeout):
+            raise ivi.MaxTimeoutExceededException()
+        return self.event
+
+
+class _Registration(object):
+    def __init__(self, driver, sources, callback):
+        self.driver = driver
+        self.sources = set()
+        self.callbacks = list()
+        self.waiters = list()
+        self.deferred = 0
+        self.update(sources, callback)
+
+    def update(self, sources, callback):
+        self.sources.update(expand_sources(sources))
+        if callback is not None:
+            self.callbacks.append(callback)
+        self.sre, self.ese = event_masks(self.sources)
+
+
+class EventDispatcher(object):
+    """Deliver instrument service requests to callbacks and waiters
+
+    Instruments are added with the event sources of interest; their *SRE and
+    *ESE registers are programmed to match and a background thread watches
+    for service requests.  Where the interface can wait for SRQ (linux-gpib,
+    PyVISA GPIB) the thread sleeps on the SRQ line and only serial polls the
+    registered instruments once it is asserted, so several instruments on
+    one bus share a single wait.  Otherwise the status bytes are polled every
+    poll_interval seconds, with a serial poll where available (VXI-11
+    device_readstb, USBTMC) or *STB? as a last resort.
+
+    For each instrument requesting service, *ESR? is read when standard
+    events are enabled, and an Event is passed to the registered callbacks
+    and completes any matching waiters.  Callbacks run on the dispatcher
+    thread.  The dispatcher holds the I/O lock of the driver while it talks
+    to the instrument, and *STB? and *ESR? are put off while a query
+    response is still to be read, so they do not take the place of the
+    response the application is waiting for."""
+
+    def __init__(self, poll_interval=0.05):
+        self.poll_interval = poll_interval
+        self._registrations = list()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _find(self, driver):
+        for reg in self._registrations:
+            if reg.driver is driver:
+                return reg
+        return None
+
+    def add(self, driver, sources, callback=None):
+        "Enable event sources on an instrument and optionally register a callback"
+        with self._lock:
+            reg = self._find(driver)
+            if reg is None:
+                reg = _Registration(driver, sources, callback)
+                self._registrations.append(reg)
+            else:
+                reg.update(sources, callback)
+        driver.driver_operation.enable_events(reg.sre, reg.ese)
+        self.start()
+
+    def remove(self, driver):
+        "Disable service requests on an instrument and drop its callbacks"
+        with self._lock:
+            reg = self._find(driver)
+            if reg is None:
+                return
+            self._registrations.remove(reg)
+        driver.driver_operation.enable_events(0, 0)
+
+    def expect(self, driver, sources, arm=True):
+        """Return an EventWaiter for the next event from sources
+
+        If arm is set and operation completion is expected, *OPC is sent so
+        that the instrument signals when its pending operations finish."""
+        waiter = EventWaiter(driver, sources)
+        with self._lock:
+            reg = self._find(driver)
+        if reg is None or not waiter.sources.issubset(reg.sources):
+            self.add(driver, sources)
+            reg = self._find(driver)
+        with self._lock:
+            reg.waiters.append(waiter)
+        if arm and 'operation_complete' in waiter.sources:
+            driver._write("*OPC")
+        return waiter
+
+    def wait_for(self, driver, sources, timeout=None):
+        "Block until an event from sources arrives, returns the Event"
+        return self.expect(driver, sources).wait(timeout)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def poll(self):
+        "Check every registered instrument for a service request and dispatch events"
+        with self._lock:
+            regs = list(self._registrations)
+        for reg in regs:
+            event = self._poll_driver(reg)
+            if event is not None:
+                self._dispatch(reg, event)
+    
+    def _poll_driver(self, reg):
+        drv = reg.driver
+        with drv._io_lock:
+            stb = drv._serial_poll()
+            if stb is None:
+                if drv._response_pending:
+                    return None
+                stb = drv._read_stb()
+            # a serial poll clears the request, keep one that was put off
+            stb |= reg.deferred
+            reg.deferred = 0
+            if not stb & RequestServiceBit:
+                return None
+            esr = 0
+            if reg.ese and stb & EventStatusBit:
+                if drv._response_pending:
+                    reg.deferred = stb
+                    return None
+                esr = drv._driver_operation_read_event_status() & reg.ese
+        return Event(drv, stb, esr)
+
+    def _dispatch(self, reg, event):
+        with self._lock:
+            reg.waiters = [w for w in reg.waiters if not w._notify(event)]
+            callbacks = list(reg.callbacks)
+        for cb in callbacks:
+            try:
+                cb(event)
+            except Exception:
+                e = sys.exc_info()[1]
+                sys.stderr.write("python-ivi: event callback failed (%s: %s)\n" %
+                    (e.__class__.__name__, e))
+
+    def _wait_for_srq(self):
+        with self._lock:
+            regs = list(self._registrations)
+        for reg in regs:
+            wait = getattr(reg.driver._interface, 'wait_for_srq', None)
+            if wait is None:
+                continue
+            try:
+                wait(self.poll_interval)
+                return
+            except NotImplementedError:
+                pass
+        self._stop.wait(self.poll_interval)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wait_for_srq()
+            if self._stop.is_set():
+                break
+            try:
+                self.poll()
+            except Exception:
+                e = sys.exc_info()[1]
+                sys.stderr.write("python-ivi: event poll failed (%s: %s)\n" %
+                    (e.__class__.__name__, e))
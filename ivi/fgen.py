@@ -24,6 +24,8 @@ THE SOFTWARE.
 
 """
 
+import numpy as np
+
 from . import ivi
 
 # Exceptions
@@ -46,6 +48,32 @@ TerminalConfiguration = set(['single_ended', 'differential'])
 TriggerSlope = set(['positive', 'negative', 'either'])
 
 
+def get_binary_waveform(data):
+    """View 16 bit binary waveform data as a 1D numpy array without copying
+    
+    Accepts int16 and uint16 arrays of any byte order, and buffer objects.
+    Buffers with an 'h' or 'H' format keep their type, other buffers are
+    taken as native int16 data."""
+    if isinstance(data, np.ndarray):
+        y = data
+    else:
+        m = memoryview(data)
+        if m.format.lstrip('@=<>!') in ('h', 'H'):
+            y = np.asarray(m)
+        else:
+            y = np.frombuffer(m, dtype=np.int16)
+    if y.dtype.kind not in 'iu' or y.dtype.itemsize != 2:
+        raise ivi.ValueNotSupportedException()
+    return np.ascontiguousarray(y).reshape(-1)
+
+def binary_byte_order(y):
+    "Byte order of an integer array, '>' or '<'"
+    order = y.dtype.byteorder
+    if order in '=|':
+        order = '<' if np.little_endian else '>'
+    return order
+
+
 class Base(ivi.IviContainer):
     "Base IVI methods for all function generators"
     
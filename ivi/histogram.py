@@ -0,0 +1,149 @@
+"""
+
+Python Interchangeable Virtual Instrument Library
+
+Copyright (c) 2014 Alex Forencich
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import numpy as np
+
+from . import ivi
+from . import scope
+
+class WaveformHistogram(object):
+    """Incremental time x voltage histogram of waveform records
+    
+    Records are binned as they arrive, so memory use depends only on the
+    number of bins and not on the number of records.  counts is a
+    (voltage_bins, time_bins) array suitable for display as a persistence
+    image.  Samples outside of the time or voltage range are counted in
+    outside.
+    
+    When unit_interval is set, the time axis is folded modulo
+    unit_interval_count unit intervals (starting at unit_interval_offset) to
+    build an eye diagram.  Otherwise, time_range defaults to the span of the
+    first record.
+    
+    Histograms with the same configuration can be merged with merge or +=,
+    for example to combine the results of several worker processes."""
+    
+    def __init__(self, time_bins=500, voltage_bins=256, voltage_range=(-1.0, 1.0),
+                 time_range=None, unit_interval=None, unit_interval_count=2,
+                 unit_interval_offset=0.0):
+        self.time_bins = int(time_bins)
+        self.voltage_bins = int(voltage_bins)
+        self.voltage_range = (float(voltage_range[0]), float(voltage_range[1]))
+        self.unit_interval = unit_interval
+        self.unit_interval_count = unit_interval_count
+        self.unit_interval_offset = unit_interval_offset
+        if unit_interval is not None:
+            time_range = (0.0, unit_interval * unit_interval_count)
+        if time_range is not None:
+            time_range = (float(time_range[0]), float(time_range[1]))
+        self.time_range = time_range
+        self.reset()
+    
+    def reset(self):
+        "Clear the accumulated counts"
+        self.counts = np.zeros((self.voltage_bins, self.time_bins), dtype=np.int64)
+        self.records = 0
+        self.outside = 0
+    
+    @property
+    def time_axis(self):
+        "Centers of the time bins"
+        t0, t1 = self.time_range
+        return t0 + (np.arange(self.time_bins) + 0.5) * (t1 - t0) / self.time_bins
+    
+    @property
+    def voltage_axis(self):
+        "Centers of the voltage bins"
+        v0, v1 = self.voltage_range
+        return v0 + (np.arange(self.voltage_bins) + 0.5) * (v1 - v0) / self.voltage_bins
+    
+    def _time_index(self, points, x_increment, x_origin, x_reference):
+        t = (np.arange(points) - x_reference) * x_increment + x_origin
+        if self.unit_interval is not None:
+            t = np.mod(t - self.unit_interval_offset, self.time_range[1])
+        elif self.time_range is None:
+            self.time_range = (float(x_origin - x_reference * x_increment),
+                               float(x_origin + (points - x_reference) * x_increment))
+        t0, t1 = self.time_range
+        return np.floor((t - t0) * (self.time_bins / (t1 - t0))).astype(np.intp)
+    
+    def add(self, waveform, x_increment=None, x_origin=None, x_reference=None):
+        """Add a record or a batch of records to the histogram
+        
+        waveform is a scope Waveform whose y is a 1-D record or a 2-D
+        (records, points) array of segments, or a bare array in which case the
+        horizontal scale is taken from the keyword arguments."""
+        if isinstance(waveform, scope.Waveform):
+            y = waveform.y
+            if x_increment is None:
+                x_increment = waveform.x_increment
+            if x_origin is None:
+                x_origin = waveform.x_origin
+            if x_reference is None:
+                x_reference = waveform.x_reference
+        else:
+            y = waveform
+        if x_increment is None:
+            x_increment = 1.0
+        if x_origin is None:
+            x_origin = 0.0
+        if x_reference is None:
+            x_reference = 0
+        
+        y = np.atleast_2d(np.asarray(y))
+        ti = self._time_index(y.shape[1], x_increment, x_origin, x_reference)
+        v0, v1 = self.voltage_range
+        vi = np.floor((y - v0) * (self.voltage_bins / (v1 - v0)))
+        
+        # NaN holes compare false and end up outside
+        valid = (vi >= 0) & (vi < self.voltage_bins) & ((ti >= 0) & (ti < self.time_bins))
+        flat = vi[valid].astype(np.intp) * self.time_bins
+        flat += np.broadcast_to(ti, y.shape)[valid]
+        
+        self.counts += np.bincount(flat, minlength=self.counts.size).reshape(self.counts.shape)
+        self.records += y.shape[0]
+        self.outside += y.size - flat.size
+    
+    def _check_compatible(self, other):
+        if (self.counts.shape != other.counts.shape or
+                self.voltage_range != other.voltage_range or
+                self.unit_interval != other.unit_interval or
+                (self.time_range is not None and other.time_range is not None and
+                 self.time_range != other.time_range)):
+            raise ivi.ValueNotSupportedException()
+    
+    def merge(self, other):
+        "Add the counts of another histogram with the same configuration"
+        self._check_compatible(other)
+        if self.time_range is None:
+            self.time_range = other.time_range
+        self.counts += other.counts
+        self.records += other.records
+        self.outside += other.outside
+        return self
+    
+    def __iadd__(self, other):
+        return self.merge(other)
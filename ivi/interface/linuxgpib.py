@@ -25,8 +25,26 @@ THE SOFTWARE.
 """
 
 import Gpib
+import gpib
 import re
 
+# ibsta bits
+TIMO = 0x4000
+RQS = 0x0800
+
+# timeout codes, indexed by code
+Timeouts = [0, 10e-6, 30e-6, 100e-6, 300e-6, 1e-3, 3e-3, 10e-3, 30e-3, 100e-3, 300e-3,
+            1, 3, 10, 30, 100, 300, 1000]
+
+def timeout_code(timeout):
+    "Smallest linux-gpib timeout code covering timeout seconds (None waits forever)"
+    if timeout is None:
+        return 0
+    for code in range(1, len(Timeouts)):
+        if Timeouts[code] >= timeout:
+            return code
+    return len(Timeouts) - 1
+
 def parse_visa_resource_string(resource_string):
     # valid resource strings:
     # GPIB::10::INSTR
@@ -64,6 +82,7 @@ class LinuxGpibInstrument:
             pad = addr
 
         self.gpib = Gpib.Gpib(name, pad, sad, timeout, send_eoi, eos_mode)
+        self.timeout = timeout
 
     def write_raw(self, data):
         "Write binary data to instrument"
@@ -111,7 +130,19 @@ class LinuxGpibInstrument:
     
     def read_stb(self):
         "Read status byte"
-        raise NotImplementedError()
+        val = self.gpib.serial_poll()
+        if not isinstance(val, int):
+            val = ord(val)
+        return val
+    
+    def wait_for_srq(self, timeout=None):
+        "Wait for service request, returns True if requested within timeout seconds"
+        gpib.timeout(self.gpib.id, timeout_code(timeout))
+        try:
+            sta = gpib.wait(self.gpib.id, RQS | TIMO)
+        finally:
+            gpib.timeout(self.gpib.id, self.timeout)
+        return bool(sta & RQS)
     
     def trigger(self):
         "Send trigger command"
@@ -39,6 +39,9 @@ except:
         (e.__class__.__name__, e.args[0]))
     raise ImportError
 
+# PyVISA 1.5 and later take timeouts in milliseconds
+timeout_scale = 1000 if hasattr(visa, 'ResourceManager') else 1
+
 class PyVisaInstrument:
     "PyVisa wrapper instrument interface client"
     def __init__(self, resource, *args, **kwargs):
@@ -101,7 +104,24 @@ class PyVisaInstrument:
     
     def read_stb(self):
         "Read status byte"
-        raise NotImplementedError()
+        try:
+            return self.instrument.read_stb()
+        except AttributeError:
+            return self.instrument.stb
+    
+    def wait_for_srq(self, timeout=None):
+        "Wait for service request, returns True if requested within timeout seconds"
+        try:
+            wait = self.instrument.wait_for_srq
+        except AttributeError:
+            raise NotImplementedError()
+        if timeout is not None:
+            timeout = timeout * timeout_scale
+        try:
+            wait(timeout)
+        except visa.VisaIOError:
+            return False
+        return True
     
     def trigger(self):
         "Send trigger command"
@@ -28,8 +28,15 @@ THE SOFTWARE.
 import inspect
 import numpy as np
 import re
+import threading
+import time
 from functools import partial
 
+try:
+    monotonic = time.monotonic
+except AttributeError:
+    monotonic = time.time
+
 # try importing drivers
 # python-vxi11 for LAN instruments
 try:
@@ -432,7 +439,9 @@ def build_ieee_block(data):
     # where l is length of n and n is the
     # length of the data
     # ex: #800002000 prefixes 2000 data bytes
-    return str('#8%08d' % len(data)).encode('utf-8') + data
+    # count bytes rather than items for buffers such as int16 arrays
+    data = memoryview(data)
+    return str('#8%08d' % data.nbytes).encode('utf-8') + data
 
     
 def decode_ieee_block(data):
@@ -496,6 +505,65 @@ def rms(y):
     return np.linalg.norm(y) / np.sqrt(y.size)
 
 
+QuantizeEncoding = set(['offset_binary', 'twos_complement', 'float'])
+
+def quantize_waveform(y, bits=16, encoding='offset_binary', byteorder='>', max_code=None, dither=False):
+    """Convert a normalized waveform to packed DAC codes
+    
+    Samples are clipped to -1.0 to 1.0 and scaled to bits wide codes, with -1.0
+    mapping to 0 and 1.0 to max_code (default (1 << bits) - 1) for offset
+    binary, or to +/- max_code (default (1 << (bits - 1)) - 1) for two's
+    complement.  Codes are packed as 16 bit words, or 32 bit words for more
+    than 16 bits, in the given byte order ('>' or '<').  The float encoding
+    packs single precision floats instead.
+    
+    int16 and uint16 arrays are taken as already quantized codes and are only
+    converted to the target width and byte order; codes outside of the code
+    range raise an Out Of Range error.  Other arrays, including lists of
+    Python integers, are treated as normalized samples.  When dither is set,
+    triangular dither of +/- 1 LSB is added before rounding.
+    
+    Returns the packed data as bytes."""
+    y = np.asarray(y)
+    
+    if encoding == 'float':
+        return np.clip(y, -1.0, 1.0).astype(byteorder + 'f4').tobytes()
+    if encoding not in QuantizeEncoding:
+        raise ValueNotSupportedException()
+    
+    signed = encoding == 'twos_complement'
+    dtype = np.dtype(byteorder + ('i' if signed else 'u') + ('2' if bits <= 16 else '4'))
+    
+    if max_code is None:
+        max_code = (1 << (bits - 1)) - 1 if signed else (1 << bits) - 1
+    
+    if y.dtype.kind in 'iu' and y.dtype.itemsize == 2:
+        # already quantized, no copy if the layout matches
+        if len(y) and (y.min() < (-max_code if signed else 0) or y.max() > max_code):
+            raise OutOfRangeException()
+        return y.astype(dtype, copy=False).tobytes()
+    
+    if signed:
+        f = np.clip(y, -1.0, 1.0) * max_code
+    else:
+        f = np.clip(y, -1.0, 1.0)
+        f += 1.0
+        f *= max_code / 2.0
+    
+    if dither:
+        f += np.random.random_sample(f.shape)
+        f -= np.random.random_sample(f.shape)
+    
+    if signed:
+        np.clip(f, -max_code, max_code, out=f)
+        f = np.rint(f)
+    else:
+        np.clip(f, 0, max_code, out=f)
+        # round half up to match the DAC code conversion
+        f = np.floor(f + 0.5)
+    return f.astype(dtype).tobytes()
+
+
 def trim_doc(docstring):
     if not docstring:
         return ''
@@ -700,6 +768,8 @@ class DriverOperation(IviContainer):
         self._driver_operation_record_coercions = False
         self._driver_operation_io_resource_descriptor = ""
         self._driver_operation_simulate = False
+        self._driver_operation_event_status_enable = 0
+        self._driver_operation_service_request_enable = 0
         
         self._driver_operation_interchange_warnings = list()
         self._driver_operation_coercion_records = list()
@@ -1004,6 +1074,54 @@ class DriverOperation(IviContainer):
                         Refer to the Interchange Check attribute for more information on
                         interchangeability checking.
                         """)
+        self._add_method('driver_operation.wait_for',
+                        self._driver_operation_wait_for,
+                        Doc("""
+                        Waits until the instrument reports that a pending operation is complete
+                        or until maximum_time (in seconds) elapses, whichever comes first.
+                        Returns the value that signalled completion, or False on timeout.
+                        
+                        Completion is detected with the callable passed as condition, or with
+                        one of the following standard mechanisms selected by completion:
+                        
+                        * 'opc' - Query *OPC? (blocks until the pending operations finish,
+                          bounded by the I/O timeout)
+                        * 'esr' - Send *OPC, then poll bit 0 of the standard event status
+                          register with *ESR?
+                        * 'stb' - Poll the status byte until a bit in mask (default 0x10,
+                          message available) is set
+                        * 'mav' - As 'stb' with mask 0x10, but only with an interface-level
+                          serial poll so that a pending query response is not disturbed.  If
+                          the interface cannot serial poll, the full maximum_time is waited.
+                        
+                        The polling interval starts at 1 ms and doubles up to 100 ms so that
+                        fast operations return promptly without flooding the bus on slow
+                        ones.  If srq is True and the interface supports waiting for a
+                        service request, the wait between polls is ended early by SRQ.
+                        """))
+        self._add_method('driver_operation.enable_events',
+                        self._driver_operation_enable_events,
+                        Doc("""
+                        Sets the IEEE 488.2 service request enable (*SRE) and standard event
+                        status enable (*ESE) registers.  The instrument asserts a service
+                        request when a status byte bit in service_request_enable is set; set
+                        bit 5 (0x20) to request service for the standard events enabled with
+                        event_status_enable.  Pass zeros to disable service requests.
+                        
+                        See the event module for named event sources and a dispatcher that
+                        delivers service requests to callbacks.
+                        """))
+        self._add_method('driver_operation.read_status_byte',
+                        self._driver_operation_read_status_byte,
+                        Doc("""
+                        Returns the instrument status byte, with a serial poll when the
+                        interface supports it and with *STB? otherwise.
+                        """))
+        self._add_method('driver_operation.read_event_status',
+                        self._driver_operation_read_event_status,
+                        Doc("""
+                        Reads and clears the standard event status register (*ESR?).
+                        """))
     
     
     def _get_driver_operation_cache(self):
@@ -1069,6 +1187,19 @@ class DriverOperation(IviContainer):
     
     def _driver_operation_invalidate_all_attributes(self):
         pass
+    
+    def _driver_operation_wait_for(self, condition=None, maximum_time=10.0, completion=None,
+            mask=None, srq=False):
+        return True
+    
+    def _driver_operation_enable_events(self, service_request_enable=0, event_status_enable=0):
+        pass
+    
+    def _driver_operation_read_status_byte(self):
+        return 0
+    
+    def _driver_operation_read_event_status(self):
+        return 0
 
     def _driver_operation_reset_interchange_check(self):
         pass
@@ -1496,6 +1627,10 @@ class Driver(DriverOperation, DriverIdentity, DriverUtility):
         self._initialized = False
         self.__dict__.setdefault('_instrument_id', '')
         self._cache_valid = dict()
+        # I/O from the event dispatcher thread is serialized with this lock,
+        # and status queries are held off while a query response is pending
+        self._io_lock = threading.RLock()
+        self._response_pending = False
         
         super(Driver, self).__init__(*args, **kwargs)
         
@@ -1884,6 +2019,80 @@ class Driver(DriverOperation, DriverIdentity, DriverUtility):
     def _driver_operation_invalidate_all_attributes(self):
         self._cache_valid = dict()
 
+    def _driver_operation_wait_for(self, condition=None, maximum_time=10.0, completion=None,
+            mask=None, srq=False, interval=0.001, max_interval=0.1):
+        if self._driver_operation_simulate:
+            return True
+        if not self._initialized or self._interface is None:
+            raise NotInitializedException()
+
+        if completion == 'opc':
+            return int(self._ask("*OPC?")) == 1
+        elif completion == 'esr':
+            self._write("*OPC")
+            condition = lambda: int(self._ask("*ESR?")) & 1
+        elif completion == 'stb':
+            if mask is None:
+                mask = 0x10
+            condition = lambda: self._read_stb() & mask
+        elif completion == 'mav':
+            if self._serial_poll() is None:
+                time.sleep(maximum_time)
+                return True
+            condition = lambda: self._serial_poll() & 0x10
+        elif completion is not None:
+            raise ValueNotSupportedException()
+
+        if condition is None:
+            raise ValueNotSupportedException()
+
+        wait_for_srq = None
+        if srq:
+            wait_for_srq = getattr(self._interface, 'wait_for_srq', None)
+
+        deadline = monotonic() + maximum_time
+        while True:
+            value = condition()
+            if value:
+                return value
+            remaining = deadline - monotonic()
+            if remaining <= 0:
+                return False
+            delay = min(interval, remaining)
+            if wait_for_srq is not None:
+                try:
+                    wait_for_srq(delay)
+                except (NotImplementedError, IOTimeoutException):
+                    pass
+            else:
+                time.sleep(delay)
+            interval = min(interval * 2, max_interval)
+
+    def _serial_poll(self):
+        "Read status byte with an interface-level serial poll, or None if unsupported"
+        with self._io_lock:
+            try:
+                return self._interface.read_stb()
+            except (AttributeError, NotImplementedError):
+                return None
+
+    def _driver_operation_enable_events(self, service_request_enable=0, event_status_enable=0):
+        service_request_enable = int(service_request_enable) & 0xbf
+        event_status_enable = int(event_status_enable) & 0xff
+        if not self._driver_operation_simulate:
+            self._write("*ESE %d" % event_status_enable)
+            self._write("*SRE %d" % service_request_enable)
+        self._driver_operation_event_status_enable = event_status_enable
+        self._driver_operation_service_request_enable = service_request_enable
+
+    def _driver_operation_read_status_byte(self):
+        return self._read_stb()
+
+    def _driver_operation_read_event_status(self):
+        if self._driver_operation_simulate:
+            return 0
+        return int(self._ask("*ESR?"))
+
     def _write_raw(self, data):
         "Write binary data to instrument"
         if self._driver_operation_simulate:
@@ -1891,7 +2100,11 @@ class Driver(DriverOperation, DriverIdentity, DriverUtility):
             return
         if not self._initialized or self._interface is None:
             raise NotInitializedException()
-        self._interface.write_raw(data)
+        with self._io_lock:
+            self._interface.write_raw(data)
+            # a query header ends with '?', block data is not checked; a new
+            # message also discards any unread response of the previous one
+            self._response_pending = b'?' in data.split(b'#', 1)[0]
     
     def _read_raw(self, num=-1):
         "Read binary data from instrument"
@@ -1900,7 +2113,12 @@ class Driver(DriverOperation, DriverIdentity, DriverUtility):
             return b''
         if not self._initialized or self._interface is None:
             raise NotInitializedException()
-        return self._interface.read_raw(num)
+        with self._io_lock:
+            try:
+                return self._interface.read_raw(num)
+            finally:
+                # the response is read, or lost if the read failed
+                self._response_pending = False
     
     def _ask_raw(self, data, num=-1):
         "Write then read binary data"
@@ -1909,12 +2127,13 @@ class Driver(DriverOperation, DriverIdentity, DriverUtility):
             return b''
         if not self._initialized or self._interface is None:
             raise NotInitializedException()
-        try:
-            return self._interface.ask_raw(data, num)
-        except AttributeError:
-            # if interface does not implement ask_raw, emulate it
-            self._write_raw(data)
-            return self._read_raw(num)
+        with self._io_lock:
+            try:
+                return self._interface.ask_raw(data, num)
+            except AttributeError:
+                # if interface does not implement ask_raw, emulate it
+                self._write_raw(data)
+                return self._read_raw(num)
     
     def _write(self, data, encoding = 'utf-8'):
         "Write string to instrument"
@@ -1923,16 +2142,18 @@ class Driver(DriverOperation, DriverIdentity, DriverUtility):
             return
         if not self._initialized or self._interface is None:
             raise NotInitializedException()
-        try:
-            self._interface.write(data, encoding)
-        except AttributeError:
-            if type(data) is tuple or type(data) is list:
-                # recursive call for a list of commands
-                for data_i in data:
-                    self._write(data_i, encoding)
-                return
+        with self._io_lock:
+            try:
+                self._interface.write(data, encoding)
+                self._response_pending = '?' in str(data)
+            except AttributeError:
+                if type(data) is tuple or type(data) is list:
+                    # recursive call for a list of commands
+                    for data_i in data:
+                        self._write(data_i, encoding)
+                    return
 
-            self._write_raw(str(data).encode(encoding))
+                self._write_raw(str(data).encode(encoding))
     
     def _read(self, num=-1, encoding = 'utf-8'):
         "Read string from instrument"
@@ -1941,10 +2162,15 @@ class Driver(DriverOperation, DriverIdentity, DriverUtility):
             return ''
         if not self._initialized or self._interface is None:
             raise NotInitializedException()
-        try:
-            return self._interface.read(num, encoding)
-        except AttributeError:
-            return self._read_raw(num).decode(encoding).rstrip('\r\n')
+        with self._io_lock:
+            try:
+                try:
+                    return self._interface.read(num, encoding)
+                except AttributeError:
+                    return self._read_raw(num).decode(encoding).rstrip('\r\n')
+            finally:
+                # the response is read, or lost if the read failed
+                self._response_pending = False
     
     def _ask(self, data, num=-1, encoding = 'utf-8'):
         "Write then read string"
@@ -1953,19 +2179,20 @@ class Driver(DriverOperation, DriverIdentity, DriverUtility):
             return ''
         if not self._initialized or self._interface is None:
             raise NotInitializedException()
-        try:
-            return self._interface.ask(data, num, encoding)
-        except AttributeError:
-            # if interface does not implement ask, emulate it
-            if type(data) is tuple or type(data) is list:
-            #    # recursive call for a list of commands
-                val = list()
-                for data_i in data:
-                    val.append(self._ask(data_i, num, encoding))
-                return val
-
-            self._write(data, encoding)
-            return self._read(num, encoding)
+        with self._io_lock:
+            try:
+                return self._interface.ask(data, num, encoding)
+            except AttributeError:
+                # if interface does not implement ask, emulate it
+                if type(data) is tuple or type(data) is list:
+                #    # recursive call for a list of commands
+                    val = list()
+                    for data_i in data:
+                        val.append(self._ask(data_i, num, encoding))
+                    return val
+
+                self._write(data, encoding)
+                return self._read(num, encoding)
     
     def _read_stb(self):
         "Read status byte"
@@ -1974,10 +2201,11 @@ class Driver(DriverOperation, DriverIdentity, DriverUtility):
             return 0
         if not self._initialized or self._interface is None:
             raise NotInitializedException()
-        try:
-            return self._interface.read_stb()
-        except (AttributeError, NotImplementedError):
-            return int(self._ask("*STB?"))
+        with self._io_lock:
+            try:
+                return self._interface.read_stb()
+            except (AttributeError, NotImplementedError):
+                return int(self._ask("*STB?"))
     
     def _trigger(self):
         "Device trigger"
@@ -2000,6 +2228,9 @@ class Driver(DriverOperation, DriverIdentity, DriverUtility):
             return self._interface.clear()
         except (AttributeError, NotImplementedError):
             self._write("*CLS")
+        finally:
+            # a device clear empties the output queue
+            self._response_pending = False
     
     def _remote(self):
         "Device set remote"
@@ -24,7 +24,6 @@ THE SOFTWARE.
 
 """
 
-import time
 import struct
 
 from .. import ivi
@@ -525,14 +524,13 @@ class lecroyBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.commo
     def _utility_reset_with_defaults(self):
         self._utility_reset()
 
-    # TODO: test self test, check if the time.sleep() is sufficient
     def _utility_self_test(self):
         code = 0
         message = "Self test passed"
         if not self._driver_operation_simulate:
             self._write("*TST?")
-            # Wait for test to complete - may be adjusted if required
-            time.sleep(40)
+            # wait for test to complete
+            self._driver_operation_wait_for(completion='mav', maximum_time=40)
             code = int(self._read())
             if code != 0:
                 message = "Self test failed"
@@ -656,6 +654,7 @@ class lecroyBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.commo
             self._write(":timebase:mode %s" % TimebaseModeMapping[value])
         self._timebase_mode = value
         self._set_cache_valid()
+        self._invalidate_waveform_preamble()
 
     def _get_timebase_reference(self):
         if not self._driver_operation_simulate and not self._get_cache_valid():
@@ -671,6 +670,7 @@ class lecroyBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.commo
             self._write(":timebase:reference %s" % TimebaseReferenceMapping[value])
         self._timebase_reference = value
         self._set_cache_valid()
+        self._invalidate_waveform_preamble()
 
     def _get_timebase_position(self):
         if not self._driver_operation_simulate and not self._get_cache_valid():
@@ -684,6 +684,7 @@ class lecroyBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.commo
             self._write(":timebase:position %e" % value)
         self._timebase_position = value
         self._set_cache_valid()
+        self._invalidate_waveform_preamble()
 
     # Modified for LeCroy, working
     def _get_timebase_range(self):
@@ -703,6 +704,7 @@ class lecroyBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.commo
         self._timebase_range = value
         self._set_cache_valid()
         self._set_cache_valid(True, 'timebase_scale')
+        self._invalidate_waveform_preamble()
 
     # Modified for LeCroy, working
     def _get_timebase_scale(self):
@@ -722,6 +724,7 @@ class lecroyBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.commo
         self._timebase_range = value * self._horizontal_divisions
         self._set_cache_valid()
         self._set_cache_valid(True, 'timebase_range')
+        self._invalidate_waveform_preamble()
 
     def _get_timebase_window_position(self):
         if not self._driver_operation_simulate and not self._get_cache_valid():
@@ -735,6 +738,7 @@ class lecroyBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.commo
             self._write(":timebase:window:position %e" % value)
         self._timebase_window_position = value
         self._set_cache_valid()
+        self._invalidate_waveform_preamble()
 
     def _get_timebase_window_range(self):
         if not self._driver_operation_simulate and not self._get_cache_valid():
@@ -752,6 +756,7 @@ class lecroyBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.commo
         self._timebase_window_scale = value / self._horizontal_divisions
         self._set_cache_valid()
         self._set_cache_valid(True, 'timebase_window_scale')
+        self._invalidate_waveform_preamble()
 
     def _get_timebase_window_scale(self):
         if not self._driver_operation_simulate and not self._get_cache_valid():
@@ -769,6 +774,7 @@ class lecroyBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.commo
         self._timebase_window_range = value * self._horizontal_divisions
         self._set_cache_valid()
         self._set_cache_valid(True, 'timebase_window_range')
+        self._invalidate_waveform_preamble()
 
     def _get_display_vectors(self):
         if not self._driver_operation_simulate and not self._get_cache_valid():
@@ -810,6 +816,7 @@ class lecroyBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.commo
             self._write(":timebase:position %e" % value)
         self._acquisition_start_time = value
         self._set_cache_valid()
+        self._invalidate_waveform_preamble()
 
     def _get_acquisition_type(self):
         if not self._driver_operation_simulate and not self._get_cache_valid():
@@ -825,6 +832,7 @@ class lecroyBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.commo
             self._write(":acquire:type %s" % AcquisitionTypeMapping[value])
         self._acquisition_type = value
         self._set_cache_valid()
+        self._invalidate_waveform_preamble()
 
     def _get_acquisition_number_of_points_minimum(self):
         return self._acquisition_number_of_points_minimum
@@ -855,6 +863,7 @@ class lecroyBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.commo
         self._acquisition_time_per_record = value * self._horizontal_divisions
         self._set_cache_valid()
         self._set_cache_valid(False, 'acquisition_start_time')
+        self._invalidate_waveform_preamble()
 
     # This method implemented differently in WRXIA, not tested with other LeCroy scope
     def _get_channel_label(self, index):
@@ -896,6 +905,7 @@ class lecroyBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.commo
                 self._write("%s:TRA ON" % self._channel_name[index])
         self._channel_enabled[index] = value
         self._set_cache_valid(index=index)
+        self._invalidate_waveform_preamble(index)
 
     # TODO: test channel.input_impedance
     def _get_channel_input_impedance(self, index):
@@ -982,6 +992,7 @@ class lecroyBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.commo
             self._write("%s:ATTN %e" % (self._channel_name[index], value))
         self._channel_probe_attenuation[index] = value
         self._set_cache_valid(index=index)
+        self._invalidate_waveform_preamble(index)
 
     def _get_channel_invert(self, index):
         index = ivi.get_index(self._analog_channel_name, index)
@@ -1072,6 +1083,7 @@ class lecroyBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.commo
             self._write("%s:offset %e" % (self._channel_name[index], value))
         self._channel_offset[index] = value
         self._set_cache_valid(index=index)
+        self._invalidate_waveform_preamble(index)
 
     def _get_channel_range(self, index):
         index = ivi.get_index(self._channel_name, index)
@@ -1091,6 +1103,7 @@ class lecroyBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.commo
         self._channel_scale[index] = value / self._vertical_divisions
         self._set_cache_valid(index=index)
         self._set_cache_valid(True, "channel_scale", index)
+        self._invalidate_waveform_preamble(index)
 
     def _get_channel_scale(self, index):
         index = ivi.get_index(self._channel_name, index)
@@ -1110,6 +1123,7 @@ class lecroyBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.commo
         self._channel_range[index] = value * self._vertical_divisions
         self._set_cache_valid(index=index)
         self._set_cache_valid(True, "channel_range", index)
+        self._invalidate_waveform_preamble(index)
 
     def _get_measurement_status(self):
         return self._measurement_status
@@ -1405,75 +1419,163 @@ class lecroyBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.commo
     # def _set_trigger_ac_line_slope(self, value):
     #     self._set_trigger_edge_slope(value)
 
-    # Modified for LeCroy, WORKING ON WR104XI-A
-    def _measurement_fetch_waveform(self, index):
-        index = ivi.get_index(self._channel_name, index)
-
-        if self._driver_operation_simulate:
-            return list()
+    def _measurement_waveform_setup(self):
+        if not self._get_cache_valid('waveform_setup'):
+            # Send the MSB first
+            # old - self._write(":waveform:byteorder msbfirst")
+            self._write("COMM_ORDER HI")
+            self._write("COMM_FORMAT DEF9,WORD,BIN")
+            self._set_cache_valid(True, 'waveform_setup')
 
-        # Send the MSB first
-        # old - self._write(":waveform:byteorder msbfirst")
-        self._write("COMM_ORDER HI")
-        self._write("COMM_FORMAT DEF9,WORD,BIN")
+    def _measurement_fetch_waveform_preamble(self, index):
+        if self._get_cache_valid('waveform_preamble', index):
+            return self._waveform_preamble[index]
 
         # Read wave description and split up parts into variables
         pre = self._ask("%s:INSPECT? WAVEDESC" % self._channel_name[index]).split("\r\n")
 
-
         # Replace following with a more simple solution, make it < Python 2.7 compatible
         temp = []
         for item in pre:
             temp.append(item.split(':'))
 
-        # Dict comprehension, python 2.7+
-        #mydict = {t[0].strip(): ["".join(elem.strip()) for elem in t[1:]] for t in temp}
-        #format = str(mydict["COMM_TYPE"][0])
-        #points = int(mydict["PNTS_PER_SCREEN"][0])
-        #xincrement = float(mydict["HORIZ_INTERVAL"][0])
-        #xorigin = float(mydict["HORIZ_OFFSET"][0])
-        #yincrement = float(mydict["VERTICAL_GAIN"][0])
-        #yorigin = float(mydict["VERTICAL_OFFSET"][0])
-
         # Dict with lost comprehension, python 2.6+
         mydict = dict([(d[0].strip(), "".join(d[1:]).strip()) for d in temp])
 
         format = str(mydict["COMM_TYPE"])
-        points = int(mydict["PNTS_PER_SCREEN"])
+        # number of points in the data array, falling back to the screen width
+        points = int(mydict.get("WAVE_ARRAY_COUNT", mydict["PNTS_PER_SCREEN"]))
         xincrement = float(mydict["HORIZ_INTERVAL"])
         xorigin = float(mydict["HORIZ_OFFSET"])
         yincrement = float(mydict["VERTICAL_GAIN"])
         yorigin = float(mydict["VERTICAL_OFFSET"])
+        record_type = str(mydict.get("RECORD_TYPE", ""))
 
         # Verify that the data is in 'word' format
         if format.lower() != "word":
             raise ivi.UnexpectedResponseException()
 
+        pre = (format, points, xincrement, xorigin, yincrement, yorigin, record_type)
+        self._waveform_preamble[index] = pre
+        self._set_cache_valid(True, 'waveform_preamble', index)
+
+        return pre
+
+    def _measurement_fetch_waveform_raw(self, index):
+        if self._driver_operation_simulate:
+            return None, scope.Waveform(channel=self._channel_name[index])
+
+        self._measurement_waveform_setup()
+
+        pre = self._measurement_fetch_waveform_preamble(index)
+
         # Read waveform data
         self._write("%s:WAVEFORM? DAT1" % self._channel_name[index])
-        raw_data = raw_data = self._read_ieee_block()
+        raw_data = self._read_ieee_block()
+
+        if len(raw_data) != pre[1] * 2:
+            # record length differs from the description, so it is stale
+            self._invalidate_waveform_preamble(index)
+            pre = self._measurement_fetch_waveform_preamble(index)
 
-        # Split out points and convert to time and voltage pairs
-        data = list()
-        for i in range(points):
-            x = (i * xincrement) + xorigin
+        return pre, raw_data
 
-            yval = struct.unpack(">H", raw_data[i * 2:i * 2 + 2])[0]
+    def _measurement_decode_waveform(self, index, pre, raw_data, out=None):
+        format, points, xincrement, xorigin, yincrement, yorigin, record_type = pre
 
-            if yval > 32767:
-                yval = yval - (2 ** 16)
+        # signed word data, 0 is the hole value
+        y = scope.decode_waveform_data(raw_data[:points * 2], '>i2', yincrement, -yorigin, 0, 0, out)
 
-            if yval == 0:
-                # hole value
-                y = float('nan')
-            else:
-                y = (yincrement * yval) - yorigin
+        return scope.Waveform(y, xincrement, xorigin, 0,
+                              yincrement, -yorigin, 0, self._channel_name[index])
 
-            data.append((x, y))
+    def _measurement_fetch_waveform_data(self, index):
+        waveform = self._get_cached_waveform(index)
+        if waveform is None:
+            pre, raw_data = self._measurement_fetch_waveform_raw(index)
+            waveform = self._measurement_decode_waveform(index, pre, raw_data)
+            self._set_cached_waveform(index, waveform)
+        return waveform
+
+    # Modified for LeCroy, WORKING ON WR104XI-A
+    def _measurement_fetch_waveform(self, index):
+        index = ivi.get_index(self._channel_name, index)
+
+        if self._driver_operation_simulate:
+            return scope.Waveform(channel=self._channel_name[index])
+
+        self._measurement_waveform_setup()
+
+        return self._measurement_fetch_waveform_data(index)
+
+    def _measurement_fetch_waveform_window(self, index, start, stop, step, max_points):
+        index = ivi.get_index(self._channel_name, index)
+
+        if self._driver_operation_simulate:
+            return scope.Waveform(channel=self._channel_name[index])
+
+        self._measurement_waveform_setup()
+
+        pre = self._measurement_fetch_waveform_preamble(index)
+        format, points, xincrement, xorigin, yincrement, yorigin, record_type = pre
+
+        start, stop, step = slice(start, stop, step).indices(points)
+        if step < 1:
+            raise ivi.ValueNotSupportedException()
+
+        count = max(-(-(stop - start) // step), 0)
+        if max_points is not None and count > max_points:
+            # sparse the record on the instrument
+            step *= -(-count // max_points)
+            count = -(-(stop - start) // step)
+
+        if count == 0:
+            # NP 0 would transfer the whole record
+            return scope.Waveform(None, xincrement * step, xorigin + start * xincrement, 0,
+                                  yincrement, -yorigin, 0, self._channel_name[index])
+
+        # sparsing, number of points and first point
+        self._write("WAVEFORM_SETUP SP,%d,NP,%d,FP,%d,SN,0" % (step, count, start))
+        try:
+            self._write("%s:WAVEFORM? DAT1" % self._channel_name[index])
+            raw_data = self._read_ieee_block()
+        finally:
+            # back to the whole record for the regular fetch
+            self._write("WAVEFORM_SETUP SP,0,NP,0,FP,0,SN,0")
+
+        y = scope.decode_waveform_data(raw_data[:count * 2], '>i2', yincrement, -yorigin, 0, 0)
+
+        return scope.Waveform(y, xincrement * step, xorigin + start * xincrement, 0,
+                              yincrement, -yorigin, 0, self._channel_name[index])
+
+    def _measurement_fetch_waveforms(self, channels):
+        indices = [ivi.get_index(self._channel_name, ch) for ch in channels]
+
+        data = dict()
+
+        if self._driver_operation_simulate:
+            for ch, index in zip(channels, indices):
+                data[ch] = scope.Waveform(channel=self._channel_name[index])
+            return data
+
+        self._measurement_waveform_setup()
+
+        for ch, index in zip(channels, indices):
+            data[ch] = self._measurement_fetch_waveform_data(index)
 
         return data
 
     def _measurement_read_waveform(self, index, maximum_time):
+        # arm a single acquisition without blocking the parser and poll the
+        # new acquisition bit, reading INR first clears it
+        if not self._driver_operation_simulate:
+            self._measurement_trigger_event()
+            self._write("TRMD SINGLE")
+            self._set_cache_valid(False, 'trigger_mode')
+            self._set_cache_valid(False, 'trigger_continuous')
+        self._bump_acquisition_generation()
+        if not self._driver_operation_wait_for(self._measurement_trigger_event, maximum_time=maximum_time):
+            raise ivi.MaxTimeoutExceededException()
         return self._measurement_fetch_waveform(index)
 
     def _measurement_initiate(self):
@@ -1481,6 +1583,7 @@ class lecroyBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.commo
             self._write(":acquire:complete 100")
             self._write(":digitize")
             self._set_cache_valid(False, 'trigger_continuous')
+        self._bump_acquisition_generation()
 
     def _get_reference_level_high(self):
         return self._reference_level_high
@@ -1556,13 +1659,42 @@ class lecroyBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.commo
     def _set_acquisition_number_of_envelopes(self, value):
         self._acquisition_number_of_envelopes = value
 
+    def _measurement_trigger_event(self):
+        # bit 0 of the internal state change register flags a new acquisition
+        return bool(int(self._ask("INR?")) & 1)
+
     def _measurement_fetch_waveform_min_max(self, index):
         index = ivi.get_index(self._channel_name, index)
-        data = list()
-        return data
+
+        if self._driver_operation_simulate:
+            return scope.EnvelopeWaveform(channel=self._channel_name[index])
+
+        self._measurement_waveform_setup()
+
+        pre = self._measurement_fetch_waveform_preamble(index)
+        format, points, xincrement, xorigin, yincrement, yorigin, record_type = pre
+
+        if record_type.lower() != "peak_detect":
+            raise scope.InvalidAcquisitionTypeException()
+
+        self._write("%s:WAVEFORM? DAT1" % self._channel_name[index])
+        raw_data = self._read_ieee_block()
+
+        if len(raw_data) < points * 2:
+            # record length differs from the description, so it is stale
+            self._invalidate_waveform_preamble(index)
+            raise ivi.UnexpectedResponseException()
+
+        # peak detect data is a sequence of interleaved min, max pairs and
+        # WAVE_ARRAY_COUNT counts both values of each pair
+        y = scope.decode_waveform_data(raw_data[:points * 2], '>i2', yincrement, -yorigin, 0, 0)
+        y_min, y_max = scope.split_min_max(y)
+
+        return scope.EnvelopeWaveform(y_min, y_max, xincrement, xorigin, 0,
+                                      yincrement, -yorigin, 0, self._channel_name[index])
 
     def _measurement_read_waveform_min_max(self, index, maximum_time):
-        return _measurement_fetch_waveform_min_max(index)
+        return self._measurement_fetch_waveform_min_max(index)
 
     def _get_trigger_continuous(self):
         if not self._driver_operation_simulate and not self._get_cache_valid():
@@ -1578,6 +1710,7 @@ class lecroyBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.commo
             self._write(":%s" % t)
         self._trigger_continuous = value
         self._set_cache_valid()
+        self._bump_acquisition_generation()
 
     def _get_acquisition_number_of_averages(self):
         if not self._driver_operation_simulate and not self._get_cache_valid():
@@ -1607,11 +1740,13 @@ class lecroyBaseScope(scpi.common.IdnCommand, scpi.common.ErrorQuery, scpi.commo
             self._write(":acquire:mode %s" % SampleModeMapping[value])
         self._acquisition_sample_mode = value
         self._set_cache_valid()
+        self._invalidate_waveform_preamble()
 
     # Not changed
     def _measurement_auto_setup(self):
         if not self._driver_operation_simulate:
             self._write("ASET")
+        self._invalidate_waveform_preamble()
 
     # WORKING ON WR104XI-A
     def _memory_save(self, index):
@@ -0,0 +1,187 @@
+"""
+
+Python Interchangeable Virtual Instrument Library
+
+Copyright (c) 2014 Alex Forencich
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+
+import unittest
+
+import numpy as np
+
+from ... import ivi
+from ... import scope
+from .. import lecroyWR104XIA
+
+class VirtualLeCroy(object):
+    "LeCroy scope answering waveform descriptor and data queries"
+
+    def __init__(self, points=4):
+        self.read_buffer = b''
+        self.cmd_log = list()
+        self.record_type = 'single_sweep'
+        # channel n reads back as n*100 + sample number
+        self.samples = dict(('C%d' % n, np.arange(points) + n * 100) for n in range(1, 5))
+        self.setup = {'SP': 0, 'NP': 0, 'FP': 0, 'SN': 0}
+        self.inr = lambda: '0'
+
+    def wavedesc(self, source):
+        desc = [
+            ('DESCRIPTOR_NAME', 'WAVEDESC'),
+            ('COMM_TYPE', 'word'),
+            ('WAVE_ARRAY_COUNT', str(len(self.samples[source]))),
+            ('PNTS_PER_SCREEN', str(len(self.samples[source]))),
+            ('RECORD_TYPE', self.record_type),
+            ('VERTICAL_GAIN', '5.0000E-01'),
+            ('VERTICAL_OFFSET', '-1.0000E+00'),
+            ('HORIZ_INTERVAL', '1.0000E-09'),
+            ('HORIZ_OFFSET', '-1.0000E-06'),
+        ]
+        return '\r\n'.join('%-20s: %s' % item for item in desc).encode()
+
+    def waveform(self, source):
+        data = self.samples[source][self.setup['FP']:]
+        data = data[::max(self.setup['SP'], 1)]
+        if self.setup['NP']:
+            # NP 0 means all points
+            data = data[:self.setup['NP']]
+        return ivi.build_ieee_block(data.astype('>i2').tobytes())
+
+    def write_raw(self, data):
+        response = list()
+        for part in data.decode().strip().split(';'):
+            header, sep, arg = part.strip().partition(' ')
+            self.cmd_log.append(part.strip())
+            source, sep, name = header.upper().rpartition(':')
+            if name == 'INSPECT?':
+                response.append(self.wavedesc(source))
+            elif name == 'WAVEFORM?':
+                response.append(self.waveform(source))
+            elif name == 'INR?':
+                response.append(self.inr().encode())
+            elif header.upper() == ':OPER:COND?':
+                # stopped
+                response.append(b'0')
+            elif name == 'WAVEFORM_SETUP':
+                args = arg.split(',')
+                self.setup = dict(zip(args[::2], [int(v) for v in args[1::2]]))
+        if response:
+            self.read_buffer = b';'.join(response) + b'\n'
+
+    def read_raw(self, num=-1):
+        data, self.read_buffer = self.read_buffer, b''
+        return data
+
+    def clear(self):
+        pass
+
+class TestLecroyBaseScope(unittest.TestCase):
+
+    def setUp(self):
+        self.vscope = VirtualLeCroy()
+        self.scope = lecroyWR104XIA(self.vscope)
+
+    def test_fetch_waveforms(self):
+        log = self.vscope.cmd_log
+        del log[:]
+        data = self.scope.measurement.fetch_waveforms(['C1', 'C3'])
+
+        self.assertEqual(log, ['COMM_ORDER HI', 'COMM_FORMAT DEF9,WORD,BIN',
+                               'C1:INSPECT? WAVEDESC', 'C1:WAVEFORM? DAT1',
+                               'C3:INSPECT? WAVEDESC', 'C3:WAVEFORM? DAT1'])
+        self.assertEqual(list(data['C1'].y), [51.0, 51.5, 52.0, 52.5])
+        self.assertEqual(list(data['C3'].y), [151.0, 151.5, 152.0, 152.5])
+        self.assertEqual(data['C3'].channel, 'C3')
+        self.assertEqual(data['C3'].x_increment, 1e-9)
+        self.assertEqual(data['C3'].x_origin, -1e-6)
+
+        # the descriptors and samples are cached until the next acquisition
+        del log[:]
+        self.scope.measurement.fetch_waveforms(['C1', 'C3'])
+        self.assertEqual([cmd for cmd in log if cmd[0] == 'C'], [])
+        self.scope._bump_acquisition_generation()
+        del log[:]
+        self.scope.measurement.fetch_waveforms(['C3', 'C1'])
+        self.assertEqual(log, ['C3:WAVEFORM? DAT1', 'C1:WAVEFORM? DAT1'])
+
+    def test_fetch_waveform_window(self):
+        log = self.vscope.cmd_log
+        self.vscope.samples['C1'] = np.arange(1, 101)
+        w = self.scope.channels['C1'].measurement.fetch_waveform(start=10, stop=90, max_points=20)
+
+        # 80 points sparsed by 4 on the instrument, then the whole record again
+        self.assertEqual(log[-3:], ['WAVEFORM_SETUP SP,4,NP,20,FP,10,SN,0', 'C1:WAVEFORM? DAT1',
+                                    'WAVEFORM_SETUP SP,0,NP,0,FP,0,SN,0'])
+        self.assertEqual(len(w.y), 20)
+        self.assertEqual(list(w.y[:3]), [6.5, 8.5, 10.5])
+        self.assertAlmostEqual(w.x_increment, 4e-9)
+        self.assertAlmostEqual(w.x_origin, -1e-6 + 10e-9)
+
+        # an empty window never asks for the record, NP 0 means all points
+        del log[:]
+        w = self.scope.channels['C1'].measurement.fetch_waveform(start=50, stop=50)
+        self.assertEqual(len(w.y), 0)
+        self.assertEqual([cmd for cmd in log if 'WAVEFORM' in cmd], [])
+
+    def test_read_waveform(self):
+        log = self.vscope.cmd_log
+        # a stale acquisition bit, then running for two polls, then triggered
+        inr = ['1', '0', '0', '1']
+        self.vscope.inr = lambda: inr.pop(0) if len(inr) > 1 else inr[0]
+        del log[:]
+        w = self.scope.channels['C1'].measurement.read_waveform(1.0)
+        self.assertEqual(list(w.y), [51.0, 51.5, 52.0, 52.5])
+
+        # INR is read once to clear it before arming, the parser is never blocked
+        self.assertEqual(log.index('TRMD SINGLE'), 1)
+        self.assertEqual(log.count('INR?'), 4)
+        self.assertNotIn(':digitize', log)
+        self.assertTrue(log.index('TRMD SINGLE') < log.index('C1:WAVEFORM? DAT1'))
+
+        # never triggers
+        inr[:] = ['0']
+        self.assertRaises(ivi.MaxTimeoutExceededException,
+                          self.scope.channels['C1'].measurement.read_waveform, 0.01)
+
+    def test_fetch_waveform_min_max(self):
+        self.assertRaises(scope.InvalidAcquisitionTypeException,
+                          self.scope.channels['C2'].measurement.fetch_waveform_min_max)
+
+        # three min, max pairs, WAVE_ARRAY_COUNT is 6
+        self.vscope.record_type = 'peak_detect'
+        self.vscope.samples['C2'] = np.array([-4, 6, -2, 8, 2, 10])
+        self.scope._invalidate_waveform_preamble()
+        w = self.scope.channels['C2'].measurement.fetch_waveform_min_max()
+
+        self.assertEqual(list(w.y_min), [-1.0, 0.0, 2.0])
+        self.assertEqual(list(w.y_max), [4.0, 5.0, 6.0])
+        self.assertEqual(w.x_increment, 1e-9)
+        self.assertEqual(w.x_origin, -1e-6)
+        self.assertEqual(w.channel, 'C2')
+
+        # a block shorter than the descriptor marks the descriptor stale
+        waveform = self.vscope.waveform
+        self.vscope.waveform = lambda source: waveform(source)[:-2]
+        self.assertRaises(ivi.UnexpectedResponseException,
+                          self.scope.channels['C2'].measurement.fetch_waveform_min_max)
+        self.assertFalse(self.scope._get_cache_valid('waveform_preamble', 1))
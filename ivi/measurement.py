@@ -0,0 +1,301 @@
+"""
+
+Python Interchangeable Virtual Instrument Library
+
+Copyright (c) 2014 Alex Forencich
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import warnings
+
+import numpy as np
+
+from . import ivi
+from . import scope
+
+# number of histogram bins used to find the top and base voltages
+HistogramBins = 256
+
+def reference_levels(driver):
+    "Read the (low, middle, high) reference levels in percent from a scope driver"
+    return (driver.reference_level.low, driver.reference_level.middle, driver.reference_level.high)
+
+
+def _per_row(row, values, rows, first=True):
+    "Pick the first or last value of each row from row sorted crossing lists, NaN where missing"
+    out = np.full(rows, np.nan)
+    if len(row):
+        if first:
+            idx = np.flatnonzero(np.r_[True, row[1:] != row[:-1]])
+        else:
+            idx = np.flatnonzero(np.r_[row[1:] != row[:-1], True])
+        out[row[idx]] = values[idx]
+    return out
+
+
+class _Crossings(object):
+    "Interpolated level crossings of all rows, sorted by row and time"
+    
+    def __init__(self, y, level, rising):
+        a = y[:, :-1] - level[:, np.newaxis]
+        b = y[:, 1:] - level[:, np.newaxis]
+        if rising:
+            mask = (a < 0) & (b >= 0)
+        else:
+            mask = (a > 0) & (b <= 0)
+        self.row, i = np.nonzero(mask)
+        a = a[self.row, i]
+        b = b[self.row, i]
+        self.t = i + a / (a - b)
+        # global position, sorted since np.nonzero returns row major order
+        self.key = self.row * y.shape[1] + self.t
+        self.rows = y.shape[0]
+    
+    def first(self):
+        return _per_row(self.row, self.t, self.rows, True)
+    
+    def last(self):
+        return _per_row(self.row, self.t, self.rows, False)
+    
+    def count(self):
+        return np.bincount(self.row, minlength=self.rows)
+    
+    def _lookup(self, row, t, n, after):
+        out = np.full(self.rows, np.nan)
+        valid = ~np.isnan(t)
+        key = row[valid] * n + t[valid]
+        if after:
+            idx = np.searchsorted(self.key, key, 'right')
+        else:
+            idx = np.searchsorted(self.key, key, 'left') - 1
+        ok = (idx >= 0) & (idx < len(self.key))
+        idx = np.clip(idx, 0, max(len(self.key) - 1, 0))
+        if len(self.key):
+            ok &= self.row[idx] == row[valid]
+        r = row[valid][ok]
+        out[r] = self.t[idx[ok]]
+        return out
+    
+    def next_after(self, t, n):
+        "First crossing of each row after time t of that row"
+        return self._lookup(np.arange(self.rows), t, n, True)
+    
+    def last_before(self, t, n):
+        "Last crossing of each row before time t of that row"
+        return self._lookup(np.arange(self.rows), t, n, False)
+
+
+class WaveformAnalysis(object):
+    """Vectorized IVI waveform measurements on one record or a batch of records
+    
+    data is a Waveform, a 1-D array of samples or a 2-D (records, points)
+    array such as the result of fetch_segments.  dt is the sample interval,
+    taken from the Waveform when one is given.  reference_level is a tuple of
+    the (low, middle, high) reference levels in percent of the amplitude or a
+    scope driver whose reference_level settings are used.
+    
+    Intermediate results are shared, so computing several measurements on one
+    analysis object is cheaper than separate calls."""
+    
+    def __init__(self, data, dt=None, reference_level=None):
+        if isinstance(data, scope.Waveform):
+            if dt is None:
+                dt = data.x_increment
+            data = data.y
+        if dt is None:
+            dt = 1.0
+        if reference_level is None:
+            reference_level = (10.0, 50.0, 90.0)
+        elif hasattr(reference_level, 'reference_level'):
+            reference_level = reference_levels(reference_level)
+        
+        y = np.asarray(data, dtype=float)
+        self._single = y.ndim == 1
+        self.y = np.atleast_2d(y)
+        self.dt = float(dt)
+        self.reference_level = tuple(float(v) for v in reference_level)
+        self._cache = dict()
+    
+    def _cached(self, name, f):
+        if name not in self._cache:
+            self._cache[name] = f()
+        return self._cache[name]
+    
+    def _result(self, value):
+        if self._single:
+            return value[0]
+        return value
+    
+    # voltage levels
+    
+    def _max(self):
+        return self._cached('max', lambda: np.nanmax(self.y, axis=1))
+    
+    def _min(self):
+        return self._cached('min', lambda: np.nanmin(self.y, axis=1))
+    
+    def _top_base(self):
+        def f():
+            rows, n = self.y.shape
+            vmin = self._min()
+            span = self._max() - vmin
+            span[span == 0] = 1.0
+            b = (self.y - vmin[:, np.newaxis]) / span[:, np.newaxis] * (HistogramBins - 1)
+            valid = ~np.isnan(b)
+            b = np.rint(np.where(valid, b, 0)).astype(np.intp)
+            b += np.arange(rows)[:, np.newaxis] * HistogramBins
+            counts = np.bincount(b[valid], minlength=rows * HistogramBins).reshape(rows, HistogramBins)
+            # modes of the upper and lower half of the histogram
+            h = HistogramBins // 2
+            top = np.argmax(counts[:, h:], axis=1) + h
+            base = np.argmax(counts[:, :h], axis=1)
+            top = vmin + top * span / (HistogramBins - 1)
+            base = vmin + base * span / (HistogramBins - 1)
+            # records without samples in one half (flat lines) use the extremes
+            top = np.where(counts[:, h:].any(axis=1), top, self._max())
+            base = np.where(counts[:, :h].any(axis=1), base, self._min())
+            return (top, base)
+        return self._cached('top_base', f)
+    
+    def _high(self):
+        return self._top_base()[0]
+    
+    def _low(self):
+        return self._top_base()[1]
+    
+    def _amplitude(self):
+        return self._high() - self._low()
+    
+    def _level(self, k):
+        return self._low() + self._amplitude() * self.reference_level[k] / 100.0
+    
+    def _crossings(self, k, rising):
+        return self._cached(('crossings', k, rising), lambda: _Crossings(self.y, self._level(k), rising))
+    
+    # timing
+    
+    def _period(self):
+        def f():
+            c = self._crossings(1, True)
+            n = c.count()
+            with np.errstate(invalid='ignore', divide='ignore'):
+                p = (c.last() - c.first()) / (n - 1)
+            p[n < 2] = np.nan
+            return p * self.dt
+        return self._cached('period', f)
+    
+    def _edge_time(self, rising):
+        mid = self._crossings(1, rising).first()
+        n = self.y.shape[1]
+        if rising:
+            start = self._crossings(0, True).last_before(mid, n)
+            stop = self._crossings(2, True).next_after(mid, n)
+        else:
+            start = self._crossings(2, False).last_before(mid, n)
+            stop = self._crossings(0, False).next_after(mid, n)
+        return (stop - start) * self.dt
+    
+    def _width(self, positive):
+        start = self._crossings(1, positive).first()
+        stop = self._crossings(1, not positive).next_after(start, self.y.shape[1])
+        return (stop - start) * self.dt
+    
+    def _cycle_mask(self):
+        def f():
+            c = self._crossings(1, True)
+            start = c.first()
+            stop = c.last()
+            stop[c.count() < 2] = np.nan
+            i = np.arange(self.y.shape[1])
+            with np.errstate(invalid='ignore'):
+                return (i >= np.ceil(start)[:, np.newaxis]) & (i < np.ceil(stop)[:, np.newaxis])
+        return self._cached('cycle_mask', f)
+    
+    def _cycle_mean(self, y):
+        mask = self._cycle_mask()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(mask, y, 0).sum(axis=1) / mask.sum(axis=1)
+    
+    def measure(self, function):
+        "Compute one of the measurement functions listed in scope.MeasurementFunction"
+        if function not in scope.MeasurementFunction:
+            raise ivi.ValueNotSupportedException()
+        with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+            # records without valid samples measure as NaN, like any other
+            # value that cannot be determined
+            warnings.simplefilter('ignore', RuntimeWarning)
+            if function == 'rise_time':
+                v = self._edge_time(True)
+            elif function == 'fall_time':
+                v = self._edge_time(False)
+            elif function == 'frequency':
+                v = 1.0 / self._period()
+            elif function == 'period':
+                v = self._period()
+            elif function == 'voltage_rms':
+                v = np.sqrt(np.nanmean(self.y ** 2, axis=1))
+            elif function == 'voltage_peak_to_peak':
+                v = self._max() - self._min()
+            elif function == 'voltage_max':
+                v = self._max()
+            elif function == 'voltage_min':
+                v = self._min()
+            elif function == 'voltage_high':
+                v = self._high()
+            elif function == 'voltage_low':
+                v = self._low()
+            elif function == 'voltage_average':
+                v = np.nanmean(self.y, axis=1)
+            elif function == 'width_negative':
+                v = self._width(False)
+            elif function == 'width_positive':
+                v = self._width(True)
+            elif function == 'duty_cycle_negative':
+                v = self._width(False) / self._period() * 100.0
+            elif function == 'duty_cycle_positive':
+                v = self._width(True) / self._period() * 100.0
+            elif function == 'amplitude':
+                v = self._amplitude()
+            elif function == 'voltage_cycle_rms':
+                v = np.sqrt(self._cycle_mean(self.y ** 2))
+            elif function == 'voltage_cycle_average':
+                v = self._cycle_mean(self.y)
+            elif function == 'overshoot':
+                v = (self._max() - self._high()) / self._amplitude() * 100.0
+            elif function == 'preshoot':
+                v = (self._low() - self._min()) / self._amplitude() * 100.0
+        return self._result(v)
+    
+    def measure_all(self, functions=None):
+        "Compute several measurement functions, returns a dict keyed by function"
+        if functions is None:
+            functions = sorted(scope.MeasurementFunction)
+        return dict((f, self.measure(f)) for f in functions)
+
+
+def measure(data, function, dt=None, reference_level=None):
+    """Compute a scope measurement function on the host
+    
+    Returns a float for a single record or an array with one value per record
+    for a 2-D batch.  Values that cannot be determined, such as the period of a
+    record without two rising edges or any measurement of a record holding
+    only NaN samples, are NaN."""
+    return WaveformAnalysis(data, dt, reference_level).measure(function)
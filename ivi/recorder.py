@@ -0,0 +1,248 @@
+"""
+
+Python Interchangeable Virtual Instrument Library
+
+Copyright (c) 2014 Alex Forencich
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import json
+import os
+import struct
+import time
+
+import numpy as np
+
+from . import ivi
+
+RecordIndexType = np.dtype([('timestamp', float), ('time_tag', float),
+        ('x_increment', float), ('x_origin', float), ('x_reference', float),
+        ('y_increment', float), ('y_origin', float), ('y_reference', float)])
+
+ChannelSettings = ['enabled', 'coupling', 'input_impedance', 'offset', 'probe_attenuation', 'range']
+AcquisitionSettings = ['record_length', 'sample_rate', 'start_time', 'time_per_record', 'type']
+
+def _npy_header(dtype, shape, size=None):
+    "Build a version 1.0 .npy header, padded to size bytes"
+    header = "{'descr': %r, 'fortran_order': False, 'shape': %r, }" % (
+            np.lib.format.dtype_to_descr(dtype), tuple(shape))
+    if size is None:
+        # leave room for the record count to grow, keep the data aligned
+        size = (10 + len(header) + 32 + 63) // 64 * 64
+    header = header + ' ' * (size - 10 - len(header) - 1) + '\n'
+    return b'\x93NUMPY\x01\x00' + struct.pack('<H', len(header)) + header.encode('latin1')
+
+
+class NpyAppender(object):
+    "Growable .npy file written through a memory map"
+    
+    def __init__(self, filename, dtype, row_shape=(), capacity=1024):
+        self.filename = filename
+        self.dtype = np.dtype(dtype)
+        self.row_shape = tuple(row_shape)
+        self.count = 0
+        
+        self._row_size = self.dtype.itemsize * int(np.prod(self.row_shape))
+        self._header_size = len(_npy_header(self.dtype, (2**63,) + self.row_shape))
+        self._file = open(filename, 'w+b')
+        self._map = None
+        self._capacity = 0
+        
+        self.commit()
+        self._grow(max(int(capacity), 1))
+    
+    def _grow(self, capacity):
+        if self._map is not None:
+            self._map.flush()
+            self._map = None
+        self._file.truncate(self._header_size + capacity * self._row_size)
+        if self._row_size:
+            self._map = np.memmap(self._file, self.dtype, 'r+', self._header_size, (capacity,) + self.row_shape)
+        else:
+            self._map = np.zeros((capacity,) + self.row_shape, self.dtype)
+        self._capacity = capacity
+    
+    def append(self, rows):
+        "Append an array of rows, growing the file geometrically when needed"
+        n = len(rows)
+        if self.count + n > self._capacity:
+            self._grow(max(2 * self._capacity, self.count + n))
+        self._map[self.count:self.count+n] = rows
+        self.count += n
+    
+    def commit(self):
+        "Flush the data and publish the new record count in the header"
+        if self._map is not None and self._row_size:
+            self._map.flush()
+        self._file.seek(0)
+        self._file.write(_npy_header(self.dtype, (self.count,) + self.row_shape, self._header_size))
+        self._file.flush()
+    
+    def close(self):
+        if self._file is None:
+            return
+        self.commit()
+        self._map = None
+        self._file.truncate(self._header_size + self.count * self._row_size)
+        self._file.close()
+        self._file = None
+
+
+class WaveformRecorder(object):
+    """Record waveforms into memory mapped .npy files with a sidecar index
+    
+    The samples are stored with the dtype of the first record unless dtype
+    is given, for example np.float32 to halve the file size."""
+    
+    def __init__(self, path, dtype=None, capacity=1024):
+        self.path = path
+        self.dtype = None if dtype is None else np.dtype(dtype)
+        self.capacity = capacity
+        self.settings = dict()
+        
+        self._channels = list()
+        self._data = dict()
+        self._index = dict()
+        
+        if not os.path.isdir(path):
+            os.makedirs(path)
+    
+    def _open_channel(self, channel, points, dtype):
+        name = str(channel)
+        if name not in self._data:
+            if self.dtype is None:
+                self.dtype = dtype
+            self._channels.append(name)
+            self._data[name] = NpyAppender(os.path.join(self.path, name + '.npy'),
+                                           self.dtype, (points,), self.capacity)
+            self._index[name] = NpyAppender(os.path.join(self.path, name + '.index.npy'),
+                                            RecordIndexType, (), self.capacity)
+            self._write_metadata()
+        elif self._data[name].row_shape != (points,):
+            raise ivi.ValueNotSupportedException()
+        return self._data[name], self._index[name]
+    
+    def _write_metadata(self):
+        meta = {'channels': self._channels, 'settings': self.settings,
+                'dtype': None if self.dtype is None else self.dtype.str}
+        with open(os.path.join(self.path, 'recording.json'), 'w') as f:
+            json.dump(meta, f, indent=1, default=str)
+    
+    def extend(self, channel, data, waveform=None, time_tag=None, timestamp=None):
+        "Append a (records, points) array for one channel, sharing the scaling of waveform"
+        data = np.asarray(data)
+        if data.ndim == 1:
+            data = data[np.newaxis]
+        
+        d, index = self._open_channel(channel, data.shape[1], data.dtype)
+        
+        rows = np.empty(len(data), dtype=RecordIndexType)
+        rows['timestamp'] = time.time() if timestamp is None else timestamp
+        rows['time_tag'] = np.nan if time_tag is None else time_tag
+        for field in RecordIndexType.names[2:]:
+            rows[field] = getattr(waveform, field, np.nan)
+        
+        d.append(data)
+        index.append(rows)
+    
+    def append(self, waveforms, time_tag=None, timestamp=None):
+        """Append one record per channel
+        
+        waveforms is a Waveform or a dict of Waveforms, as returned by
+        fetch_waveform and fetch_waveforms."""
+        if timestamp is None:
+            timestamp = time.time()
+        if not isinstance(waveforms, dict):
+            waveforms = {waveforms.channel: waveforms}
+        for channel in waveforms:
+            wfm = waveforms[channel]
+            self.extend(channel, wfm.y, wfm, time_tag, timestamp)
+    
+    def capture_settings(self, driver, channels):
+        "Store the channel and acquisition settings of driver in the recording metadata"
+        for ch in channels:
+            d = dict()
+            for name in ChannelSettings:
+                try:
+                    d[name] = getattr(driver.channels[ch], name)
+                except Exception:
+                    pass
+            self.settings[str(ch)] = d
+        d = dict()
+        for name in AcquisitionSettings:
+            try:
+                d[name] = getattr(driver.acquisition, name)
+            except Exception:
+                pass
+        self.settings['acquisition'] = d
+        self._write_metadata()
+    
+    def record(self, driver, channels, count=None, queue_depth=2):
+        """Acquire and record count records of channels, returns the number of records
+        
+        The time tag of each record is the segment time tag reported by the
+        driver, NaN where the acquisition has none."""
+        self.capture_settings(driver, channels)
+        n = 0
+        with driver.measurement.stream_waveforms(channels, count, queue_depth) as stream:
+            for waveforms in stream:
+                self.append(waveforms, stream.time_tag)
+                n += 1
+                if n % self.capacity == 0:
+                    self.flush()
+        self.flush()
+        return n
+    
+    def flush(self):
+        "Make all appended records visible to readers"
+        for name in self._channels:
+            self._data[name].commit()
+            self._index[name].commit()
+    
+    def close(self):
+        for name in self._channels:
+            self._data[name].close()
+            self._index[name].close()
+        self._write_metadata()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def open_recording(path):
+    """Open a recording for reading without copying the data
+    
+    Returns the recording metadata and a dict that maps each channel to a
+    tuple of a read only (records, points) array and the record index.
+    Records appended to an open recording become visible after a flush on the
+    writing side and reopening."""
+    with open(os.path.join(path, 'recording.json')) as f:
+        meta = json.load(f)
+    channels = dict()
+    for name in meta['channels']:
+        data = np.load(os.path.join(path, name + '.npy'), mmap_mode='r')
+        index = np.load(os.path.join(path, name + '.index.npy'), mmap_mode='r')
+        n = min(len(data), len(index))
+        channels[name] = (data[:n], index[:n])
+    return meta, channels
@@ -133,10 +133,7 @@ class Base(ivi.IviContainer):
         return True
     
     def _rf_wait_until_settled(self, maximum_time):
-        t = 0
-        while not self._rf_is_settled() and t < maximum_time:
-            time.sleep(0.01)
-            t = t + 0.01
+        self._driver_operation_wait_for(self._rf_is_settled, maximum_time)
     
     
 class ModulateAM(ivi.IviContainer):
@@ -0,0 +1,287 @@
+"""
+
+Python Interchangeable Virtual Instrument Library
+
+Copyright (c) 2014 Alex Forencich
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import json
+import multiprocessing
+import time
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+
+try:
+    monotonic = time.monotonic
+except AttributeError:
+    monotonic = time.time
+
+import numpy as np
+
+from . import ivi
+from . import scope
+
+# Exceptions
+class RecordOverwrittenException(ivi.IviException): pass
+
+_header_size = 1024
+_attached = dict()
+_created = set()
+
+def _align(n):
+    return (n + 63) // 64 * 64
+
+
+class SharedWaveformRing(object):
+    """Ring of fixed size waveform slots in shared memory
+    
+    The producer writes decoded records into the slots with put or fetch and
+    hands the returned sequence number to a worker process. The worker attaches
+    to the ring by name, reads the record without copying it and releases the
+    slot when done. The producer waits for a slot to be released before it is
+    reused."""
+    
+    def __init__(self, channels, points, slots=8, dtype=np.float64, name=None, _shm=None):
+        if shared_memory is None:
+            raise ivi.OperationNotSupportedException()
+        
+        self.channels = [str(ch) for ch in channels]
+        self.points = int(points)
+        self.slots = int(slots)
+        self.dtype = np.dtype(dtype)
+        
+        n = len(self.channels)
+        # seq, ack, timestamp, points per channel, scaling per channel
+        self._slot_header_size = _align(8 * (3 + n + 6 * n))
+        self._slot_data_size = _align(n * self.points * self.dtype.itemsize)
+        self._slot_size = self._slot_header_size + self._slot_data_size
+        
+        self._owner = _shm is None
+        if self._owner:
+            self._shm = shared_memory.SharedMemory(name=name, create=True,
+                                                   size=_header_size + self.slots * self._slot_size)
+            layout = json.dumps({'channels': self.channels, 'points': self.points,
+                                 'slots': self.slots, 'dtype': self.dtype.str}).encode('ascii')
+            if len(layout) > _header_size - 8:
+                raise ivi.ValueNotSupportedException()
+            self._shm.buf[:8] = np.int64(len(layout)).tobytes()
+            self._shm.buf[8:8+len(layout)] = layout
+            _created.add(self._shm.name)
+        else:
+            self._shm = _shm
+        
+        self.name = self._shm.name
+        self._next_seq = 1
+        
+        buf = self._shm.buf
+        self._seq = list()
+        self._timestamp = list()
+        self._used = list()
+        self._scale = list()
+        self._data = list()
+        for k in range(self.slots):
+            offset = _header_size + k * self._slot_size
+            header = np.ndarray(3 + n + 6 * n, np.float64, buf, offset)
+            # seq and ack share the header with float fields, view them as integers
+            self._seq.append(np.ndarray(2, np.int64, buf, offset))
+            self._timestamp.append(header[2:3])
+            self._used.append(np.ndarray(n, np.int64, buf, offset + 24))
+            self._scale.append(header[3+n:].reshape(n, 6))
+            self._data.append(np.ndarray((n, self.points), self.dtype, buf, offset + self._slot_header_size))
+        
+        if self._owner:
+            for k in range(self.slots):
+                self._seq[k][:] = 0
+    
+    @classmethod
+    def attach(cls, name):
+        "Attach to an existing ring, reusing the attachment within a process"
+        if name in _attached:
+            return _attached[name]
+        if shared_memory is None:
+            raise ivi.OperationNotSupportedException()
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            shm = shared_memory.SharedMemory(name=name)
+            if multiprocessing.parent_process() is None and shm.name not in _created:
+                # before Python 3.13 attaching registers the block with the
+                # resource tracker of an unrelated process, which would unlink
+                # it when that process exits; child processes share the
+                # tracker of the creating process and need no special care
+                from multiprocessing import resource_tracker
+                resource_tracker.unregister(shm._name, 'shared_memory')
+        n = int(np.frombuffer(shm.buf[:8], np.int64)[0])
+        layout = json.loads(bytes(shm.buf[8:8+n]).decode('ascii'))
+        ring = cls(layout['channels'], layout['points'], layout['slots'], layout['dtype'], _shm=shm)
+        _attached[name] = ring
+        return ring
+    
+    def _slot(self, seq):
+        return (seq - 1) % self.slots
+    
+    def _wait_free(self, slot, timeout):
+        seq = self._seq[slot]
+        deadline = None if timeout is None else monotonic() + timeout
+        delay = 0.0001
+        while seq[1] != seq[0]:
+            if deadline is not None and monotonic() > deadline:
+                raise ivi.MaxTimeoutExceededException()
+            time.sleep(delay)
+            delay = min(delay * 2, 0.01)
+    
+    def put(self, waveforms, timeout=None, timestamp=None):
+        """Copy a record into the next slot and return its sequence number
+        
+        waveforms is a dict of Waveforms keyed by channel, as returned by
+        fetch_waveforms. Blocks until the slot is released, raising a Max Time
+        Exceeded error after timeout seconds. Records longer than the slot
+        raise an Out Of Range error."""
+        records = list()
+        for k, ch in enumerate(self.channels):
+            wfm = waveforms[ch] if ch in waveforms else waveforms[k]
+            if len(wfm.y) > self.points:
+                raise ivi.OutOfRangeException()
+            records.append(wfm)
+        
+        seq = self._next_seq
+        slot = self._slot(seq)
+        self._wait_free(slot, timeout)
+        
+        data = self._data[slot]
+        for k, wfm in enumerate(records):
+            data[k, :len(wfm.y)] = wfm.y
+        
+        return self._publish(seq, slot, records, timestamp)
+    
+    def fetch(self, driver, initiate=True, timeout=None):
+        """Acquire a record of all ring channels with driver and put it in the ring
+        
+        The raw blocks read from the instrument are decoded straight into the
+        slot, without an intermediate array."""
+        if initiate:
+            driver.measurement.initiate()
+        
+        if not hasattr(driver, '_measurement_decode_waveform'):
+            # no raw transfer, copy the decoded waveforms
+            return self.put(driver.measurement.fetch_waveforms(self.channels), timeout)
+        
+        indices = [ivi.get_index(driver._channel_name, ch) for ch in self.channels]
+        records = driver._measurement_fetch_waveforms_raw(indices)
+        
+        seq = self._next_seq
+        slot = self._slot(seq)
+        self._wait_free(slot, timeout)
+        
+        data = self._data[slot]
+        waveforms = list()
+        for k, (pre, raw_data) in enumerate(records):
+            if pre is None:
+                # already decoded by the driver
+                wfm = raw_data
+                if len(wfm.y) > self.points:
+                    raise ivi.OutOfRangeException()
+                data[k, :len(wfm.y)] = wfm.y
+            else:
+                wfm = driver._measurement_decode_waveform(indices[k], pre, raw_data, data[k])
+            waveforms.append(wfm)
+        
+        return self._publish(seq, slot, waveforms, None)
+    
+    def _publish(self, seq, slot, records, timestamp):
+        for k, wfm in enumerate(records):
+            self._used[slot][k] = len(wfm.y)
+            self._scale[slot][k] = (wfm.x_increment, wfm.x_origin, wfm.x_reference,
+                                    wfm.y_increment, wfm.y_origin, wfm.y_reference)
+        self._timestamp[slot][0] = time.time() if timestamp is None else timestamp
+        
+        # publish the record only once it is complete
+        self._seq[slot][0] = seq
+        self._next_seq += 1
+        return seq
+    
+    def get(self, seq):
+        """Return the record with sequence number seq as a dict of Waveforms
+        
+        The sample arrays are views of the shared memory and remain valid until
+        the record is released."""
+        slot = self._slot(seq)
+        if self._seq[slot][0] != seq:
+            raise RecordOverwrittenException()
+        waveforms = dict()
+        for k, ch in enumerate(self.channels):
+            scale = self._scale[slot][k]
+            waveforms[ch] = scope.Waveform(self._data[slot][k, :self._used[slot][k]],
+                                           scale[0], scale[1], int(scale[2]),
+                                           scale[3], scale[4], scale[5], ch)
+        return waveforms
+    
+    def timestamp(self, seq):
+        return float(self._timestamp[self._slot(seq)][0])
+    
+    def release(self, seq):
+        "Hand the slot of record seq back to the producer"
+        slot = self._slot(seq)
+        if self._seq[slot][0] == seq:
+            self._seq[slot][1] = seq
+    
+    def pending(self):
+        "Number of records put in the ring that are not released yet"
+        return sum(int(s[0] != s[1]) for s in self._seq)
+    
+    def record(self, seq):
+        "Context manager that returns the record seq and releases it on exit"
+        return _RecordContext(self, seq)
+    
+    def close(self):
+        if _attached.get(self.name) is self:
+            del _attached[self.name]
+        self._seq = self._timestamp = self._used = self._scale = self._data = None
+        self._shm.close()
+    
+    def unlink(self):
+        "Free the shared memory block, called by the creating process"
+        _created.discard(self.name)
+        self._shm.unlink()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        if self._owner:
+            self.unlink()
+
+
+class _RecordContext(object):
+    def __init__(self, ring, seq):
+        self._ring = ring
+        self._seq = seq
+    
+    def __enter__(self):
+        return self._ring.get(self._seq)
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._ring.release(self._seq)
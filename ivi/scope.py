@@ -24,6 +24,16 @@ THE SOFTWARE.
 
 """
 
+import copy
+import threading
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+import numpy as np
+
 from . import ivi
 
 # Exceptions
@@ -53,6 +63,287 @@ MeasurementFunction = set(['rise_time', 'fall_time', 'frequency', 'period',
         'amplitude', 'voltage_cycle_rms', 'voltage_cycle_average',
         'overshoot', 'preshoot'])
 AcquisitionStatus = set(['complete', 'in_progress', 'unknown'])
+StreamPolicy = set(['block', 'drop'])
+
+
+def decode_waveform_data(raw_data, dtype, y_increment=1.0, y_origin=0.0, y_reference=0, y_hole=None, out=None):
+    "Convert raw sample data into an array of voltages, replacing hole values with NaN"
+    raw = np.frombuffer(raw_data, dtype=dtype)
+    if out is None:
+        out = np.empty(len(raw))
+    elif len(out) < len(raw):
+        raise ivi.OutOfRangeException()
+    y = out[:len(raw)]
+    np.subtract(raw, float(y_reference), out=y)
+    y *= y_increment
+    y += y_origin
+    if y_hole is not None:
+        y[raw == y_hole] = np.nan
+    return y
+
+
+class Waveform(object):
+    "Waveform record returned by the waveform fetch and read functions"
+    
+    def __init__(self, y=None, x_increment=1.0, x_origin=0.0, x_reference=0,
+                 y_increment=1.0, y_origin=0.0, y_reference=0, channel=None):
+        if y is None:
+            y = np.zeros(0)
+        self.y = y
+        self.x_increment = x_increment
+        self.x_origin = x_origin
+        self.x_reference = x_reference
+        self.y_increment = y_increment
+        self.y_origin = y_origin
+        self.y_reference = y_reference
+        self.channel = channel
+    
+    @property
+    def x(self):
+        "Time axis of the record, computed from the horizontal preamble"
+        return (np.arange(len(self.y)) - self.x_reference) * self.x_increment + self.x_origin
+    
+    def __len__(self):
+        return len(self.y)
+    
+    def __iter__(self):
+        return zip(self.x.tolist(), self.y.tolist())
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(zip(self.x[index].tolist(), self.y[index].tolist()))
+        if index < 0:
+            index += len(self.y)
+        if index < 0 or index >= len(self.y):
+            raise IndexError('waveform index out of range')
+        return ((index - self.x_reference) * self.x_increment + self.x_origin, self.y[index].tolist())
+    
+    def __array__(self, dtype=None, copy=None):
+        return np.column_stack((self.x, self.y)).astype(dtype if dtype is not None else float)
+
+
+class EnvelopeWaveform(Waveform):
+    "Minimum and maximum waveform record returned by the min/max fetch and read functions"
+    
+    def __init__(self, y_min=None, y_max=None, x_increment=1.0, x_origin=0.0, x_reference=0,
+                 y_increment=1.0, y_origin=0.0, y_reference=0, channel=None):
+        if y_min is None:
+            y_min = np.zeros(0)
+        if y_max is None:
+            y_max = np.zeros(0)
+        super(EnvelopeWaveform, self).__init__(y_max, x_increment, x_origin, x_reference,
+                                               y_increment, y_origin, y_reference, channel)
+        self.y_min = y_min
+        self.y_max = y_max
+    
+    def __iter__(self):
+        return zip(self.x.tolist(), self.y_min.tolist(), self.y_max.tolist())
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(zip(self.x[index].tolist(), self.y_min[index].tolist(), self.y_max[index].tolist()))
+        if index < 0:
+            index += len(self.y)
+        if index < 0 or index >= len(self.y):
+            raise IndexError('waveform index out of range')
+        return ((index - self.x_reference) * self.x_increment + self.x_origin,
+                self.y_min[index].tolist(), self.y_max[index].tolist())
+    
+    def __array__(self, dtype=None, copy=None):
+        return np.column_stack((self.x, self.y_min, self.y_max)).astype(dtype if dtype is not None else float)
+
+
+def decimate_min_max(y, max_points):
+    """Reduce y to at most max_points samples
+    
+    Keeps the minimum and maximum of each group of samples as interleaved
+    pairs.  Returns the reduced array and the number of input samples per
+    pair."""
+    n = len(y)
+    pairs = max(int(max_points) // 2, 1)
+    size = -(-n // pairs)
+    if size <= 1:
+        return y, 1
+    m = n // size * size
+    out = np.empty(2 * (-(-n // size)), dtype=y.dtype)
+    b = y[:m].reshape(-1, size)
+    out[0:2*len(b):2] = np.fmin.reduce(b, axis=1)
+    out[1:2*len(b):2] = np.fmax.reduce(b, axis=1)
+    if m < n:
+        out[-2] = np.fmin.reduce(y[m:])
+        out[-1] = np.fmax.reduce(y[m:])
+    return out, size
+
+
+def window_waveform(waveform, start=None, stop=None, step=None, max_points=None):
+    "Select part of a waveform and reduce it to at most max_points samples on the host"
+    y = waveform.y
+    start, stop, step = slice(start, stop, step).indices(len(y))
+    if step < 1:
+        raise ivi.ValueNotSupportedException()
+    y = y[start:stop:step]
+    x_increment = waveform.x_increment * step
+    x_origin = waveform.x_origin + (start - waveform.x_reference) * waveform.x_increment
+    if max_points is not None and len(y) > max_points:
+        y, size = decimate_min_max(y, max_points)
+        # a min, max pair covers size samples
+        x_increment = x_increment * size / 2.0
+    return Waveform(y, x_increment, x_origin, 0, waveform.y_increment, waveform.y_origin,
+                    waveform.y_reference, waveform.channel)
+
+
+MeasurementStatisticsType = np.dtype([('current', float), ('min', float), ('max', float),
+        ('mean', float), ('stddev', float), ('count', int)])
+
+
+def split_min_max(y):
+    "Split interleaved min/max sample pairs into separate min and max arrays"
+    y = y[:len(y) // 2 * 2].reshape(-1, 2)
+    return y[:, 0], y[:, 1]
+
+
+class DigitalWaveform(Waveform):
+    "Digital channel record with one column of logic states per channel"
+    
+    def __init__(self, raw=None, x_increment=1.0, x_origin=0.0, x_reference=0, channel=None):
+        if raw is None:
+            raw = np.zeros((0, 1), dtype=np.uint8)
+        self.raw = raw
+        # bit n of pod byte k is digital channel 8*k+n; unpackbits puts the
+        # MSB first, so flip the bits of each byte
+        bits = np.unpackbits(raw, axis=1).reshape(len(raw), -1, 8)[:, :, ::-1]
+        bits = bits.reshape(len(raw), -1).astype(bool)
+        super(DigitalWaveform, self).__init__(bits, x_increment, x_origin, x_reference, channel=channel)
+    
+    @property
+    def bits(self):
+        "Logic states as a (points, channels) boolean array"
+        return self.y
+
+
+class WaveformStream(object):
+    "Iterator over waveforms acquired and transferred by a background thread"
+    
+    def __init__(self, driver, channels, count=None, queue_depth=2, policy='block'):
+        if policy not in StreamPolicy:
+            raise ivi.ValueNotSupportedException()
+        if queue_depth < 1:
+            raise ivi.OutOfRangeException()
+        
+        self._driver = driver
+        self._channels = list(channels)
+        self._indices = [ivi.get_index(driver._channel_name, ch) for ch in self._channels]
+        self._count = count
+        self._policy = policy
+        
+        # raw records of each slot, decoded by the consumer
+        self._record = [None for k in range(queue_depth)]
+        
+        self._free = queue.Queue()
+        self._ready = queue.Queue()
+        for k in range(queue_depth):
+            self._free.put(k)
+        
+        self.acquired = 0
+        self.delivered = 0
+        self.time_tag = None
+        self.dropped = 0
+        self.late = 0
+        self._error = None
+        self._stop = threading.Event()
+        self._done = False
+        
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+    
+    def _get_free_slot(self):
+        try:
+            return self._free.get_nowait()
+        except queue.Empty:
+            pass
+        
+        if self._policy == 'drop':
+            return None
+        
+        # consumer fell behind, wait for it
+        self.late += 1
+        while not self._stop.is_set():
+            try:
+                return self._free.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return None
+    
+    def _run(self):
+        try:
+            while not self._stop.is_set() and (self._count is None or self.acquired < self._count):
+                self._driver._measurement_initiate()
+                self.acquired += 1
+                
+                slot = self._get_free_slot()
+                
+                if slot is None:
+                    if self._stop.is_set():
+                        break
+                    self.dropped += 1
+                    continue
+                
+                # the raw blocks are handed over as read, without another copy
+                records = self._driver._measurement_fetch_waveforms_raw(self._indices)
+                self._record[slot] = (records, self._driver._measurement_fetch_time_tag())
+                
+                self._ready.put(slot)
+        except Exception as e:
+            self._error = e
+        finally:
+            self._ready.put(None)
+    
+    def __iter__(self):
+        return self
+    
+    def __next__(self):
+        if self._done:
+            raise StopIteration
+        
+        slot = self._ready.get()
+        
+        if slot is None:
+            self._done = True
+            if self._error is not None:
+                raise self._error
+            raise StopIteration
+        
+        try:
+            records, self.time_tag = self._record[slot]
+            data = dict()
+            for k, ch in enumerate(self._channels):
+                pre, raw_data = records[k]
+                if pre is None:
+                    data[ch] = raw_data
+                else:
+                    data[ch] = self._driver._measurement_decode_waveform(self._indices[k], pre, raw_data)
+            self._record[slot] = None
+        finally:
+            self._free.put(slot)
+        
+        self.delivered += 1
+        return data
+    
+    next = __next__
+    
+    def close(self):
+        "Stop the background thread and wait for it to finish"
+        self._stop.set()
+        self._thread.join()
+        self._done = True
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
 
 class Base(ivi.IviContainer):
     "Base IVI methods for all oscilloscopes"
@@ -60,6 +351,9 @@ class Base(ivi.IviContainer):
     def __init__(self, *args, **kwargs):
         # needed for _init_channels calls from other __init__ methods
         self._channel_count = 1
+        # needed for invalidate_all_attributes calls during initialize
+        self._waveform_cache = dict()
+        self._acquisition_generation = 0
         
         super(Base, self).__init__( *args, **kwargs)
         
@@ -88,6 +382,8 @@ class Base(ivi.IviContainer):
         self._trigger_edge_slope = 'positive'
         self._trigger_source = ""
         self._trigger_type = 'edge'
+        self._waveform_preamble = dict()
+        self._measurement_cache_check_trigger_event = False
         
         self._add_property('acquisition.start_time',
                         self._get_acquisition_start_time,
@@ -274,7 +570,7 @@ class Base(ivi.IviContainer):
                         and the maximum frequency of the input signal.
                         """, cls, grp, '4.3.8'))
         self._add_method('channels[].measurement.fetch_waveform',
-                        self._measurement_fetch_waveform,
+                        self._measurement_fetch_waveform_select,
                         ivi.Doc("""
                         This function returns the waveform the oscilloscope acquires for the
                         specified channel. The waveform is from a previously initiated
@@ -300,10 +596,22 @@ class Base(ivi.IviContainer):
                         the waveform for the specified channel. You call this function to obtain
                         the waveforms for each of the remaining channels.
                         
-                        The return value is a list of (x, y) tuples that represent the time and
+                        The return value is a Waveform object.  The voltage samples are available
+                        as a numpy array in the y attribute and the corresponding times are
+                        computed from the record preamble by the x attribute.  The object can
+                        also be used as a list of (x, y) tuples that represent the time and
                         voltage of each data point.  The y point may be NaN in the case that the
                         oscilloscope could not sample the voltage.
                         
+                        The optional start, stop and step parameters select a part of the record
+                        with the same meaning as a Python slice, in samples of the full record.
+                        The optional max_points parameter limits the number of returned points.
+                        Drivers let the oscilloscope select and decimate the data where the
+                        instrument supports it, so that only the requested points are
+                        transferred. Otherwise the driver reduces the record after the transfer,
+                        keeping the minimum and maximum of each group of samples as interleaved
+                        points so that peaks stay visible.
+                        
                         The end-user configures the interpolation method the oscilloscope uses
                         with the Acquisition.Interpolation property. If interpolation is disabled,
                         the oscilloscope does not interpolate points in the waveform. If the
@@ -352,6 +660,61 @@ class Base(ivi.IviContainer):
                         
                         any(any(math.isnan(b) for b in a) for a in waveform)
                         """, cls, grp, '4.3.16'))
+        self._add_method('measurement.fetch_waveforms',
+                        self._measurement_fetch_waveforms,
+                        ivi.Doc("""
+                        This function returns the waveforms the oscilloscope acquired for several
+                        channels from a previously initiated acquisition.  The channels parameter
+                        is a list of channel names or indices.  The return value is a dict that
+                        maps each entry of the channels list to a Waveform object, as returned by
+                        the Fetch Waveform function.
+                        
+                        Drivers send the waveform transfer setup only once for the whole set of
+                        channels and reuse the record preamble of each channel while the
+                        timebase and channel settings are unchanged, so this function is
+                        considerably faster than calling Fetch Waveform for each channel.  The
+                        sample data of each channel is still transferred with its own query.
+                        """))
+        self._add_method('measurement.stream_waveforms',
+                        self._measurement_stream_waveforms,
+                        ivi.Doc("""
+                        This function starts continuous acquisition of the specified channels in a
+                        background thread and returns an iterator over the acquired records. Each
+                        record is a dict that maps each entry of the channels list to a Waveform
+                        object, as returned by Fetch Waveforms.
+                        
+                        The background thread initiates an acquisition, transfers the raw
+                        waveform data into one of queue_depth slots and goes on with the next
+                        acquisition while the consumer decodes the previous one.
+                        Acquisition stops after count records, or runs until the stream is
+                        closed if count is None.
+                        
+                        When all slots are in use, the policy parameter selects whether the
+                        background thread waits for the consumer ('block') or discards the
+                        acquisition ('drop'). The acquired, delivered, dropped and late
+                        attributes of the returned object count the acquisitions, the records
+                        handed to the consumer, the discarded acquisitions and the acquisitions
+                        that had to wait for a free slot.
+                        
+                        The driver must not be used from other threads until the stream is
+                        exhausted or closed. The returned object can be used as a context
+                        manager to close it.
+                        """))
+        self._add_property('measurement.cache_check_trigger_event',
+                        self._get_measurement_cache_check_trigger_event,
+                        self._set_measurement_cache_check_trigger_event,
+                        None,
+                        ivi.Doc("""
+                        Waveforms fetched while the oscilloscope is stopped are kept by the driver
+                        and returned again without a transfer until a new acquisition is
+                        initiated, continuous acquisition is started or a setting that affects
+                        the waveform data is changed. When this property is True, the driver
+                        also checks the trigger event status of the oscilloscope before
+                        returning a kept waveform, which catches acquisitions started from the
+                        front panel at the cost of one short query.
+                        
+                        Disabling the driver operation cache also disables the waveform cache.
+                        """))
         self._add_property('measurement.status',
                         self._get_measurement_status,
                         None,
@@ -748,14 +1111,93 @@ class Base(ivi.IviContainer):
     
     def _measurement_fetch_waveform(self, index):
         index = ivi.get_index(self._channel_name, index)
-        data = list()
+        return Waveform(channel=self._channel_name[index])
+    
+    def _measurement_fetch_waveform_select(self, index, start=None, stop=None, step=None, max_points=None):
+        if start is None and stop is None and step is None and max_points is None:
+            return self._measurement_fetch_waveform(index)
+        return self._measurement_fetch_waveform_window(index, start, stop, step, max_points)
+    
+    def _measurement_fetch_waveform_window(self, index, start, stop, step, max_points):
+        return window_waveform(self._measurement_fetch_waveform(index), start, stop, step, max_points)
+    
+    def _measurement_fetch_waveforms(self, channels):
+        data = dict()
+        for ch in channels:
+            data[ch] = self._measurement_fetch_waveform(ch)
         return data
     
     def _measurement_read_waveform(self, index, maximum_time):
         return self._measurement_fetch_waveform(index)
     
+    def _measurement_fetch_waveform_raw(self, index):
+        return None, self._measurement_fetch_waveform(index)
+    
+    def _measurement_fetch_waveforms_raw(self, indices):
+        return [self._measurement_fetch_waveform_raw(index) for index in indices]
+    
+    def _measurement_fetch_time_tag(self):
+        "Time tag of the current record, or None if the instrument does not report one"
+        return None
+    
+    def _measurement_stream_waveforms(self, channels, count=None, queue_depth=2, policy='block'):
+        return WaveformStream(self, channels, count, queue_depth, policy)
+    
     def _measurement_initiate(self):
         pass
+    
+    def _get_measurement_cache_check_trigger_event(self):
+        return self._measurement_cache_check_trigger_event
+    
+    def _set_measurement_cache_check_trigger_event(self, value):
+        self._measurement_cache_check_trigger_event = bool(value)
+    
+    def _measurement_trigger_event(self):
+        "Read and clear the trigger event status, True if the scope triggered since the last read"
+        return True
+    
+    def _bump_acquisition_generation(self):
+        "Mark all kept waveforms as stale"
+        self._acquisition_generation += 1
+    
+    def _get_cached_waveform(self, key):
+        if self._driver_operation_simulate or not self._driver_operation_cache:
+            return None
+        entry = self._waveform_cache.get(key)
+        if entry is None or entry[0] != self._acquisition_generation:
+            return None
+        if hasattr(self, '_get_trigger_continuous') and self._get_trigger_continuous():
+            # running, so every fetch may return a new acquisition
+            self._bump_acquisition_generation()
+            return None
+        if self._measurement_cache_check_trigger_event and self._measurement_trigger_event():
+            self._bump_acquisition_generation()
+            return None
+        # the sample arrays are read only, so a shallow copy keeps the
+        # cached waveform intact
+        return copy.copy(entry[1])
+    
+    def _set_cached_waveform(self, key, waveform):
+        for name in ('y', 'y_min', 'y_max', 'raw'):
+            data = getattr(waveform, name, None)
+            if isinstance(data, np.ndarray):
+                data.flags.writeable = False
+        self._waveform_cache[key] = (self._acquisition_generation, waveform)
+    
+    def _driver_operation_invalidate_all_attributes(self):
+        super(Base, self)._driver_operation_invalidate_all_attributes()
+        self._bump_acquisition_generation()
+    
+    def _invalidate_waveform_preamble(self, index=None):
+        "Mark the cached waveform preamble of one channel (or all channels) as stale"
+        # the record data changes along with the preamble
+        if index is None:
+            for i in range(self._channel_count):
+                self._set_cache_valid(False, 'waveform_preamble', i)
+            self._waveform_cache.clear()
+        else:
+            self._set_cache_valid(False, 'waveform_preamble', index)
+            self._waveform_cache.pop(index, None)
 
 
 class Interpolation(ivi.IviContainer):
@@ -1383,6 +1825,38 @@ class WaveformMeasurement(ivi.IviContainer):
                         * Measurement Low Reference
                         * Measurement Mid Reference
                         """, cls, grp, '11.3.3'))
+        self._add_method('measurement.fetch_waveform_measurements',
+                        self._measurement_fetch_waveform_measurements,
+                        ivi.Doc("""
+                        This function fetches several waveform measurements from a previously
+                        initiated acquisition in one operation. The measurement_list parameter is
+                        a list of (channel, measurement_function) or (channel,
+                        measurement_function, reference_channel) tuples, using the same
+                        measurement functions as Fetch Waveform Measurement. The return value is
+                        a numpy array with one value per entry of measurement_list.
+                        
+                        If statistics is True, the driver returns the statistics the oscilloscope
+                        accumulates for each measurement over the acquisitions since the
+                        measurements were configured with Configure Statistics, instead of the
+                        current values. The return value is then a numpy structured array with
+                        the fields current, min, max, mean, stddev and count. Drivers that do not
+                        support measurement statistics raise an Operation Not Supported error.
+                        
+                        If count is given, the statistics are reset and the driver runs count
+                        acquisitions before it returns the statistics over exactly those
+                        acquisitions. The acquisitions are queued on the oscilloscope, and the
+                        driver then issues a single results query, so the host does not poll
+                        while they run. The I/O timeout must cover all count acquisitions.
+                        """))
+        self._add_method('measurement.configure_statistics',
+                        self._measurement_configure_statistics,
+                        ivi.Doc("""
+                        Sets up the oscilloscope to accumulate statistics for the measurements in
+                        measurement_list, in the format used by Fetch Waveform Measurements, and
+                        resets the accumulated statistics. The oscilloscope updates the
+                        statistics on every following acquisition without any further commands
+                        from the driver.
+                        """))
     
     def _get_reference_level_high(self):
         return self._reference_level_high
@@ -1410,7 +1884,7 @@ class WaveformMeasurement(ivi.IviContainer):
         self._set_reference_level_middle(middle)
         self._set_reference_level_high(high)
     
-    def _measurement_fetch_waveform_measurement(self, index, measurement_function):
+    def _measurement_fetch_waveform_measurement(self, index, measurement_function, ref_channel=None):
         index = ivi.get_index(self._channel_name, index)
         if measurement_function not in MeasurementFunction:
             raise ivi.ValueNotSupportedException()
@@ -1418,6 +1892,22 @@ class WaveformMeasurement(ivi.IviContainer):
     
     def _measurement_read_waveform_measurement(self, index, measurement_function, maximum_time):
         return self._measurement_fetch_waveform_measurement(index, measurement_function)
+    
+    def _measurement_fetch_waveform_measurements(self, measurement_list, statistics=False, count=None):
+        if statistics or count is not None:
+            raise ivi.OperationNotSupportedException()
+        values = list()
+        for m in measurement_list:
+            channel, measurement_function = m[0], m[1]
+            if len(m) > 2 and m[2] is not None:
+                # delay, phase and ratio measurements against a reference channel
+                values.append(self._measurement_fetch_waveform_measurement(channel, measurement_function, m[2]))
+            else:
+                values.append(self._measurement_fetch_waveform_measurement(channel, measurement_function))
+        return np.array(values, dtype=float)
+    
+    def _measurement_configure_statistics(self, measurement_list):
+        raise ivi.OperationNotSupportedException()
 
 
 class MinMaxWaveform(ivi.IviContainer):
@@ -1478,7 +1968,10 @@ class MinMaxWaveform(ivi.IviContainer):
                         MaxWaveform parameters is either a voltage or a value indicating that the
                         oscilloscope could not sample a voltage.
                         
-                        The return value is a list of (x, y_min, y_max) tuples that represent the
+                        The return value is an EnvelopeWaveform object.  The minimum and maximum
+                        voltages are available as numpy arrays in the y_min and y_max attributes
+                        and the corresponding times are computed by the x attribute.  The object
+                        can also be used as a list of (x, y_min, y_max) tuples that represent the
                         time and voltage of each data point.  Either of the y points may be NaN in
                         the case that the oscilloscope could not sample the voltage.
                         
@@ -1518,7 +2011,10 @@ class MinMaxWaveform(ivi.IviContainer):
                         complete the acquisition within the time period the user specified with
                         the max_time parameter, the function returns the Max Time Exceeded error.
                         
-                        The return value is a list of (x, y_min, y_max) tuples that represent the
+                        The return value is an EnvelopeWaveform object.  The minimum and maximum
+                        voltages are available as numpy arrays in the y_min and y_max attributes
+                        and the corresponding times are computed by the x attribute.  The object
+                        can also be used as a list of (x, y_min, y_max) tuples that represent the
                         time and voltage of each data point.  Either of the y points may be NaN in
                         the case that the oscilloscope could not sample the voltage.
                         
@@ -1548,11 +2044,10 @@ class MinMaxWaveform(ivi.IviContainer):
     
     def _measurement_fetch_waveform_min_max(self, index):
         index = ivi.get_index(self._channel_name, index)
-        data = list()
-        return data
+        return EnvelopeWaveform(channel=self._channel_name[index])
     
     def _measurement_read_waveform_min_max(self, index, maximum_time):
-        return _measurement_fetch_waveform_min_max(index)
+        return self._measurement_fetch_waveform_min_max(index)
 
 
 class ProbeAutoSense(ivi.IviContainer):
@@ -24,8 +24,6 @@ THE SOFTWARE.
 
 """
 
-import time
-
 from .. import ivi
 from .. import extra
 
@@ -111,7 +109,8 @@ class SelfTest(object):
         if not self._driver_operation_simulate:
             self._write("*TST?")
             # wait for test to complete
-            time.sleep(self._self_test_delay)
+            self._driver_operation_wait_for(completion='mav',
+                    maximum_time=self._self_test_delay)
             code = int(self._read())
             if code != 0:
                 message = "Self test failed"
@@ -0,0 +1,187 @@
+"""
+
+Python Interchangeable Virtual Instrument Library
+
+Copyright (c) 2014 Alex Forencich
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import numpy as np
+
+from . import ivi
+from . import scope
+from . import specan
+
+WindowType = set(['rectangular', 'hann', 'hamming', 'blackman', 'flat_top'])
+
+# flat top window coefficients (same as the common "flattop" window)
+FlatTopCoefficients = (0.21557895, 0.41663158, 0.277263158, 0.083578947, 0.006947368)
+
+def _window(window, n):
+    "Periodic window of length n"
+    if window == 'rectangular':
+        return np.ones(n)
+    if window == 'hann':
+        return np.hanning(n + 1)[:-1]
+    if window == 'hamming':
+        return np.hamming(n + 1)[:-1]
+    if window == 'blackman':
+        return np.blackman(n + 1)[:-1]
+    if window == 'flat_top':
+        k = 2 * np.pi * np.arange(n) / n
+        w = np.zeros(n)
+        for i, a in enumerate(FlatTopCoefficients):
+            w += (-1) ** i * a * np.cos(i * k)
+        return w
+    raise ivi.ValueNotSupportedException()
+
+def _fast_size(n):
+    "Smallest 2^a 3^b 5^c FFT length not less than n"
+    best = 1
+    while best < n:
+        best *= 2
+    p5 = 1
+    while p5 < best:
+        p35 = p5
+        while p35 < best:
+            m = p35
+            while m < n:
+                m *= 2
+            best = min(best, m)
+            p35 *= 3
+        p5 *= 5
+    return best
+
+
+class SpectrumAnalysis(object):
+    """Spectra of scope waveform records computed on the host
+    
+    Window arrays and real-FFT sizes are cached per record length, so
+    processing a stream of records of the same length only performs the FFT
+    and the scaling.  A 2-D (segments, points) record is transformed in one
+    batched FFT.
+    
+    Amplitudes are returned in amplitude_units (one of specan.AmplitudeUnits)
+    as RMS per frequency bin into input_impedance ohms, the same convention as
+    spectrum analyzer traces[].fetch_y, so a sine wave reads its RMS power
+    independent of the window.  When fast_fft is set, records are zero padded
+    to the next 2^a 3^b 5^c length.
+    
+    When averaging is enabled, power spectra are averaged in place across
+    records and calls until reset_average is called."""
+    
+    def __init__(self, window='hann', amplitude_units='dBm', input_impedance=50,
+                 averaging=False, fast_fft=False):
+        if window not in WindowType:
+            raise ivi.ValueNotSupportedException()
+        if amplitude_units not in specan.AmplitudeUnits:
+            raise ivi.ValueNotSupportedException()
+        self.window = window
+        self.amplitude_units = amplitude_units
+        self.input_impedance = float(input_impedance)
+        self.averaging = averaging
+        self.fast_fft = fast_fft
+        self._plan = dict()
+        self.reset_average()
+    
+    def reset_average(self):
+        "Discard the averaged power spectrum"
+        self.average = None
+        self.average_count = 0
+    
+    def _get_plan(self, n):
+        "Window, FFT size and power scale for a record length, cached"
+        if n not in self._plan:
+            w = _window(self.window, n)
+            size = _fast_size(n) if self.fast_fft else n
+            # V^2 RMS per bin for one sided spectra, corrected for coherent gain
+            scale = np.full(size // 2 + 1, 2.0 / (w.sum() ** 2))
+            scale[0] /= 2
+            if size % 2 == 0:
+                scale[-1] /= 2
+            self._plan[n] = (w, size, scale)
+        return self._plan[n]
+    
+    def frequency(self, waveform, dt=None):
+        "Frequency axis in Hz for a waveform or a record length"
+        if isinstance(waveform, scope.Waveform):
+            dt = waveform.x_increment
+            n = waveform.y.shape[-1]
+        elif np.ndim(waveform) == 0:
+            n = int(waveform)
+        else:
+            n = np.shape(waveform)[-1]
+        if dt is None:
+            dt = 1.0
+        size = self._get_plan(n)[1]
+        return np.fft.rfftfreq(size, dt)
+    
+    def power(self, waveform):
+        "Mean square voltage per bin, one row per record for 2-D input"
+        y = waveform.y if isinstance(waveform, scope.Waveform) else waveform
+        y = np.asarray(y, dtype=float)
+        w, size, scale = self._get_plan(y.shape[-1])
+        spec = np.fft.rfft(y * w, size, axis=-1)
+        p = spec.real ** 2
+        p += spec.imag ** 2
+        p *= scale
+        return p
+    
+    def _convert(self, p):
+        units = self.amplitude_units
+        with np.errstate(divide='ignore'):
+            if units == 'volt':
+                return np.sqrt(p)
+            if units == 'watt':
+                return p / self.input_impedance
+            if units == 'dBm':
+                return 10 * np.log10(p / self.input_impedance) + 30
+            if units == 'dBmV':
+                return 10 * np.log10(p) + 60
+            if units == 'dBuV':
+                return 10 * np.log10(p) + 120
+    
+    def compute(self, waveform):
+        """Spectrum of a waveform record or batch of records in amplitude_units
+        
+        Without averaging, 2-D input returns one spectrum per row.  With
+        averaging, all rows are folded into the running average and the
+        averaged spectrum is returned."""
+        p = self.power(waveform)
+        if not self.averaging:
+            return self._convert(p)
+        p = np.atleast_2d(p)
+        if self.average is None or self.average.shape != p.shape[1:]:
+            self.average = np.zeros(p.shape[1])
+            self.average_count = 0
+        # running mean, updated in place
+        for row in p:
+            self.average_count += 1
+            row -= self.average
+            row /= self.average_count
+            self.average += row
+        return self._convert(self.average)
+
+
+def spectrum(waveform, window='hann', amplitude_units='dBm', input_impedance=50):
+    "Return the frequency axis and spectrum of a scope Waveform"
+    s = SpectrumAnalysis(window, amplitude_units, input_impedance)
+    return s.frequency(waveform), s.compute(waveform)
@@ -0,0 +1,204 @@
+"""
+
+Python Interchangeable Virtual Instrument Library
+
+Copyright (c) 2014 Alex Forencich
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import time
+
+import numpy as np
+
+from . import ivi
+
+try:
+    monotonic = time.monotonic
+except AttributeError:
+    monotonic = time.time
+
+SweepResultType = np.dtype([('frequency', float), ('level', float), ('power', float)])
+
+SweepListName = 'ivi_sweep'
+# points per list, longer sweeps are loaded as several lists
+SweepListPoints = 1601
+
+class PowerSweep(object):
+    """Frequency and level sweep of an RF signal generator measured with a power meter
+    
+    source is any rfsiggen driver and meter any pwrmeter driver.  For every
+    point, the source is set first and the meter correction frequency is
+    updated while the source settles, then the source is waited on with
+    rf.wait_until_settled (or for settle_time seconds if given) and the meter
+    is triggered.  Meters that report measurement.measurement_state have the
+    source stepped to the next point as soon as the measurement is complete,
+    so the reading is transferred while the source settles.
+    
+    When use_list is set (by default when the source supports list sweeps and
+    software triggers), the points are loaded into the source as one list and
+    stepped with software triggers instead of being set one at a time.  Sweeps
+    with more than list_points points are loaded as several lists.  The
+    sweep mode is set back to none afterwards, also when the sweep fails.
+    
+    run returns a SweepResultType structured array."""
+    
+    def __init__(self, source, meter, channel=0, settle_time=None, maximum_time=1.0,
+                 correction=True, use_list=None, list_points=SweepListPoints):
+        self.source = source
+        self.meter = meter
+        self.channel = channel
+        self.settle_time = settle_time
+        self.maximum_time = maximum_time
+        self.correction = correction
+        self.list_points = int(list_points)
+        if self.list_points < 1:
+            raise ivi.OutOfRangeException()
+        caps = source.identity.group_capabilities.split(',')
+        can_list = 'IviRFSigGenList' in caps and 'IviRFSigGenSoftwareTrigger' in caps
+        if use_list is None:
+            use_list = can_list
+        elif use_list and not can_list:
+            raise ivi.OperationNotSupportedException()
+        self.use_list = use_list
+    
+    def _settle(self, t0):
+        if self.settle_time is None:
+            self.source.rf.wait_until_settled(self.maximum_time)
+        else:
+            delay = self.settle_time - (monotonic() - t0)
+            if delay > 0:
+                time.sleep(delay)
+    
+    def _set_correction(self, frequency):
+        if self.correction:
+            self.meter.channels[self.channel].correction_frequency = frequency
+    
+    def _measured(self):
+        "Wait for the meter to take the point, False if it does not report its state"
+        t0 = monotonic()
+        while True:
+            state = self.meter.measurement.measurement_state
+            if state == 'complete':
+                return True
+            if state != 'in_progress':
+                return False
+            if monotonic() - t0 > self.maximum_time:
+                raise ivi.MaxTimeoutExceededException()
+            time.sleep(0.001)
+    
+    def _measure(self, step):
+        """Trigger the meter and return its reading and the time the source was stepped
+        
+        step moves the source to the next point, or is None for the last point.
+        It is called before the reading is fetched when the meter reports that
+        the point is taken.  The correction frequency is left to the caller, as
+        the meter may apply it to the reading."""
+        meter = self.meter
+        meter.measurement.initiate()
+        t0 = None
+        if step is not None and self._measured():
+            step()
+            t0 = monotonic()
+        value = meter.measurement.fetch()
+        if step is not None and t0 is None:
+            step()
+            t0 = monotonic()
+        return value if value is not None else np.nan, t0
+    
+    def run(self, frequency, level=None):
+        """Sweep over the frequency points, at the given levels if level is set
+        
+        frequency and level are arrays of the same length, level may also be a
+        single value."""
+        frequency = np.array(frequency, dtype=float).ravel()
+        result = np.zeros(len(frequency), dtype=SweepResultType)
+        result['frequency'] = frequency
+        if level is None:
+            result['level'] = self.source.rf.level
+        else:
+            result['level'] = level
+        
+        if not len(frequency):
+            return result
+        
+        if self.use_list:
+            self._run_list(result, level is not None)
+        else:
+            self._run_step(result, level is not None)
+        return result
+    
+    def _run_step(self, result, set_level):
+        source = self.source
+        f = result['frequency'].tolist()
+        l = result['level'].tolist()
+        
+        def step(k):
+            source.rf.frequency = f[k]
+            if set_level:
+                source.rf.level = l[k]
+        
+        step(0)
+        t0 = monotonic()
+        self._set_correction(f[0])
+        
+        for k in range(len(f)):
+            self._settle(t0)
+            if k + 1 < len(f):
+                result['power'][k], t0 = self._measure(lambda: step(k+1))
+                self._set_correction(f[k+1])
+            else:
+                result['power'][k] = self._measure(None)[0]
+    
+    def _run_list(self, result, set_level):
+        source = self.source
+        single_step_enabled = source.sweep.list.single_step_enabled
+        source.sweep.list.single_step_enabled = True
+        try:
+            for start in range(0, len(result), self.list_points):
+                # views, the powers are written into result
+                self._run_list_part(result[start:start+self.list_points], set_level)
+        finally:
+            source.sweep.mode = 'none'
+            source.sweep.list.single_step_enabled = single_step_enabled
+    
+    def _run_list_part(self, result, set_level):
+        source = self.source
+        f = result['frequency']
+        
+        if set_level:
+            source.sweep.list.create_frequency_power(SweepListName, f, result['level'])
+        else:
+            source.sweep.list.create_frequency(SweepListName, f)
+        source.sweep.list.selected_list = SweepListName
+        source.sweep.mode = 'list'
+        
+        # start at the first point, every software trigger steps to the next one
+        source.sweep.list.reset()
+        t0 = monotonic()
+        self._set_correction(f[0])
+        
+        for k in range(len(f)):
+            self._settle(t0)
+            if k + 1 < len(f):
+                result['power'][k], t0 = self._measure(source.send_software_trigger)
+                self._set_correction(f[k+1])
+            else:
+                result['power'][k] = self._measure(None)[0]
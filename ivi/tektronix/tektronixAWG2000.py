@@ -24,8 +24,9 @@ THE SOFTWARE.
 
 """
 
-import time
-import struct
+import hashlib
+
+import numpy as np
 from numpy import *
 
 from .. import ivi
@@ -42,7 +43,7 @@ StandardWaveformMapping = {
 
 class tektronixAWG2000(ivi.Driver, fgen.Base, fgen.StdFunc, fgen.ArbWfm,
                 fgen.ArbSeq, fgen.SoftwareTrigger, fgen.Burst,
-                fgen.ArbChannelWfm):
+                fgen.ArbChannelWfm, fgen.ArbWfmBinary):
     "Tektronix AWG2000 series arbitrary waveform generator driver"
     
     def __init__(self, *args, **kwargs):
@@ -58,12 +59,18 @@ class tektronixAWG2000(ivi.Driver, fgen.Base, fgen.StdFunc, fgen.ArbWfm,
         self._arbitrary_waveform_size_min = 64
         self._arbitrary_waveform_quantum = 8
         
+        self._arbitrary_binary_alignment = 'right'
+        self._arbitrary_sample_bit_resolution = 12
+        
         self._arbitrary_sequence_number_sequences_max = 0
         self._arbitrary_sequence_loop_count_max = 0
         self._arbitrary_sequence_length_max = 0
         self._arbitrary_sequence_length_min = 0
         
         self._catalog_names = list()
+        self._catalog_loaded = False
+        self._arbitrary_waveform_handle_cache = dict()
+        self._arbitrary_sequence_handles = list()
         
         self._arbitrary_waveform_n = 0
         self._arbitrary_sequence_n = 0
@@ -79,6 +86,19 @@ class tektronixAWG2000(ivi.Driver, fgen.Base, fgen.StdFunc, fgen.ArbWfm,
         self._identity_specification_minor_version = 0
         self._identity_supported_instrument_models = ['AWG2005','AWG2020','AWG2021','AWG2040','AWG2041']
         
+        self._add_method('arbitrary.sequence.create_from_waveforms',
+                        self._arbitrary_sequence_create_from_waveforms,
+                        ivi.Doc("""
+                        Creates an arbitrary sequence directly from waveform data. Each entry of
+                        the waveform list is waveform data as accepted by Create Arbitrary
+                        Waveform, and the loop count list gives the number of repetitions of each
+                        entry (default 1).
+                        
+                        Identical waveforms are only uploaded once and reuse the handle of a
+                        previous upload, and repeated consecutive entries are merged into a
+                        single sequence line. Returns the sequence handle.
+                        """))
+        
         self._init_outputs()
     
     def _initialize(self, resource = None, id_query = False, reset = False, **keywargs):
@@ -158,6 +178,7 @@ class tektronixAWG2000(ivi.Driver, fgen.Base, fgen.StdFunc, fgen.ArbWfm,
         if not self._driver_operation_simulate:
             self._write("*RST")
             self.driver_operation.invalidate_all_attributes()
+        self._arbitrary_invalidate_handle_cache()
     
     def _utility_reset_with_defaults(self):
         self._utility_reset()
@@ -168,7 +189,7 @@ class tektronixAWG2000(ivi.Driver, fgen.Base, fgen.StdFunc, fgen.ArbWfm,
         if not self._driver_operation_simulate:
             self._write("*TST?")
             # wait for test to complete
-            time.sleep(60)
+            self._driver_operation_wait_for(completion='mav', maximum_time=60)
             code = int(self._read())
             if code != 0:
                 message = "Self test failed"
@@ -201,6 +222,26 @@ class tektronixAWG2000(ivi.Driver, fgen.Base, fgen.StdFunc, fgen.ArbWfm,
             l = [s.strip('"') for s in l]
             self._catalog = [l[i:i+3] for i in range(0, len(l), 3)]
             self._catalog_names = [l[0] for l in self._catalog]
+        self._catalog_loaded = True
+    
+    def _catalog_contains(self, name):
+        "Check for a file in the catalog, reading the catalog again on a miss"
+        if not self._catalog_loaded:
+            self._load_catalog()
+        elif name not in self._catalog_names and not self._driver_operation_simulate:
+            # the file may have been created since the catalog was read
+            self._load_catalog()
+        return name in self._catalog_names
+    
+    def _arbitrary_invalidate_handle_cache(self):
+        "Forget uploaded waveforms, the catalog is read again on the next create"
+        self._arbitrary_waveform_handle_cache = dict()
+        self._arbitrary_sequence_handles = list()
+        self._catalog_loaded = False
+    
+    def _arbitrary_waveform_key(self, raw_data, xincr, bits):
+        "Cache key for uploaded waveform data and upload parameters"
+        return (hashlib.sha1(raw_data).hexdigest(), "%e" % xincr, bits)
     
     def _get_output_operation_mode(self, index):
         index = ivi.get_index(self._output_name, index)
@@ -419,13 +460,12 @@ class tektronixAWG2000(ivi.Driver, fgen.Base, fgen.StdFunc, fgen.ArbWfm,
     def _set_output_arbitrary_waveform(self, index, value):
         index = ivi.get_index(self._output_name, index)
         value = str(value).lower()
-        # extension must be wfm
+        # extension must be wfm or seq
         ext = value.split('.').pop()
-        if ext != 'wfm':
+        if ext not in ('wfm', 'seq'):
             raise ivi.ValueNotSupportedException()
         # waveform must exist on arb
-        self._load_catalog()
-        if value not in self._catalog_names:
+        if not self._catalog_contains(value):
             raise ivi.ValueNotSupportedException()
         if not self._driver_operation_simulate:
             self._write(":ch%d:waveform \"%s\"" % (index+1, value))
@@ -458,7 +498,12 @@ class tektronixAWG2000(ivi.Driver, fgen.Base, fgen.StdFunc, fgen.ArbWfm,
         return self._arbitrary_waveform_quantum
     
     def _arbitrary_waveform_clear(self, handle):
-        pass
+        if not self._driver_operation_simulate:
+            self._write(":memory:delete \"%s\"" % handle)
+        for key in [k for k, v in self._arbitrary_waveform_handle_cache.items() if v == handle]:
+            del self._arbitrary_waveform_handle_cache[key]
+        if handle in self._catalog_names:
+            self._catalog_names.remove(handle)
     
     def _arbitrary_waveform_create(self, data):
         y = None
@@ -486,8 +531,20 @@ class tektronixAWG2000(ivi.Driver, fgen.Base, fgen.StdFunc, fgen.ArbWfm,
         
         xincr = ivi.rms(diff(x))
         
+        # 12 bit offset binary, MSB first
+        raw_data = ivi.quantize_waveform(y, 12, 'offset_binary', '>', (1 << 12) - 2)
+        
+        return self._arbitrary_waveform_upload(raw_data, xincr, 'rp', 'msb')
+    
+    def _arbitrary_waveform_upload(self, raw_data, xincr, bn_fmt, byt_or):
+        # identical data was uploaded before
+        key = self._arbitrary_waveform_key(raw_data, xincr, (12, bn_fmt, byt_or))
+        if not self._driver_operation_simulate and key in self._arbitrary_waveform_handle_cache:
+            return self._arbitrary_waveform_handle_cache[key]
+        
         # get unused handle
-        self._load_catalog()
+        if not self._catalog_loaded:
+            self._load_catalog()
         have_handle = False
         while not have_handle:
             self._arbitrary_waveform_n += 1
@@ -495,32 +552,20 @@ class tektronixAWG2000(ivi.Driver, fgen.Base, fgen.StdFunc, fgen.ArbWfm,
             have_handle = handle not in self._catalog_names
         self._write(":data:destination \"%s\"" % handle)
         self._write(":wfmpre:bit_nr 12")
-        self._write(":wfmpre:bn_fmt rp")
+        self._write(":wfmpre:bn_fmt %s" % bn_fmt)
         self._write(":wfmpre:byt_nr 2")
-        self._write(":wfmpre:byt_or msb")
+        self._write(":wfmpre:byt_or %s" % byt_or)
         self._write(":wfmpre:encdg bin")
         self._write(":wfmpre:pt_fmt y")
         self._write(":wfmpre:yzero 0")
         self._write(":wfmpre:ymult %e" % (2/(1<<12)))
         self._write(":wfmpre:xincr %e" % xincr)
         
-        raw_data = b''
-        
-        for f in y:
-            # clip at -1 and 1
-            if f > 1.0: f = 1.0
-            if f < -1.0: f = -1.0
-            
-            f = (f + 1) / 2
-            
-            # scale to 12 bits
-            i = int(f * ((1 << 12) - 2) + 0.5) & 0x000fffff
-            
-            # add to raw data, MSB first
-            raw_data = raw_data + struct.pack('>H', i)
-        
         self._write_ieee_block(raw_data, ':curve ')
         
+        self._catalog_names.append(handle)
+        self._arbitrary_waveform_handle_cache[key] = handle
+        
         return handle
     
     def _get_arbitrary_sequence_number_sequences_max(self):
@@ -536,16 +581,80 @@ class tektronixAWG2000(ivi.Driver, fgen.Base, fgen.StdFunc, fgen.ArbWfm,
         return self._arbitrary_sequence_length_min
     
     def _arbitrary_clear_memory(self):
-        pass
+        if not self._driver_operation_simulate:
+            # sequences first, they refer to the waveforms
+            for handle in self._arbitrary_sequence_handles:
+                self._write(":memory:delete \"%s\"" % handle)
+            for handle in set(self._arbitrary_waveform_handle_cache.values()):
+                self._write(":memory:delete \"%s\"" % handle)
+        self._arbitrary_invalidate_handle_cache()
     
     def _arbitrary_sequence_clear(self, handle):
-        pass
+        handle = str(handle).lower()
+        if not self._driver_operation_simulate:
+            self._write(":memory:delete \"%s\"" % handle)
+        if handle in self._arbitrary_sequence_handles:
+            self._arbitrary_sequence_handles.remove(handle)
+        if handle in self._catalog_names:
+            self._catalog_names.remove(handle)
     
     def _arbitrary_sequence_configure(self, index, handle, gain, offset):
-        pass
+        self._set_output_arbitrary_waveform(index, handle)
+        self._set_output_arbitrary_gain(index, gain)
+        self._set_output_arbitrary_offset(index, offset)
     
     def _arbitrary_sequence_create(self, handle_list, loop_count_list):
-        return "handle"
+        handle_list = [str(h).lower() for h in handle_list]
+        loop_count_list = [int(c) for c in loop_count_list]
+        if len(handle_list) != len(loop_count_list) or len(handle_list) == 0:
+            raise ivi.ValueNotSupportedException()
+        if min(loop_count_list) < 1:
+            raise ivi.OutOfRangeException()
+        
+        if not self._catalog_loaded:
+            self._load_catalog()
+        if not self._driver_operation_simulate:
+            for h in set(handle_list):
+                if not self._catalog_contains(h):
+                    raise ivi.ValueNotSupportedException()
+        
+        # merge repeated consecutive entries into one line
+        lines = list()
+        for h, c in zip(handle_list, loop_count_list):
+            if lines and lines[-1][0] == h:
+                lines[-1][1] += c
+            else:
+                lines.append([h, c])
+        
+        if self._arbitrary_sequence_length_max and len(lines) > self._arbitrary_sequence_length_max:
+            raise ivi.OutOfRangeException()
+        if self._arbitrary_sequence_loop_count_max and max(c for h, c in lines) > self._arbitrary_sequence_loop_count_max:
+            raise ivi.OutOfRangeException()
+        
+        # get unused handle
+        have_handle = False
+        while not have_handle:
+            self._arbitrary_sequence_n += 1
+            handle = "s%04d.seq" % self._arbitrary_sequence_n
+            have_handle = handle not in self._catalog_names
+        
+        # whole sequence file in one message
+        seq = "MAGIC 3002\r\nLINES %d\r\n" % len(lines)
+        seq += "".join("\"%s\",%d\r\n" % (h, c) for h, c in lines)
+        if not self._driver_operation_simulate:
+            self._write_ieee_block(seq.encode('utf-8'), ":memory:data \"%s\"," % handle)
+        
+        self._catalog_names.append(handle)
+        self._arbitrary_sequence_handles.append(handle)
+        
+        return handle
+    
+    def _arbitrary_sequence_create_from_waveforms(self, waveform_list, loop_count_list=None):
+        if loop_count_list is None:
+            loop_count_list = [1] * len(waveform_list)
+        # uploads of repeated waveforms hit the handle cache
+        handle_list = [self._arbitrary_waveform_create(w) for w in waveform_list]
+        return self._arbitrary_sequence_create(handle_list, loop_count_list)
     
     def send_software_trigger(self):
         if not self._driver_operation_simulate:
@@ -565,5 +674,38 @@ class tektronixAWG2000(ivi.Driver, fgen.Base, fgen.StdFunc, fgen.ArbWfm,
         self._set_output_arbitrary_waveform(index, handle)
         return handle
     
+    def _arbitrary_waveform_create_channel_waveform_int16(self, index, data):
+        index = ivi.get_index(self._output_name, index)
+        y = fgen.get_binary_waveform(data)
+        
+        if len(y) % self._arbitrary_waveform_quantum != 0:
+            raise ivi.ValueNotSupportedException()
+        
+        # 12 bit codes with the same full scale as the float path
+        max_code = (1 << 12) - 2
+        if y.dtype.kind == 'i':
+            low, high = -(max_code // 2), max_code // 2
+        else:
+            low, high = 0, max_code
+        
+        if len(y) and (y.min() < low or y.max() > high):
+            raise ivi.ValueNotSupportedException()
+        
+        # describe the data as it is instead of converting it: signed or
+        # unsigned right aligned integers in the byte order of the array
+        bn_fmt = 'ri' if y.dtype.kind == 'i' else 'rp'
+        byt_or = 'msb' if fgen.binary_byte_order(y) == '>' else 'lsb'
+        
+        # binary data has no time axis, keep the current clock
+        sample_rate = self._get_arbitrary_sample_rate()
+        xincr = 1 / sample_rate if sample_rate else 1/10e6
+        
+        handle = self._arbitrary_waveform_upload(np.ascontiguousarray(y), xincr, bn_fmt, byt_or)
+        self._set_output_arbitrary_waveform(index, handle)
+        return handle
+    
+    def _arbitrary_waveform_create_channel_waveform_int32(self, index, data):
+        raise ivi.OperationNotSupportedException()
+    
     
 
@@ -0,0 +1,165 @@
+"""
+
+Python Interchangeable Virtual Instrument Library
+
+Copyright (c) 2014 Alex Forencich
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+
+import unittest
+
+import numpy as np
+
+from ... import ivi
+from .. import tektronixAWG2020
+
+class VirtualAWG2000(object):
+    "Tektronix AWG2000 keeping the files written to its memory"
+
+    def __init__(self):
+        self.read_buffer = b''
+        self.cmd_log = list()
+        self.files = dict()
+        self.destination = None
+        self.vals = {
+            '*idn?': 'SONY/TEK,AWG2020,0,SCPI:93.0 OS:2.0 USR:2.0',
+            ':clock:frequency?': ':CLOCK:FREQUENCY 1.0E+8',
+            ':ch1:waveform?': ':CH1:WAVEFORM ""',
+        }
+
+    def write_raw(self, data):
+        header, sep, arg = data.partition(b' ')
+        header = header.decode().lower()
+        self.cmd_log.append(header)
+        if header == ':curve':
+            self.files[self.destination] = ivi.decode_ieee_block(arg)
+        elif header == ':memory:data':
+            name, sep, block = arg.partition(b',')
+            self.files[name.decode().strip('"').lower()] = ivi.decode_ieee_block(block)
+        elif header == ':data:destination':
+            self.destination = arg.decode().strip().strip('"').lower()
+        elif header == ':memory:delete':
+            del self.files[arg.decode().strip().strip('"').lower()]
+        elif header == ':memory:catalog:all?':
+            entries = ['"%s","95-01-01 00:00:00",%d' % (name.upper(), len(d)) for name, d in sorted(self.files.items())]
+            self.read_buffer = (':MEMORY:CATALOG:ALL ' + ','.join(entries) + '\n').encode()
+        elif header.endswith('?'):
+            self.read_buffer = (self.vals[header] + '\n').encode()
+        else:
+            self.vals[header + '?'] = ':%s %s' % (header[1:].upper(), arg.decode().strip())
+
+    def read_raw(self, num=-1):
+        data, self.read_buffer = self.read_buffer, b''
+        return data
+
+    def clear(self):
+        pass
+
+class TestTektronixAWG2000(unittest.TestCase):
+
+    def setUp(self):
+        self.awg = VirtualAWG2000()
+        self.fgen = tektronixAWG2020(self.awg)
+
+    def test_handle_cache(self):
+        y = np.sin(np.linspace(0, 2*np.pi, 64))
+        handle = self.fgen.arbitrary.waveform.create(y)
+        self.assertEqual(handle, 'w0001.wfm')
+        self.assertEqual(len(self.awg.files[handle]), 128)
+
+        # identical data reuses the uploaded waveform
+        self.assertEqual(self.fgen.arbitrary.waveform.create(y), handle)
+        self.assertEqual(self.awg.cmd_log.count(':curve'), 1)
+        self.assertEqual(self.awg.cmd_log.count(':memory:catalog:all?'), 1)
+
+        self.fgen.outputs[0].arbitrary.waveform = handle
+        self.assertEqual(self.awg.vals[':ch1:waveform?'], ':CH1:WAVEFORM "w0001.wfm"')
+
+        # clearing the memory forgets the handles
+        self.fgen.arbitrary.clear_memory()
+        self.assertEqual(self.awg.files, dict())
+        self.assertEqual(self.fgen.arbitrary.waveform.create(y), 'w0002.wfm')
+        self.assertEqual(self.awg.cmd_log.count(':curve'), 2)
+
+    def test_catalog_reload(self):
+        self.fgen.arbitrary.waveform.create(np.zeros(64))
+        n = self.awg.cmd_log.count(':memory:catalog:all?')
+
+        # a file stored on the instrument after the catalog was read
+        self.awg.files['user.wfm'] = b'\x00' * 128
+        self.fgen.outputs[0].arbitrary.waveform = 'user.wfm'
+        self.assertEqual(self.awg.cmd_log.count(':memory:catalog:all?'), n + 1)
+
+        # the catalog is read once more before giving up
+        self.assertRaises(ivi.ValueNotSupportedException, setattr,
+                          self.fgen.outputs[0].arbitrary, 'waveform', 'none.wfm')
+        self.assertEqual(self.awg.cmd_log.count(':memory:catalog:all?'), n + 2)
+
+    def test_binary_waveform(self):
+        y = (np.arange(64) - 32).astype('>i2')
+        handle = self.fgen.arbitrary.waveform.create_channel_waveform_int16(0, y)
+        # the data is described as it is and sent unchanged
+        self.assertEqual(self.awg.files[handle], y.tobytes())
+        self.assertEqual(self.awg.vals[':wfmpre:bn_fmt?'], ':WFMPRE:BN_FMT ri')
+        self.assertEqual(self.awg.vals[':wfmpre:byt_or?'], ':WFMPRE:BYT_OR msb')
+        # the sample interval follows the clock frequency
+        self.assertEqual(float(self.awg.vals[':wfmpre:xincr?'].split()[1]), 1e-8)
+
+        y = np.arange(64, dtype='<u2')
+        handle = self.fgen.arbitrary.waveform.create_channel_waveform_int16(0, y)
+        self.assertEqual(self.awg.files[handle], y.tobytes())
+        self.assertEqual(self.awg.vals[':wfmpre:bn_fmt?'], ':WFMPRE:BN_FMT rp')
+        self.assertEqual(self.awg.vals[':wfmpre:byt_or?'], ':WFMPRE:BYT_OR lsb')
+
+        # strided data is sent in order
+        y = np.arange(128, dtype='>i2')[::2]
+        handle = self.fgen.arbitrary.waveform.create_channel_waveform_int16(0, y)
+        self.assertEqual(self.awg.files[handle], y.tobytes())
+
+        # codes outside the 12 bit range of the float path
+        create = self.fgen.arbitrary.waveform.create_channel_waveform_int16
+        self.assertRaises(ivi.ValueNotSupportedException, create, 0, np.array([4095] + [0] * 63, dtype='>u2'))
+        self.assertRaises(ivi.ValueNotSupportedException, create, 0, np.array([-2048] + [0] * 63, dtype='>i2'))
+        self.assertRaises(ivi.ValueNotSupportedException, create, 0, np.array([2048] + [0] * 63, dtype='>i2'))
+
+    def test_sequence_file(self):
+        a = np.zeros(64)
+        b = np.ones(64)
+        handle = self.fgen.arbitrary.sequence.create_from_waveforms([a, a, b, a], [1, 2, 3, 1])
+        self.assertEqual(handle, 's0001.seq')
+        # each waveform is uploaded once and consecutive repeats are merged
+        self.assertEqual(self.awg.cmd_log.count(':curve'), 2)
+        self.assertEqual(self.awg.files[handle],
+                         b'MAGIC 3002\r\nLINES 3\r\n'
+                         b'"w0001.wfm",3\r\n"w0002.wfm",3\r\n"w0001.wfm",1\r\n')
+
+        self.fgen.outputs[0].arbitrary.waveform = handle
+        self.fgen.arbitrary.sequence.clear(handle)
+        self.assertNotIn(handle, self.awg.files)
+
+        self.assertRaises(ivi.ValueNotSupportedException,
+                          self.fgen.arbitrary.sequence.create, ['none.wfm'], [1])
+        self.assertRaises(ivi.OutOfRangeException,
+                          self.fgen.arbitrary.sequence.create, ['w0001.wfm'], [0])
+
+if __name__ == '__main__':
+    unittest.main()
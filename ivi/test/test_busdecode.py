@@ -0,0 +1,64 @@
+"""
+
+Python Interchangeable Virtual Instrument Library
+
+Copyright (c) 2014 Alex Forencich
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+
+import unittest
+
+import numpy as np
+
+from ivi import busdecode
+from ivi import scope
+
+class TestBusDecode(unittest.TestCase):
+
+    def test_uart(self):
+        x = [1] * 10
+        for b in (0x55, 0xa3):
+            x += [0] * 4 + sum([[(b >> i) & 1] * 4 for i in range(8)], []) + [1] * 6
+        f = busdecode.decode_uart(scope.Waveform(np.array(x, bool), 0.25), 1.0)
+        self.assertEqual(f['data'].tolist(), [0x55, 0xa3])
+        self.assertEqual(f['time'].tolist(), [2.5, 13.0])
+        self.assertFalse(f['framing_error'].any())
+
+    def test_spi(self):
+        clk = [0, 1] * 16
+        mosi = sum([[(0xa5c3 >> (15 - i)) & 1] * 2 for i in range(16)], [])
+        f = busdecode.decode_spi(np.array(clk, bool), np.array(mosi, float), word_bits=8)
+        self.assertEqual(f['mosi'].tolist(), [0xa5, 0xc3])
+
+    def test_i2c(self):
+        scl = [1, 1, 1, 0]
+        sda = [1, 1, 0, 0]
+        for b in (0x90, 0x12):
+            for i in range(9):
+                scl += [0, 1, 1, 0]
+                sda += [(b >> (7 - i)) & 1 if i < 8 else 0] * 4
+        scl += [1, 1]
+        sda += [0, 1]
+        f = busdecode.decode_i2c(np.array(scl, bool), np.array(sda, bool))
+        self.assertEqual(f['data'].tolist(), [0x90, 0x12])
+        self.assertEqual(f['start'].tolist(), [True, False])
+        self.assertTrue(f['ack'].all())
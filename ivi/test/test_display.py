@@ -0,0 +1,56 @@
+"""
+
+Python Interchangeable Virtual Instrument Library
+
+Copyright (c) 2014 Alex Forencich
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+
+import unittest
+
+import numpy as np
+
+from ivi import display
+from ivi import scope
+
+class TestDisplay(unittest.TestCase):
+
+    def test_decimate(self):
+        y = np.sin(np.arange(100000) / 1000.0)
+        y[54321] = 5
+        for method in display.DecimationMethod:
+            x, d = display.decimate(scope.Waveform(y, 0.5), 200, method)
+            self.assertLessEqual(len(d), 200)
+            self.assertEqual(x[np.argmax(d)], 54321 * 0.5)
+            self.assertTrue(np.all(np.diff(x) > 0))
+
+    def test_stream(self):
+        y = np.random.randn(10007)
+        s = display.StreamDecimator(100)
+        for chunk in np.array_split(y, 13):
+            s.append(chunk)
+        x, d = s.result()
+        self.assertLessEqual(len(d), 100)
+        self.assertEqual(s.samples, len(y))
+        self.assertEqual(d.max(), y.max())
+        self.assertEqual(d.min(), y.min())
+        self.assertEqual(x[np.argmax(d)], np.argmax(y))
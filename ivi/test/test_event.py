@@ -0,0 +1,169 @@
+"""
+
+Python Interchangeable Virtual Instrument Library
+
+Copyright (c) 2014 Alex Forencich
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+
+import unittest
+
+import ivi
+from ivi import event
+
+class SrqInterface(object):
+    "Interface with a settable status byte and event status register"
+
+    def __init__(self):
+        self.stb = 0
+        self.esr = 0
+        self.written = []
+        self.asked = []
+        self.read_error = None
+
+    def read_stb(self):
+        stb = self.stb
+        self.stb &= ~event.RequestServiceBit
+        return stb
+
+    def write(self, data, encoding='utf-8'):
+        self.written.append(data)
+
+    def read(self, num=-1, encoding='utf-8'):
+        if self.read_error is not None:
+            raise self.read_error
+        return "1.0E+06"
+
+    def clear(self):
+        pass
+
+    def ask(self, data, num=-1, encoding='utf-8'):
+        self.asked.append(data)
+        if data == "*STB?":
+            return str(SrqInterface.read_stb(self))
+        assert data == "*ESR?"
+        esr, self.esr = self.esr, 0
+        self.stb &= ~event.EventStatusBit
+        return str(esr)
+
+class StbQueryInterface(SrqInterface):
+    "Interface without serial poll"
+
+    def read_stb(self):
+        raise NotImplementedError()
+
+class TestEventDispatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.drv = ivi.Driver()
+        self.drv._interface = SrqInterface()
+        self.drv._initialized = True
+        self.dispatcher = event.EventDispatcher()
+        self.dispatcher.start = lambda: None
+
+    def test_masks(self):
+        self.assertEqual(event.event_masks(['error', 'message_available']), (0x30, 0x3c))
+        self.assertRaises(ivi.ValueNotSupportedException, event.event_masks, 'bogus')
+
+    def test_enable_and_callback(self):
+        events = []
+        self.dispatcher.add(self.drv, 'error', events.append)
+        self.assertEqual(self.drv._interface.written, ["*ESE 60", "*SRE 32"])
+
+        self.dispatcher.poll()
+        self.assertEqual(events, [])
+
+        self.drv._interface.esr = 0x10
+        self.drv._interface.stb = 0x60
+        self.dispatcher.poll()
+        self.assertEqual(len(events), 1)
+        self.assertIn('execution_error', events[0].sources)
+        self.assertIn('error', events[0].sources)
+
+    def test_expect(self):
+        waiter = self.dispatcher.expect(self.drv, 'acquisition_complete')
+        self.assertEqual(self.drv._interface.written, ["*ESE 1", "*SRE 32", "*OPC"])
+        self.assertRaises(ivi.MaxTimeoutExceededException, waiter.wait, 0)
+
+        self.drv._interface.esr = 0x01
+        self.drv._interface.stb = 0x60
+        self.dispatcher.poll()
+        self.assertTrue(waiter.done())
+        self.assertEqual(waiter.wait(0).event_status, 0x01)
+
+    def test_pending_response(self):
+        events = []
+        self.dispatcher.add(self.drv, 'error', events.append)
+        self.drv._write(":measure:frequency?")
+        self.drv._interface.esr = 0x10
+        self.drv._interface.stb = 0x60
+
+        # *ESR? is put off until the application has read its response
+        self.dispatcher.poll()
+        self.assertEqual(events, [])
+        self.assertEqual(self.drv._interface.asked, [])
+        self.assertEqual(self.drv._read(), "1.0E+06")
+        self.dispatcher.poll()
+        self.assertEqual(len(events), 1)
+        self.assertIn('execution_error', events[0].sources)
+
+    def test_pending_response_stb_query(self):
+        events = []
+        self.drv._interface = StbQueryInterface()
+        self.dispatcher.add(self.drv, 'error', events.append)
+        self.drv._write(":measure:frequency?")
+        self.drv._interface.esr = 0x10
+        self.drv._interface.stb = 0x60
+
+        self.dispatcher.poll()
+        self.assertEqual(self.drv._interface.asked, [])
+        self.drv._read()
+        self.dispatcher.poll()
+        self.assertEqual(self.drv._interface.asked, ["*STB?", "*ESR?"])
+        self.assertEqual(len(events), 1)
+
+    def test_pending_response_read_error(self):
+        events = []
+        self.dispatcher.add(self.drv, 'error', events.append)
+        self.drv._write(":measure:frequency?")
+        self.drv._interface.esr = 0x10
+        self.drv._interface.stb = 0x60
+        self.drv._interface.read_error = IOError("timeout")
+
+        # the response is lost with the failed read, polling resumes
+        self.assertRaises(IOError, self.drv._read)
+        self.dispatcher.poll()
+        self.assertEqual(self.drv._interface.asked, ["*ESR?"])
+        self.assertEqual(len(events), 1)
+
+    def test_pending_response_clear_reset(self):
+        self.drv._write(":measure:frequency?")
+        self.drv._clear()
+        self.assertFalse(self.drv._response_pending)
+
+        # a reset command discards the unread response
+        self.drv._write(":measure:frequency?")
+        self.drv._write("*RST")
+        self.assertFalse(self.drv._response_pending)
+
+if __name__ == '__main__':
+    unittest.main()
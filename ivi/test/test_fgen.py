@@ -0,0 +1,62 @@
+"""
+
+Python Interchangeable Virtual Instrument Library
+
+Copyright (c) 2014 Alex Forencich
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+
+import array
+import sys
+import unittest
+
+import numpy as np
+
+import ivi
+from ivi import fgen
+
+class TestBinaryWaveform(unittest.TestCase):
+
+    def test_get_binary_waveform(self):
+        y = np.array([[1, -2], [3, -4]], dtype='>i2')
+        w = fgen.get_binary_waveform(y)
+        self.assertEqual(w.dtype, np.dtype('>i2'))
+        self.assertEqual(list(w), [1, -2, 3, -4])
+
+        # arrays and buffers are viewed, not copied
+        y = np.arange(4, dtype=np.uint16)
+        self.assertTrue(np.shares_memory(fgen.get_binary_waveform(y), y))
+        self.assertEqual(fgen.get_binary_waveform(array.array('H', [1, 65535])).dtype.kind, 'u')
+        self.assertEqual(list(fgen.get_binary_waveform(array.array('h', [1, -1]))), [1, -1])
+        self.assertEqual(list(fgen.get_binary_waveform(np.array([1, -1], np.int16).tobytes())), [1, -1])
+
+        self.assertRaises(ivi.ValueNotSupportedException, fgen.get_binary_waveform, np.zeros(4))
+        self.assertRaises(ivi.ValueNotSupportedException, fgen.get_binary_waveform, np.zeros(4, np.int32))
+
+    def test_binary_byte_order(self):
+        native = '<' if sys.byteorder == 'little' else '>'
+        self.assertEqual(fgen.binary_byte_order(np.zeros(1, '>i2')), '>')
+        self.assertEqual(fgen.binary_byte_order(np.zeros(1, '<u2')), '<')
+        self.assertEqual(fgen.binary_byte_order(np.zeros(1, np.int16)), native)
+
+if __name__ == '__main__':
+    unittest.main()
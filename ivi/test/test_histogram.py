@@ -0,0 +1,52 @@
+"""
+
+Python Interchangeable Virtual Instrument Library
+
+Copyright (c) 2014 Alex Forencich
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+
+import unittest
+
+import numpy as np
+
+from ivi import histogram
+from ivi import scope
+
+class TestHistogram(unittest.TestCase):
+
+    def test_eye(self):
+        y = np.tile([-1.0, 1.0], (4, 50))
+        h = histogram.WaveformHistogram(4, 2, (-2, 2), unit_interval=2, unit_interval_count=2)
+        h.add(scope.Waveform(y))
+        h2 = histogram.WaveformHistogram(4, 2, (-2, 2), unit_interval=2, unit_interval_count=2)
+        h2.add(y[0], x_increment=1.0)
+        h += h2
+        self.assertEqual(h.records, 5)
+        self.assertEqual(h.counts.sum(), 500)
+        np.testing.assert_array_equal(h.counts, [[125, 0, 125, 0], [0, 125, 0, 125]])
+
+    def test_outside(self):
+        h = histogram.WaveformHistogram(10, 10, (0, 1))
+        h.add(np.array([0.5, 2.0, np.nan]))
+        self.assertEqual(h.time_range, (0.0, 3.0))
+        self.assertEqual(h.outside, 2)
@@ -24,8 +24,11 @@ THE SOFTWARE.
 
 """
 
+import struct
 import unittest
 
+import numpy as np
+
 import ivi
 
 class TestIndex(unittest.TestCase):
@@ -57,5 +60,77 @@ class TestIndex(unittest.TestCase):
         self.assertRaises(ivi.SelectorRangeException, ivi.get_index, self.index_dict, 100);
         self.assertRaises(ivi.SelectorNameException, ivi.get_index, self.index_dict, 'bad_item');
 
+    def test_build_ieee_block(self):
+        self.assertEqual(ivi.build_ieee_block(b'abc'), b'#800000003abc')
+        # the length of a word array is counted in bytes
+        y = np.array([1, 2], dtype='>i2')
+        self.assertEqual(ivi.build_ieee_block(y), b'#800000004\x00\x01\x00\x02')
+        self.assertEqual(ivi.decode_ieee_block(ivi.build_ieee_block(y)), y.tobytes())
+
+class TestQuantize(unittest.TestCase):
+
+    def test_offset_binary(self):
+        raw = ivi.quantize_waveform([-2.0, -1.0, 0.0, 1.0, 2.0], 12, max_code=(1 << 12) - 2)
+        self.assertEqual(struct.unpack('>5H', raw), (0, 0, 2047, 4094, 4094))
+
+    def test_twos_complement(self):
+        raw = ivi.quantize_waveform([-1.0, 0.0, 1.0], 16, 'twos_complement', '<')
+        self.assertEqual(struct.unpack('<3h', raw), (-32767, 0, 32767))
+
+    def test_float(self):
+        raw = ivi.quantize_waveform([-2.0, 0.5], encoding='float', byteorder='<')
+        self.assertEqual(struct.unpack('<2f', raw), (-1.0, 0.5))
+
+    def test_integer_passthrough(self):
+        raw = ivi.quantize_waveform(np.array([-5, 0, 5], dtype='<i2'), 16, 'twos_complement', '>')
+        self.assertEqual(struct.unpack('>3h', raw), (-5, 0, 5))
+        raw = ivi.quantize_waveform(np.array([0, 4094], dtype=np.uint16), 12, max_code=(1 << 12) - 2)
+        self.assertEqual(struct.unpack('>2H', raw), (0, 4094))
+        self.assertRaises(ivi.OutOfRangeException, ivi.quantize_waveform,
+                          np.array([0, 4095], dtype=np.uint16), 12, max_code=(1 << 12) - 2)
+        self.assertRaises(ivi.OutOfRangeException, ivi.quantize_waveform,
+                          np.array([-5, 0], dtype=np.int16), 16)
+
+    def test_integer_samples(self):
+        # other integer arrays are normalized samples
+        raw = ivi.quantize_waveform([-1, 0, 1], 16, 'twos_complement', '>')
+        self.assertEqual(struct.unpack('>3h', raw), (-32767, 0, 32767))
+        raw = ivi.quantize_waveform(np.array([-3, 3], dtype=np.int32), 12)
+        self.assertEqual(struct.unpack('>2H', raw), (0, 4095))
+
+class PollInterface(object):
+    "Interface whose status byte sets MAV after a number of serial polls"
+
+    def __init__(self, polls):
+        self.polls = polls
+        self.written = []
+
+    def read_stb(self):
+        self.polls -= 1
+        return 0x10 if self.polls <= 0 else 0
+
+    def write(self, data, encoding='utf-8'):
+        self.written.append(data)
+
+class TestWaitFor(unittest.TestCase):
+
+    def setUp(self):
+        self.drv = ivi.Driver()
+        self.drv._interface = PollInterface(5)
+        self.drv._initialized = True
+
+    def test_stb(self):
+        self.assertEqual(self.drv.driver_operation.wait_for(completion='stb', maximum_time=1), 0x10)
+        self.assertEqual(self.drv._interface.polls, 0)
+
+    def test_condition_timeout(self):
+        t0 = ivi.ivi.monotonic()
+        self.assertFalse(self.drv.driver_operation.wait_for(lambda: False, 0.05))
+        self.assertTrue(0.05 <= ivi.ivi.monotonic() - t0 < 1)
+
+    def test_mav_without_serial_poll(self):
+        self.drv._interface = object()
+        self.assertTrue(self.drv.driver_operation.wait_for(completion='mav', maximum_time=0))
+
 if __name__ == '__main__':
     unittest.main()
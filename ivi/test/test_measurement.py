@@ -0,0 +1,70 @@
+"""
+
+Python Interchangeable Virtual Instrument Library
+
+Copyright (c) 2014 Alex Forencich
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+
+import unittest
+import warnings
+
+import numpy as np
+
+import ivi
+from ivi import measurement
+from ivi import scope
+
+def square(periods=10, points=100, ramp=10):
+    y = np.tile(np.r_[np.ones(points//2), -np.ones(points//2)], periods)
+    return np.convolve(y, np.ones(ramp)/ramp, 'valid')
+
+class TestMeasurement(unittest.TestCase):
+
+    def test_square(self):
+        a = measurement.WaveformAnalysis(scope.Waveform(square(), 1e-9))
+        self.assertAlmostEqual(a.measure('amplitude'), 2.0)
+        self.assertAlmostEqual(a.measure('period'), 100e-9)
+        self.assertAlmostEqual(a.measure('rise_time'), 8e-9)
+        self.assertAlmostEqual(a.measure('fall_time'), 8e-9)
+        self.assertAlmostEqual(a.measure('duty_cycle_positive'), 50.0)
+        self.assertAlmostEqual(a.measure('voltage_cycle_average'), 0.0)
+
+    def test_batch(self):
+        y = np.vstack([square(), 2*square(), np.zeros(991)])
+        r = measurement.WaveformAnalysis(y, 1e-9, (20, 50, 80)).measure_all()
+        self.assertEqual(r['amplitude'].shape, (3,))
+        np.testing.assert_allclose(r['voltage_high'], [1, 2, 0])
+        np.testing.assert_allclose(r['rise_time'][:2], [6e-9, 6e-9])
+        self.assertTrue(np.isnan(r['frequency'][2]))
+
+    def test_invalid(self):
+        self.assertRaises(ivi.ValueNotSupportedException, measurement.measure, square(), 'bogus')
+
+    def test_all_nan(self):
+        y = np.vstack([square(), np.full(991, np.nan)])
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            r = measurement.WaveformAnalysis(y, 1e-9).measure_all()
+        for function, value in r.items():
+            self.assertTrue(np.isnan(value[1]), function)
+        self.assertAlmostEqual(r['amplitude'][0], 2.0)
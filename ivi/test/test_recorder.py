@@ -0,0 +1,106 @@
+"""
+
+Python Interchangeable Virtual Instrument Library
+
+Copyright (c) 2014 Alex Forencich
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+
+import shutil
+import struct
+import tempfile
+import unittest
+
+import numpy as np
+
+import ivi
+from ivi import recorder
+from ivi import scope
+
+class TestWaveformRecorder(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_append_and_open(self):
+        rec = recorder.WaveformRecorder(self.path, capacity=2)
+        for i in range(5):
+            rec.append(scope.Waveform(np.arange(4.0) + i, 1e-9, channel='channel1'), time_tag=i)
+        rec.flush()
+
+        meta, channels = recorder.open_recording(self.path)
+        data, index = channels['channel1']
+        self.assertEqual(meta['channels'], ['channel1'])
+        self.assertEqual(data.shape, (5, 4))
+        self.assertEqual(list(data[:, 0]), [0, 1, 2, 3, 4])
+        self.assertEqual(list(index['time_tag']), [0, 1, 2, 3, 4])
+        self.assertEqual(index['x_increment'][0], 1e-9)
+
+        rec.extend('channel1', np.zeros((3, 4)), time_tag=np.arange(3))
+        rec.close()
+
+        meta, channels = recorder.open_recording(self.path)
+        self.assertEqual(channels['channel1'][0].shape, (8, 4))
+        self.assertRaises(ivi.ValueNotSupportedException, rec.extend, 'channel1', np.zeros((1, 5)))
+
+    def test_record_stream(self):
+        drv = SegmentedScope()
+        with recorder.WaveformRecorder(self.path) as rec:
+            self.assertEqual(rec.record(drv, ['channel1'], count=3), 3)
+
+        meta, channels = recorder.open_recording(self.path)
+        data, index = channels['channel1']
+        # float64 samples are not narrowed by default
+        self.assertEqual(data.dtype, np.float64)
+        self.assertEqual(list(data[:, 0]), [1.0, 2.0, 3.0])
+        self.assertEqual(list(index['time_tag']), [1e-3, 2e-3, 3e-3])
+
+        rec = recorder.WaveformRecorder(self.path, np.float32)
+        rec.append(scope.Waveform(np.arange(4.0), channel='channel2'))
+        rec.close()
+        self.assertEqual(recorder.open_recording(self.path)[1]['channel2'][0].dtype, np.float32)
+
+class SegmentedScope(ivi.Driver, scope.Base):
+    "Scope whose numbered records carry a time tag"
+
+    def __init__(self, *args, **kwargs):
+        super(SegmentedScope, self).__init__(*args, **kwargs)
+        self._channel_name = ['channel1']
+        self.initiated = 0
+
+    def _measurement_initiate(self):
+        self.initiated += 1
+
+    def _measurement_fetch_waveform_raw(self, index):
+        return (index,), struct.pack('>H', self.initiated)
+
+    def _measurement_decode_waveform(self, index, pre, raw_data):
+        return scope.Waveform(np.frombuffer(raw_data, '>u2').astype(float), channel='channel1')
+
+    def _measurement_fetch_time_tag(self):
+        return self.initiated * 1e-3
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+"""
+
+Python Interchangeable Virtual Instrument Library
+
+Copyright (c) 2014 Alex Forencich
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+
+import unittest
+
+import numpy as np
+
+import ivi
+from ivi import ringbuffer
+from ivi import scope
+
+@unittest.skipIf(ringbuffer.shared_memory is None, "multiprocessing.shared_memory not available")
+class TestSharedWaveformRing(unittest.TestCase):
+
+    def test_put_get_release(self):
+        with ringbuffer.SharedWaveformRing(['channel1'], 8, slots=2) as ring:
+            seq1 = ring.put({'channel1': scope.Waveform(np.arange(8.0), 1e-9)})
+            seq2 = ring.put({'channel1': scope.Waveform(np.arange(4.0) + 10)})
+            self.assertEqual(ring.pending(), 2)
+
+            # both slots in use, the producer has to wait for a release
+            self.assertRaises(ivi.MaxTimeoutExceededException, ring.put,
+                              {'channel1': scope.Waveform(np.zeros(8))}, 0.01)
+
+            with ring.record(seq2) as w:
+                self.assertEqual(list(w['channel1'].y), [10, 11, 12, 13])
+
+            worker = ringbuffer.SharedWaveformRing.attach(ring.name)
+            with worker.record(seq1) as w:
+                self.assertEqual(w['channel1'].x_increment, 1e-9)
+                self.assertEqual(list(w['channel1'].y), list(range(8)))
+            worker.close()
+
+            seq3 = ring.put({'channel1': scope.Waveform(np.zeros(8))}, 0.01)
+            self.assertRaises(ringbuffer.RecordOverwrittenException, ring.get, seq1)
+            self.assertEqual(ring.get(seq3)['channel1'].y.sum(), 0)
+
+    def test_put_too_long(self):
+        with ringbuffer.SharedWaveformRing(['channel1'], 4, slots=2) as ring:
+            self.assertRaises(ivi.OutOfRangeException, ring.put,
+                              {'channel1': scope.Waveform(np.arange(8.0))})
+            # the rejected record does not use up a sequence number
+            seq = ring.put({'channel1': scope.Waveform(np.arange(4.0))})
+            self.assertEqual(seq, 1)
+            self.assertEqual(ring.pending(), 1)
+
+    def test_fetch_decodes_into_slot(self):
+        class RawDriver(object):
+            _channel_name = ['channel1', 'channel2']
+            def _measurement_fetch_waveforms_raw(self, indices):
+                return [((0.5, float(index)), np.arange(4, dtype='>i2').tobytes()) for index in indices]
+            def _measurement_decode_waveform(self, index, pre, raw_data, out=None):
+                y = scope.decode_waveform_data(raw_data, '>i2', pre[0], pre[1], out=out)
+                return scope.Waveform(y, 1e-9, y_increment=pre[0], y_origin=pre[1],
+                                      channel=self._channel_name[index])
+
+        with ringbuffer.SharedWaveformRing(['channel2', 'channel1'], 8, slots=2) as ring:
+            seq = ring.fetch(RawDriver(), initiate=False)
+            with ring.record(seq) as w:
+                self.assertEqual(list(w['channel1'].y), [0.0, 0.5, 1.0, 1.5])
+                self.assertEqual(list(w['channel2'].y), [1.0, 1.5, 2.0, 2.5])
+                self.assertEqual(w['channel2'].y_origin, 1.0)
+                self.assertEqual(w['channel1'].x_increment, 1e-9)
+
+        with ringbuffer.SharedWaveformRing(['channel1'], 2, slots=2) as ring:
+            self.assertRaises(ivi.OutOfRangeException, ring.fetch, RawDriver(), False)
+            self.assertEqual(ring.pending(), 0)
+
+if __name__ == '__main__':
+    unittest.main()
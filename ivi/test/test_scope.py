@@ -0,0 +1,188 @@
+"""
+
+Python Interchangeable Virtual Instrument Library
+
+Copyright (c) 2014 Alex Forencich
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+
+import struct
+import time
+import unittest
+
+import numpy as np
+
+import ivi
+from ivi import scope
+
+class TestWaveform(unittest.TestCase):
+
+    def test_decode_waveform_data(self):
+        raw = struct.pack('>4H', 0, 128, 129, 130)
+        y = scope.decode_waveform_data(raw, '>u2', 0.5, 1.0, 128, 0)
+        self.assertTrue(np.isnan(y[0]))
+        self.assertEqual(list(y[1:]), [1.0, 1.5, 2.0])
+
+    def test_waveform_points(self):
+        wfm = scope.Waveform(np.array([1.0, 2.0, 3.0]), 0.1, -1.0, 1)
+        self.assertEqual(len(wfm), 3)
+        self.assertAlmostEqual(wfm[0][0], -1.1)
+        self.assertEqual(wfm[2][1], 3.0)
+        self.assertEqual([p[1] for p in wfm], [1.0, 2.0, 3.0])
+        self.assertEqual(np.array(wfm).shape, (3, 2))
+        self.assertRaises(IndexError, wfm.__getitem__, 3)
+
+    def test_envelope_waveform(self):
+        y_min, y_max = scope.split_min_max(np.array([-1.0, 1.0, -2.0, 2.0, 5.0]))
+        wfm = scope.EnvelopeWaveform(y_min, y_max, 0.5)
+        self.assertEqual(len(wfm), 2)
+        self.assertEqual(wfm[1], (0.5, -2.0, 2.0))
+        self.assertEqual(np.array(wfm).shape, (2, 3))
+
+    def test_window_waveform(self):
+        wfm = scope.Waveform(np.arange(100.0), 1.0, 10.0, 0)
+        w = scope.window_waveform(wfm, 10, 20, 2)
+        self.assertEqual(list(w.y), [10, 12, 14, 16, 18])
+        self.assertEqual(list(w.x), [20, 22, 24, 26, 28])
+
+        y = np.zeros(1000)
+        y[500] = 5.0
+        y[501] = -3.0
+        w = scope.window_waveform(scope.Waveform(y), max_points=100)
+        self.assertTrue(len(w) <= 100)
+        self.assertEqual(w.y.max(), 5.0)
+        self.assertEqual(w.y.min(), -3.0)
+
+    def test_digital_waveform_bits(self):
+        raw = np.array([[0x01, 0x80], [0x02, 0x00]], dtype=np.uint8)
+        wfm = scope.DigitalWaveform(raw, 1e-9)
+        self.assertEqual(wfm.bits.shape, (2, 16))
+        self.assertEqual(list(np.nonzero(wfm.bits[0])[0]), [0, 15])
+        self.assertEqual(list(np.nonzero(wfm.bits[1])[0]), [1])
+
+class MeasurementScope(ivi.Driver, scope.Base, scope.WaveformMeasurement):
+    "Scope recording the single measurements the generic batch fetch falls back to"
+
+    def __init__(self, *args, **kwargs):
+        super(MeasurementScope, self).__init__(*args, **kwargs)
+        self._channel_name = ['channel1', 'channel2']
+        self.calls = []
+
+    def _measurement_fetch_waveform_measurement(self, index, measurement_function, ref_channel=None):
+        self.calls.append((index, measurement_function, ref_channel))
+        return len(self.calls)
+
+class TestWaveformMeasurement(unittest.TestCase):
+
+    def test_generic_fetch_measurements(self):
+        drv = MeasurementScope()
+        values = drv.measurement.fetch_waveform_measurements(
+                [('channel1', 'frequency'), ('channel1', 'delay', 'channel2')])
+        self.assertEqual(list(values), [1.0, 2.0])
+        self.assertEqual(drv.calls, [('channel1', 'frequency', None),
+                                     ('channel1', 'delay', 'channel2')])
+        self.assertRaises(ivi.OperationNotSupportedException,
+                          drv.measurement.fetch_waveform_measurements, [], True)
+
+class TestWaveformCache(unittest.TestCase):
+
+    def test_generation(self):
+        drv = StreamScope()
+        wfm = scope.Waveform(np.arange(4.0), channel='channel1')
+        drv._set_cached_waveform(0, wfm)
+        drv._set_cached_waveform(1, scope.Waveform(np.arange(4.0), channel='channel2'))
+
+        cached = drv._get_cached_waveform(0)
+        self.assertIsNot(cached, wfm)
+        self.assertEqual(list(cached.y), [0, 1, 2, 3])
+        self.assertRaises(ValueError, cached.y.__setitem__, 0, 5.0)
+        cached.x_increment = 2.0
+        self.assertEqual(drv._get_cached_waveform(0).x_increment, 1.0)
+
+        # a change to one channel leaves the other cached
+        drv._invalidate_waveform_preamble(0)
+        self.assertIsNone(drv._get_cached_waveform(0))
+        self.assertIsNotNone(drv._get_cached_waveform(1))
+
+        # a new acquisition makes every kept waveform stale
+        drv._bump_acquisition_generation()
+        self.assertIsNone(drv._get_cached_waveform(1))
+        drv._set_cached_waveform(1, wfm)
+        self.assertIsNotNone(drv._get_cached_waveform(1))
+        drv._invalidate_waveform_preamble()
+        self.assertIsNone(drv._get_cached_waveform(1))
+
+class StreamScope(ivi.Driver, scope.Base):
+    "Scope whose acquisitions are numbered records of one sample"
+
+    def __init__(self, *args, **kwargs):
+        super(StreamScope, self).__init__(*args, **kwargs)
+        self._channel_name = ['channel1', 'channel2']
+        self.initiated = 0
+        self.fail = False
+
+    def _measurement_initiate(self):
+        self.initiated += 1
+
+    def _measurement_fetch_waveform_raw(self, index):
+        if self.fail:
+            raise ivi.UnexpectedResponseException()
+        return (index,), struct.pack('>H', self.initiated)
+
+    def _measurement_decode_waveform(self, index, pre, raw_data):
+        return scope.Waveform(np.frombuffer(raw_data, '>u2').astype(float), channel=self._channel_name[pre[0]])
+
+class TestWaveformStream(unittest.TestCase):
+
+    def test_block(self):
+        drv = StreamScope()
+        stream = drv.measurement.stream_waveforms(['channel1', 'channel2'], count=3, queue_depth=1)
+        time.sleep(0.1)
+        records = list(stream)
+        self.assertEqual([r['channel2'].y[0] for r in records], [1.0, 2.0, 3.0])
+        self.assertEqual(records[0]['channel1'].channel, 'channel1')
+        self.assertEqual((stream.acquired, stream.delivered, stream.dropped), (3, 3, 0))
+        self.assertTrue(stream.late >= 1)
+
+    def test_drop(self):
+        drv = StreamScope()
+        stream = drv.measurement.stream_waveforms(['channel1'], count=5, queue_depth=1, policy='drop')
+        stream._thread.join(5)
+        records = list(stream)
+        self.assertEqual([r['channel1'].y[0] for r in records], [1.0])
+        self.assertEqual((stream.acquired, stream.delivered, stream.dropped), (5, 1, 4))
+
+    def test_close_and_errors(self):
+        drv = StreamScope()
+        with drv.measurement.stream_waveforms(['channel1']) as stream:
+            next(stream)
+        self.assertFalse(stream._thread.is_alive())
+        self.assertRaises(StopIteration, next, stream)
+
+        drv.fail = True
+        stream = drv.measurement.stream_waveforms(['channel1'])
+        self.assertRaises(ivi.UnexpectedResponseException, next, stream)
+        self.assertRaises(ivi.ValueNotSupportedException,
+                          drv.measurement.stream_waveforms, ['channel1'], policy='bogus')
+
+if __name__ == '__main__':
+    unittest.main()
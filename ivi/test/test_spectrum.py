@@ -0,0 +1,52 @@
+"""
+
+Python Interchangeable Virtual Instrument Library
+
+Copyright (c) 2014 Alex Forencich
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+
+import unittest
+
+import numpy as np
+
+from ivi import scope
+from ivi import spectrum
+
+class TestSpectrum(unittest.TestCase):
+
+    def test_sine(self):
+        # 1 mW into 50 ohms, 10 kHz
+        y = np.sqrt(0.1) * np.sin(2 * np.pi * np.arange(1000) / 100)
+        for window in spectrum.WindowType:
+            f, s = spectrum.spectrum(scope.Waveform(y, 1e-6), window)
+            self.assertAlmostEqual(f[s.argmax()], 10e3)
+            self.assertAlmostEqual(s.max(), 0.0, 3)
+
+    def test_average(self):
+        y = np.sqrt(0.1) * np.sin(2 * np.pi * np.arange(1024) / 64)
+        a = spectrum.SpectrumAnalysis(amplitude_units='watt', averaging=True, fast_fft=True)
+        self.assertEqual(len(a.frequency(1001)), 513)
+        a.compute(np.vstack([y, 2 * y]))
+        s = a.compute(3 * y)
+        self.assertEqual(a.average_count, 3)
+        self.assertAlmostEqual(s.max(), 1e-3 * 14 / 3, 6)
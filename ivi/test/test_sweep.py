@@ -0,0 +1,161 @@
+"""
+
+Python Interchangeable Virtual Instrument Library
+
+Copyright (c) 2014 Alex Forencich
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+
+import unittest
+
+import numpy as np
+
+import ivi
+from ivi import pwrmeter
+from ivi import rfsiggen
+from ivi import sweep
+
+class ListSource(ivi.Driver, rfsiggen.Base, rfsiggen.Sweep, rfsiggen.List,
+                 rfsiggen.SoftwareTrigger):
+    "Source stepping through a list of at most list_points points on software triggers"
+
+    def __init__(self, *args, **kwargs):
+        super(ListSource, self).__init__(*args, **kwargs)
+        self.list_points = 1601
+        self.lists = dict()
+        self.point = 0
+        self.uploads = 0
+        self.fail_at = None
+
+    def output_frequency(self):
+        if self._sweep_mode == 'list':
+            return self.lists[self._sweep_list_selected_list][self.point]
+        return self._rf_frequency
+
+    def _sweep_list_create_frequency(self, name, frequency):
+        if len(frequency) > self.list_points:
+            raise ivi.OutOfRangeException()
+        self.lists[name] = list(frequency)
+        self.uploads += 1
+
+    def _sweep_list_reset(self):
+        self.point = 0
+
+    def _send_software_trigger(self):
+        self.point += 1
+        if self.point == self.fail_at:
+            raise ivi.UnexpectedResponseException()
+
+class StepSource(ivi.Driver, rfsiggen.Base):
+    "Source without list support"
+
+    def output_frequency(self):
+        return self._rf_frequency
+
+class Meter(ivi.Driver, pwrmeter.Base):
+    "Meter reading the source frequency in GHz as power"
+
+    def __init__(self, source, *args, **kwargs):
+        super(Meter, self).__init__(*args, **kwargs)
+        self.source = source
+
+    def _measurement_fetch(self):
+        return self.source.output_frequency() / 1e9
+
+class StateMeter(Meter):
+    "Meter taking the point on initiate and reporting when it is complete"
+
+    def __init__(self, source, *args, **kwargs):
+        super(StateMeter, self).__init__(source, *args, **kwargs)
+        self.value = None
+        self.ahead = list()
+
+    def _measurement_initiate(self):
+        self._measurement_measurement_state = 'in_progress'
+        self.value = self.source.output_frequency() / 1e9
+
+    def _get_measurement_measurement_state(self):
+        # one poll in progress, then complete
+        state = self._measurement_measurement_state
+        self._measurement_measurement_state = 'complete'
+        return state
+
+    def _measurement_fetch(self):
+        # whether the source already moved on when the reading is fetched
+        self.ahead.append(self.source.output_frequency() / 1e9 != self.value)
+        return self.value
+
+class TestPowerSweep(unittest.TestCase):
+
+    def test_list(self):
+        source = ListSource()
+        meter = Meter(source)
+        ps = sweep.PowerSweep(source, meter, settle_time=0)
+        self.assertTrue(ps.use_list)
+
+        f = np.linspace(1e9, 2e9, 2000)
+        result = ps.run(f)
+        np.testing.assert_allclose(result['power'], f / 1e9)
+        self.assertEqual(meter.channels[0].correction_frequency, f[-1])
+        # more points than fit in one list are loaded as two lists
+        self.assertEqual(source.uploads, 2)
+        self.assertEqual(source.sweep.mode, 'none')
+        self.assertFalse(source.sweep.list.single_step_enabled)
+
+        ps = sweep.PowerSweep(source, meter, settle_time=0, list_points=3)
+        result = ps.run(f[:7])
+        np.testing.assert_allclose(result['power'], f[:7] / 1e9)
+
+    def test_list_error(self):
+        source = ListSource()
+        source.fail_at = 2
+        ps = sweep.PowerSweep(source, Meter(source), settle_time=0)
+        self.assertRaises(ivi.UnexpectedResponseException, ps.run, [1e9, 2e9, 3e9])
+        # the source is not left in list mode
+        self.assertEqual(source.sweep.mode, 'none')
+        self.assertFalse(source.sweep.list.single_step_enabled)
+
+    def test_step(self):
+        source = StepSource()
+        ps = sweep.PowerSweep(source, Meter(source), settle_time=0)
+        self.assertFalse(ps.use_list)
+        self.assertRaises(ivi.OperationNotSupportedException, sweep.PowerSweep,
+                          source, Meter(source), use_list=True)
+
+        result = ps.run([1e9, 2e9], -10)
+        self.assertEqual(list(result['power']), [1.0, 2.0])
+        self.assertEqual(list(result['level']), [-10, -10])
+        self.assertEqual(source.rf.level, -10)
+
+    def test_overlap(self):
+        f = np.linspace(1e9, 2e9, 5)
+        for source in (ListSource(), StepSource()):
+            meter = StateMeter(source)
+            ps = sweep.PowerSweep(source, meter, settle_time=0)
+            result = ps.run(f)
+            np.testing.assert_allclose(result['power'], f / 1e9)
+            # the source steps before the reading is transferred
+            self.assertEqual(meter.ahead, [True] * 4 + [False])
+            self.assertEqual(meter.channels[0].correction_frequency, f[-1])
+
+if __name__ == '__main__':
+    unittest.main()